@@ -43,11 +43,20 @@
         'data/ir_sequence_data.xml',
         'data/prioridad_data.xml',
         'data/departamento_data.xml',
+        'data/ir_cron_data.xml',
         
         # Vistas principales
         'views/solicitud_interna_views.xml',
         'views/tablas_extra_views.xml',
         'views/solicitud_interna_menu.xml',
+        'views/reportes_views.xml',
+        'views/archivo_solicitud_views.xml',
+        'views/importacion_solicitud_views.xml',
+        'views/inventario_material_views.xml',
+        'views/asignacion_solicitud_views.xml',
+        'views/satisfaccion_solicitud_views.xml',
+        'views/recurrencia_solicitud_views.xml',
+        'views/adjunto_solicitud_views.xml',
     ],
     'demo': [
         'demo/demo_data.xml',
@@ -0,0 +1,4 @@
+# Comandos de odoo-bin del módulo (odoo-bin exportar_tickets --help, odoo-bin importar_tickets --help)
+
+from . import exportar_tickets
+from . import importar_tickets
@@ -0,0 +1,33 @@
+import argparse
+import sys
+from datetime import datetime
+
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from ..models.exportacion_solicitud import FORMATOS_EXPORTACION, TAMANO_LOTE_EXPORTACION
+
+
+class ExportarTickets(Command):
+    """Exporta los tickets de solicitud_interna a CSV, JSONL o Parquet en streaming"""
+    name = 'exportar_tickets'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(prog='odoo-bin exportar_tickets', description=self.__doc__)
+        parser.add_argument('-c', '--config', help='Archivo de configuración de Odoo')
+        parser.add_argument('-d', '--database', required=True, help='Base de datos')
+        parser.add_argument('--formato', choices=sorted(FORMATOS_EXPORTACION), default='csv')
+        parser.add_argument('--salida', required=True, help='Archivo de destino')
+        parser.add_argument('--desde', help='Marca de agua (write_date) de la exportación anterior')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_EXPORTACION, help='Filas por lote')
+        args = parser.parse_args(cmdargs)
+
+        config.parse_config(['-c', args.config] if args.config else [])
+        with Registry(args.database).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            desde = datetime.fromisoformat(args.desde) if args.desde else None
+            hasta = env['exportacion.solicitud'].exportar_a_archivo(args.salida, args.formato, desde, args.lote)
+        # La marca de agua se imprime para encadenar exportaciones incrementales: --desde "<valor>"
+        sys.stdout.write(f'{hasta.isoformat()}\n')
@@ -0,0 +1,36 @@
+import argparse
+import csv
+import sys
+
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+
+class ImportarTickets(Command):
+    """Importa tickets, historial y comentarios de solicitud_interna desde archivos CSV o JSONL en streaming"""
+    name = 'importar_tickets'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(prog='odoo-bin importar_tickets', description=self.__doc__)
+        parser.add_argument('-c', '--config', help='Archivo de configuración de Odoo')
+        parser.add_argument('-d', '--database', required=True, help='Base de datos')
+        parser.add_argument('--tickets', required=True, help='Archivo de tickets (.csv o .jsonl)')
+        parser.add_argument('--historial', help='Archivo de historial de estados')
+        parser.add_argument('--comentarios', help='Archivo de comentarios')
+        parser.add_argument('--rechazos', help='Archivo CSV donde escribir las filas rechazadas')
+        args = parser.parse_args(cmdargs)
+
+        config.parse_config(['-c', args.config] if args.config else [])
+        with Registry(args.database).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            resultado = env['importacion.solicitud'].importar_de_archivos(args.tickets, args.historial,
+                                                                          args.comentarios)
+        if args.rechazos:
+            with open(args.rechazos, 'w', newline='') as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(['archivo', 'linea', 'motivo'])
+                escritor.writerows(resultado['rechazos'])
+        sys.stdout.write(f"tickets={resultado['tickets']} historial={resultado['historial']} "
+                         f"comentarios={resultado['comentarios']} rechazados={len(resultado['rechazos'])}\n")
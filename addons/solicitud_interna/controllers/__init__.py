@@ -0,0 +1,3 @@
+from . import exportacion
+from . import adjuntos
+from . import api
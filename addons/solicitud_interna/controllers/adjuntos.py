@@ -0,0 +1,66 @@
+import json
+import re
+
+from odoo import http
+from odoo.exceptions import AccessError, MissingError, UserError
+from odoo.http import request
+from odoo.tools.mimetypes import guess_mimetype
+from werkzeug.wrappers import Response
+
+from ..models.adjunto_solicitud import MIMETYPES_MINIATURA, TAMANOS_MINIATURA
+
+# Content-Range de un fragmento: "bytes inicio-fin/total"
+PATRON_CONTENT_RANGE = re.compile(r'bytes (\d+)-\d+/\d+')
+
+
+class AdjuntosSolicitudController(http.Controller):
+
+    @http.route('/solicitud_interna/subida', type='json', auth='user')
+    def iniciar_subida(self, name, tamano, res_model, res_id, mimetype=None):
+        return request.env['subida.adjunto'].iniciar(name, int(tamano), res_model, int(res_id), mimetype=mimetype)
+
+    @http.route('/solicitud_interna/subida/<string:token>', type='http', auth='user', methods=['PUT', 'GET'])
+    def recibir_fragmento(self, token, **kwargs):
+        """Subida reanudable: PUT con Content-Range envía un fragmento y GET devuelve lo ya recibido.
+
+        El cuerpo se lee directamente del flujo de la petición; el csrf_token va en la URL.
+        """
+        subida = request.env['subida.adjunto'].search([('token', '=', token)], limit=1)
+        if not subida:
+            return request.not_found()
+        if request.httprequest.method == 'PUT':
+            rango = PATRON_CONTENT_RANGE.match(request.httprequest.headers.get('Content-Range', ''))
+            desde = int(rango.group(1)) if rango else 0
+            try:
+                recibido = subida.recibir_fragmento(desde, request.httprequest.stream)
+            except UserError as error:
+                return Response(json.dumps({'error': str(error)}), status=409, content_type='application/json')
+            estado = 200 if recibido > desde or subida.estado == 'completada' else 409
+        else:
+            recibido, estado = subida.recibido, 200
+        return Response(json.dumps({
+            'recibido': recibido,
+            'completada': subida.estado == 'completada',
+            'attachment_id': subida.attachment_id.id or None,
+        }), status=estado, content_type='application/json')
+
+    @http.route('/solicitud_interna/adjunto/<int:attachment_id>/<string:tamano>', type='http', auth='user',
+                methods=['GET'])
+    def imagen_reducida(self, attachment_id, tamano, **kwargs):
+        """Miniatura o vista previa de un adjunto de imagen; el original solo se decodifica la primera vez"""
+        adjunto = request.env['ir.attachment'].browse(attachment_id)
+        try:
+            adjunto.check_access('read')
+            es_imagen = adjunto.mimetype in MIMETYPES_MINIATURA and adjunto.checksum
+        except (AccessError, MissingError):
+            return request.not_found()
+        if tamano not in TAMANOS_MINIATURA or not es_imagen:
+            return request.not_found()
+        if request.httprequest.if_none_match.contains(adjunto.checksum):
+            return Response(status=304)
+        imagen = request.env['miniatura.adjunto']._obtener(adjunto.sudo(), tamano)
+        return Response(imagen, headers=[
+            ('Content-Type', guess_mimetype(imagen, default='image/png')),
+            ('ETag', f'"{adjunto.checksum}"'),
+            ('Cache-Control', 'private, max-age=604800'),
+        ])
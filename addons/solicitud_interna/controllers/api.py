@@ -0,0 +1,81 @@
+import gzip
+import json
+
+from odoo import http
+from odoo.exceptions import AccessDenied, AccessError, UserError
+from odoo.http import request
+from werkzeug.wrappers import Response
+
+from ..models.api_solicitud import CursorCaducado
+
+# Respuestas más pequeñas que esto se envían sin comprimir
+MINIMO_GZIP = 1024
+
+
+class ApiSolicitudController(http.Controller):
+    """API JSON de tickets para integraciones.
+
+    Autenticación con clave de API (cabecera Authorization: Bearer) o, solo en lecturas, con la sesión.
+    Las respuestas se comprimen con gzip si el cliente lo acepta.
+    """
+
+    def _autenticar(self, solo_clave=False):
+        cabecera = request.httprequest.headers.get('Authorization', '')
+        if cabecera.startswith('Bearer '):
+            uid = request.env['res.users.apikeys']._check_credentials(scope='rpc', key=cabecera[7:].strip())
+            if not uid:
+                raise AccessDenied()
+            request.update_env(user=uid)
+        elif solo_clave or request.env.user._is_public():
+            raise AccessDenied()
+
+    def _responder(self, datos, estado=200):
+        cuerpo = json.dumps(datos, default=str, separators=(',', ':')).encode()
+        cabeceras = [('Content-Type', 'application/json'), ('Vary', 'Accept-Encoding'), ('Cache-Control', 'no-store')]
+        if len(cuerpo) >= MINIMO_GZIP and 'gzip' in request.httprequest.headers.get('Accept-Encoding', ''):
+            cuerpo = gzip.compress(cuerpo, compresslevel=6)
+            cabeceras.append(('Content-Encoding', 'gzip'))
+        return Response(cuerpo, status=estado, headers=cabeceras)
+
+    def _ejecutar(self, funcion, solo_clave=False):
+        """Respuesta JSON de `funcion`; si falla se deshace la transacción entera y se responde el error"""
+        try:
+            self._autenticar(solo_clave=solo_clave)
+            return self._responder(funcion(request.env['api.solicitud']))
+        except AccessDenied:
+            estado, mensaje = 401, 'Autenticación requerida.'
+        except AccessError as error:
+            estado, mensaje = 403, str(error)
+        except CursorCaducado as error:
+            estado, mensaje = 410, str(error)
+        except (UserError, ValueError, KeyError, TypeError) as error:
+            estado, mensaje = 400, str(error)
+        request.env.cr.rollback()
+        return self._responder({'error': mensaje}, estado=estado)
+
+    @http.route('/solicitud_interna/api/v1/tickets', type='http', auth='public', methods=['GET'], csrf=False)
+    def listar(self, cursor=None, limite=None, campos=None, dominio=None, **kwargs):
+        """Tickets en orden (write_date, id); `cursor` es el devuelto por la página anterior"""
+        return self._ejecutar(lambda api: api.listar(cursor, limite, campos, json.loads(dominio) if dominio else None))
+
+    @http.route('/solicitud_interna/api/v1/cambios', type='http', auth='public', methods=['GET'], csrf=False)
+    def cambios(self, cursor=None, limite=None, campos=None, **kwargs):
+        """Tickets modificados y bajas desde el cursor; 410 si hay que resincronizar"""
+        return self._ejecutar(lambda api: api.cambios(cursor, limite, campos))
+
+    @http.route('/solicitud_interna/api/v1/historial', type='http', auth='public', methods=['GET'], csrf=False)
+    def historial(self, solicitud_ids=None, cursor=None, limite=None, **kwargs):
+        """Cambios de estado en orden de registro; `solicitud_ids` separados por comas (400 si no son enteros)"""
+        return self._ejecutar(lambda api: api.historial(
+            [int(solicitud_id) for solicitud_id in solicitud_ids.split(',')] if solicitud_ids else None,
+            cursor, limite))
+
+    @http.route('/solicitud_interna/api/v1/lote', type='http', auth='public', methods=['POST'], csrf=False)
+    def lote(self, **kwargs):
+        """Cuerpo JSON {crear: [...], transiciones: [{accion, ids}], comentarios: [...]}; solo con clave de API"""
+        try:
+            cuerpo = json.loads(request.httprequest.get_data() or b'{}')
+        except ValueError:
+            return self._responder({'error': 'El cuerpo no es JSON válido.'}, estado=400)
+        return self._ejecutar(lambda api: api.lote(cuerpo.get('crear'), cuerpo.get('transiciones'),
+                                                   cuerpo.get('comentarios')), solo_clave=True)
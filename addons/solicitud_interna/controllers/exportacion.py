@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from odoo import api, http
+from odoo.http import request
+from odoo.modules.registry import Registry
+from werkzeug.wrappers import Response
+
+from ..models.exportacion_solicitud import FORMATOS_EXPORTACION, TAMANO_LOTE_EXPORTACION
+
+
+class ExportacionSolicitudController(http.Controller):
+
+    @http.route('/solicitud_interna/exportar', type='http', auth='user', methods=['GET'])
+    def exportar(self, formato='csv', desde=None, lote=None, **kwargs):
+        """Exportación en streaming de tickets.
+
+        La respuesta se genera por lotes mientras se envía. La cabecera X-Marca-Agua (ISO 8601, con
+        microsegundos) indica el valor de `desde` para la siguiente exportación incremental.
+        """
+        Exportacion = request.env['exportacion.solicitud']
+        try:
+            desde = datetime.fromisoformat(desde) if desde else None
+            tamano_lote = min(int(lote), 50000) if lote else TAMANO_LOTE_EXPORTACION
+        except ValueError:
+            return Response('Parámetros desde o lote no válidos.', status=400, content_type='text/plain')
+        if tamano_lote < 1:
+            return Response('El lote debe ser positivo.', status=400, content_type='text/plain')
+        # Acceso y formato se validan antes de empezar a responder
+        Exportacion._comprobar_acceso()
+        if formato not in FORMATOS_EXPORTACION:
+            return request.not_found()
+        hasta = Exportacion.marca_agua_actual()
+
+        # El cursor de la petición se cierra al terminar el controlador: el cuerpo se genera con uno propio
+        db, uid, contexto = request.env.cr.dbname, request.env.uid, dict(request.env.context)
+
+        def cuerpo():
+            with Registry(db).cursor() as cr:
+                env = api.Environment(cr, uid, contexto)
+                yield from env['exportacion.solicitud'].generar(formato, desde, hasta, tamano_lote)
+
+        return Response(cuerpo(), direct_passthrough=True, headers=[
+            ('Content-Type', FORMATOS_EXPORTACION[formato]),
+            ('Content-Disposition', f'attachment; filename="tickets.{formato}"'),
+            ('X-Marca-Agua', hasta.isoformat()),
+            ('Cache-Control', 'no-store'),
+        ])
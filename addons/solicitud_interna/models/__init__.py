@@ -2,3 +2,19 @@
 
 from . import tablas_extra
 from . import solicitud_interna
+from . import recordatorio_solicitud
+from . import sla_solicitud
+from . import busqueda_solicitud
+from . import archivo_solicitud
+from . import importacion_solicitud
+from . import exportacion_solicitud
+from . import kpi_solicitud
+from . import seguimiento_solicitud
+from . import inventario_material
+from . import asignacion_solicitud
+from . import satisfaccion_solicitud
+from . import recurrencia_solicitud
+from . import adjunto_solicitud
+from . import api_solicitud
+from . import cache_referencias
+from . import reportes
@@ -0,0 +1,272 @@
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+from datetime import timedelta
+import base64
+import filecmp
+import hashlib
+import logging
+import os
+import uuid
+
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+# Modelos a los que se puede subir por fragmentos
+MODELOS_SUBIDA = [
+    ('solicitud.interna', 'Ticket'),
+    ('comentario.solicitud', 'Comentario'),
+]
+
+# Bytes que se leen del cuerpo de la petición o del archivo temporal en cada paso
+TAMANO_BLOQUE_SUBIDA = 1 << 20
+
+# Subidas sin completar que se descartan pasado este plazo
+HORAS_SUBIDA_ABANDONADA = 24
+
+# Tamaños de la caché de imágenes reducidas, por contenido
+TAMANOS_MINIATURA = {'miniatura': (256, 256), 'vista_previa': (1024, 1024)}
+
+# Tipos de imagen que se reducen; el resto se muestra con su icono
+MIMETYPES_MINIATURA = ('image/png', 'image/jpeg', 'image/gif', 'image/webp', 'image/bmp')
+
+
+class SubidaAdjunto(models.Model):
+    _name = 'subida.adjunto'
+    _description = 'Subida por fragmentos de un adjunto'
+    _order = 'create_date desc'
+
+    # Los usuarios solo crean subidas (y solo ven las suyas); el avance se escribe con sudo
+    token = fields.Char(string='Token', required=True, readonly=True, copy=False, index=True,
+                        default=lambda self: uuid.uuid4().hex)
+    name = fields.Char(string='Nombre del Archivo', required=True, readonly=True)
+    mimetype = fields.Char(string='Tipo MIME', readonly=True)
+    tamano_total = fields.Integer(string='Tamaño (bytes)', required=True, readonly=True)
+    recibido = fields.Integer(string='Recibido (bytes)', readonly=True, default=0)
+    res_model = fields.Selection(MODELOS_SUBIDA, string='Modelo', required=True, readonly=True)
+    res_id = fields.Integer(string='Registro', required=True, readonly=True)
+    estado = fields.Selection([
+        ('en_curso', 'En Curso'),
+        ('completada', 'Completada'),
+    ], string='Estado', default='en_curso', required=True, readonly=True)
+    attachment_id = fields.Many2one('ir.attachment', string='Adjunto', readonly=True, ondelete='set null')
+
+    _sql_constraints = [
+        ('token_unico', 'unique(token)', 'El token de subida ya existe.'),
+        ('tamano_positivo', 'CHECK(tamano_total > 0)', 'El archivo está vacío.'),
+    ]
+
+    @api.model
+    def iniciar(self, name, tamano_total, res_model, res_id, mimetype=None):
+        """Abre una subida hacia el ticket o comentario indicado y devuelve su token"""
+        if res_model not in dict(MODELOS_SUBIDA):
+            raise UserError(f'No se pueden subir adjuntos a {res_model}.')
+        self.env[res_model].browse(res_id).check_access('write')
+        subida = self.create({'name': name, 'tamano_total': tamano_total, 'res_model': res_model,
+                              'res_id': res_id, 'mimetype': mimetype})
+        return {'token': subida.token, 'recibido': 0}
+
+    def _ruta_temporal(self):
+        self.ensure_one()
+        return os.path.join(self.env['ir.attachment']._filestore(), 'subidas', self.token)
+
+    def recibir_fragmento(self, desde, flujo):
+        """Añade al archivo temporal los bytes de `flujo` a partir de la posición `desde`.
+
+        El fragmento se escribe en disco por bloques, sin cargar el cuerpo en memoria. Si `desde` no
+        coincide con lo ya recibido no se escribe nada: el cliente reanuda desde el valor devuelto.
+        Al recibir el último byte la subida se completa.
+        """
+        self.ensure_one()
+        self.check_access('read')
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute("SELECT recibido FROM subida_adjunto WHERE id = %s FOR UPDATE NOWAIT", [self.id])
+        except psycopg2.errors.LockNotAvailable:
+            raise UserError('Ya se está recibiendo otro fragmento de esta subida.')
+        recibido = self.env.cr.fetchone()[0]
+        if self.estado != 'en_curso' or desde != recibido:
+            return recibido
+        ruta = self._ruta_temporal()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        pendiente = self.tamano_total - recibido
+        with open(ruta, 'r+b' if os.path.exists(ruta) else 'wb') as archivo:
+            archivo.seek(recibido)
+            while pendiente > 0:
+                bloque = flujo.read(min(TAMANO_BLOQUE_SUBIDA, pendiente))
+                if not bloque:
+                    break
+                archivo.write(bloque)
+                pendiente -= len(bloque)
+            archivo.truncate()
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        self.sudo().recibido = self.tamano_total - pendiente
+        if not pendiente:
+            self._completar()
+        return self.recibido
+
+    def _completar(self):
+        """Mueve el archivo al almacén por su hash y crea el adjunto sin volver a leerlo en memoria.
+
+        Si el almacén ya tiene ese contenido (subido antes a cualquier ticket o comentario) el temporal se
+        descarta y el adjunto nuevo apunta al mismo archivo. El recolector de ir.attachment solo borra un
+        archivo cuando ya ninguna fila lo referencia.
+        """
+        self.ensure_one()
+        # El destino se comprueba de nuevo al adjuntar, con los permisos del usuario que sube
+        self.env[self.res_model].browse(self.res_id).check_access('write')
+        Attachment = self.env['ir.attachment'].sudo()
+        ruta = self._ruta_temporal()
+        sha = hashlib.sha1()
+        with open(ruta, 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE_SUBIDA), b''):
+                sha.update(bloque)
+        checksum = sha.hexdigest()
+        # Misma ruta que ir.attachment._get_path, sin pasarle el contenido en memoria
+        fname = checksum[:2] + '/' + checksum
+        ruta_final = Attachment._full_path(fname)
+        os.makedirs(os.path.dirname(ruta_final), exist_ok=True)
+        if os.path.exists(ruta_final):
+            if not filecmp.cmp(ruta, ruta_final, shallow=False):
+                raise UserError('El adjunto colisiona con un archivo existente.')
+            os.unlink(ruta)
+        else:
+            os.replace(ruta, ruta_final)
+            # Si la transacción no se confirma, el recolector lo retira
+            Attachment._mark_for_gc(fname)
+        adjunto = Attachment.create({
+            'name': self.name,
+            'type': 'binary',
+            'mimetype': self.mimetype or 'application/octet-stream',
+            'res_model': self.res_model,
+            'res_id': self.res_id,
+        })
+        # create() descarta store_fname, checksum y file_size: se fijan en la fila ya creada
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE ir_attachment SET store_fname = %s, checksum = %s, file_size = %s, db_datas = NULL
+             WHERE id = %s
+        """, [fname, checksum, self.tamano_total, adjunto.id])
+        adjunto.invalidate_recordset(['store_fname', 'checksum', 'file_size', 'db_datas', 'raw', 'datas'])
+        if self.res_model == 'comentario.solicitud':
+            self.env['comentario.solicitud'].browse(self.res_id).attachment_ids = [(4, adjunto.id)]
+        self.sudo().write({'estado': 'completada', 'attachment_id': adjunto.id})
+
+    @api.model
+    def limpiar_subidas(self):
+        """Borra las subidas abandonadas y las imágenes reducidas cuyo contenido ya no tiene adjuntos"""
+        limite = fields.Datetime.now() - timedelta(hours=HORAS_SUBIDA_ABANDONADA)
+        abandonadas = self.search([('estado', '=', 'en_curso'), ('create_date', '<', limite)])
+        for subida in abandonadas:
+            try:
+                os.unlink(subida._ruta_temporal())
+            except FileNotFoundError:
+                pass
+            except OSError:
+                _logger.warning('No se pudo borrar el temporal de la subida %s', subida.token, exc_info=True)
+        abandonadas.unlink()
+        self.search([('estado', '=', 'completada'), ('create_date', '<', limite)]).unlink()
+        self.env['miniatura.adjunto']._limpiar_huerfanas()
+        return True
+
+
+class MiniaturaAdjunto(models.Model):
+    _name = 'miniatura.adjunto'
+    _description = 'Imágenes reducidas de un contenido adjunto'
+    _rec_name = 'checksum'
+
+    # Una fila por contenido: los adjuntos duplicados comparten sus imágenes reducidas
+    checksum = fields.Char(string='Hash del Contenido', required=True, readonly=True, index=True)
+    miniatura = fields.Binary(string='Miniatura', attachment=True, readonly=True)
+    vista_previa = fields.Binary(string='Vista Previa', attachment=True, readonly=True)
+
+    _sql_constraints = [
+        ('checksum_unico', 'unique(checksum)', 'Ya existen imágenes reducidas para este contenido.'),
+    ]
+
+    @api.model
+    def _obtener(self, adjunto, tamano):
+        """Imagen reducida de `adjunto` (bytes), generándola la primera vez que se pide para su contenido"""
+        cache = self.sudo().search([('checksum', '=', adjunto.checksum)], limit=1)
+        if not cache:
+            # Única lectura y decodificación de la imagen original
+            datos = {campo: tools.image_process(adjunto.raw, size=medidas, verify_resolution=True)
+                     for campo, medidas in TAMANOS_MINIATURA.items()}
+            try:
+                with self.env.cr.savepoint():
+                    cache = self.sudo().create({'checksum': adjunto.checksum, **{
+                        campo: base64.b64encode(imagen) for campo, imagen in datos.items()}})
+            except psycopg2.errors.UniqueViolation:
+                # Otra petición la generó a la vez
+                cache = self.sudo().search([('checksum', '=', adjunto.checksum)], limit=1)
+        return base64.b64decode(cache[tamano]) if cache[tamano] else b''
+
+    @api.model
+    def _limpiar_huerfanas(self):
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT m.id FROM miniatura_adjunto m
+             WHERE NOT EXISTS (SELECT 1 FROM ir_attachment a
+                                WHERE a.checksum = m.checksum AND a.res_model IS DISTINCT FROM 'miniatura.adjunto')
+        """)
+        self.browse([row[0] for row in self.env.cr.fetchall()]).unlink()
+
+
+class IrAttachment(models.Model):
+    _inherit = 'ir.attachment'
+
+    miniatura_url = fields.Char(string='Miniatura', compute='_compute_miniatura_url')
+
+    @api.depends('mimetype', 'checksum')
+    def _compute_miniatura_url(self):
+        # Solo la URL: la imagen se reduce cuando el navegador la pide (ver controllers/adjuntos.py)
+        for record in self:
+            es_imagen = record.mimetype in MIMETYPES_MINIATURA and record.checksum
+            record.miniatura_url = f'/solicitud_interna/adjunto/{record.id}/miniatura?unique={record.checksum}' \
+                if es_imagen else False
+
+
+class ReporteAlmacenamientoAdjunto(models.Model):
+    _name = 'reporte.almacenamiento.adjunto'
+    _description = 'Ahorro de almacenamiento por contenido de adjuntos de tickets'
+    _auto = False
+    _order = 'ahorro_mb desc'
+    _rec_name = 'name'
+
+    archivo = fields.Char(string='Archivo en el Almacén', readonly=True)
+    name = fields.Char(string='Nombre', readonly=True)
+    mimetype = fields.Char(string='Tipo MIME', readonly=True)
+    referencias = fields.Integer(string='Referencias', readonly=True,
+                                 help='Adjuntos que comparten el archivo; el recolector lo conserva mientras haya alguno')
+    referencias_tickets = fields.Integer(string='En Tickets y Comentarios', readonly=True)
+    tamano_mb = fields.Float(string='Tamaño (MB)', readonly=True)
+    tamano_logico_mb = fields.Float(string='Tamaño sin Deduplicar (MB)', readonly=True)
+    ahorro_mb = fields.Float(string='Ahorro (MB)', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                WITH modulo AS (
+                    SELECT id FROM ir_attachment
+                     WHERE res_model IN ('solicitud.interna', 'comentario.solicitud', 'solicitud.archivada')
+                    UNION
+                    SELECT ir_attachment_id FROM comentario_solicitud_ir_attachment_rel
+                )
+                SELECT min(a.id) AS id,
+                       a.store_fname AS archivo,
+                       min(a.name) AS name,
+                       min(a.mimetype) AS mimetype,
+                       count(*) AS referencias,
+                       count(m.id) AS referencias_tickets,
+                       max(a.file_size) / 1048576.0 AS tamano_mb,
+                       max(a.file_size) * count(*) / 1048576.0 AS tamano_logico_mb,
+                       max(a.file_size) * (count(*) - 1) / 1048576.0 AS ahorro_mb
+                  FROM ir_attachment a
+             LEFT JOIN modulo m ON m.id = a.id
+                 WHERE a.store_fname IS NOT NULL
+              GROUP BY a.store_fname
+                HAVING count(m.id) > 0
+            )
+        """)
@@ -0,0 +1,231 @@
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from collections import defaultdict
+from datetime import datetime, timedelta
+import base64
+import json
+
+# Tamaño de página por defecto y máximo de la API
+LIMITE_API = 500
+LIMITE_MAXIMO_API = 5000
+
+# Campos que se devuelven si la petición no elige (selección dispersa con `campos`)
+CAMPOS_API = ['numero_ticket', 'name', 'category', 'state', 'prioridad_id', 'departamento_id', 'solicitante_id',
+              'gestor_id', 'fecha_solicitud', 'fecha_limite', 'fecha_resolucion', 'fecha_cierre']
+
+# Tipos de campo que no se sirven por la API: se piden por sus propias rutas
+TIPOS_EXCLUIDOS_API = ('binary', 'one2many', 'many2many')
+
+# Días que se conservan las bajas; un cursor más antiguo obliga a resincronizar
+PARAMETRO_DIAS_BAJAS = 'solicitud_interna.dias_bajas_api'
+
+
+def limite_api(limite):
+    return min(int(limite or LIMITE_API), LIMITE_MAXIMO_API)
+
+
+class CursorCaducado(UserError):
+    """El cursor de sincronización es anterior a las bajas conservadas"""
+
+
+class BajaSolicitud(models.Model):
+    _name = 'baja.solicitud'
+    _description = 'Ticket eliminado o archivado (para la sincronización incremental)'
+    _order = 'fecha, id'
+    _rec_name = 'numero_ticket'
+
+    solicitud_id = fields.Integer(string='ID del Ticket', required=True, readonly=True)
+    numero_ticket = fields.Char(string='Número de Ticket', readonly=True)
+    motivo = fields.Selection([
+        ('eliminado', 'Eliminado'),
+        ('archivado', 'Archivado'),
+    ], string='Motivo', required=True, readonly=True)
+    fecha = fields.Datetime(string='Fecha', required=True, readonly=True, default=fields.Datetime.now)
+
+    def init(self):
+        # La API pagina por create_date, la hora de inicio de la transacción, como write_date en los tickets
+        tools.create_index(self.env.cr, 'baja_solicitud_sincronizacion_idx', self._table, ['create_date', 'id'])
+
+    @api.model
+    def purgar(self):
+        """Borra las bajas más antiguas que el plazo de retención (llamado por el cron)"""
+        self.env.cr.execute("DELETE FROM baja_solicitud WHERE create_date < %s", [self._limite_retencion()])
+        return True
+
+    @api.model
+    def _limite_retencion(self):
+        dias = int(self.env['ir.config_parameter'].sudo().get_param(PARAMETRO_DIAS_BAJAS, 90))
+        return fields.Datetime.now() - timedelta(days=dias)
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    def init(self):
+        super(SolicitudInterna, self).init()
+        # Paginación por clave de la API: cada página es un recorrido de rango del índice
+        tools.create_index(self.env.cr, 'solicitud_interna_sincronizacion_idx', self._table, ['write_date', 'id'])
+
+    def unlink(self):
+        bajas = [{'solicitud_id': record.id, 'numero_ticket': record.numero_ticket,
+                  'motivo': 'archivado' if self.env.context.get('archivando_solicitudes') else 'eliminado'}
+                 for record in self]
+        res = super(SolicitudInterna, self).unlink()
+        self.env['baja.solicitud'].sudo().create(bajas)
+        return res
+
+
+class HistorialEstadoSolicitud(models.Model):
+    _inherit = 'historial.estado.solicitud'
+
+    def init(self):
+        # fecha_cambio puede venir del cliente o de una importación: la API pagina por create_date
+        tools.create_index(self.env.cr, 'historial_estado_solicitud_sincronizacion_idx', self._table,
+                           ['create_date', 'id'])
+
+
+class ApiSolicitud(models.AbstractModel):
+    _name = 'api.solicitud'
+    _description = 'API JSON de tickets con paginación por clave'
+
+    @api.model
+    def _horizonte(self):
+        """Marca hasta la que los cambios son definitivos.
+
+        write_date y create_date son la hora de inicio de la transacción que escribe: una transacción que siga
+        abierta puede confirmar después filas con una marca anterior a las ya servidas. Solo se sirven las
+        filas anteriores al inicio de la transacción abierta más antigua (o a la propia).
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT LEAST(min(xact_start) AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC')
+              FROM pg_stat_activity
+             WHERE datname = current_database() AND pid <> pg_backend_pid() AND xact_start IS NOT NULL
+        """)
+        return self.env.cr.fetchone()[0]
+
+    @staticmethod
+    def _codificar_cursor(posiciones):
+        # Con microsegundos: las filas de una misma transacción comparten la marca hasta el microsegundo
+        texto = json.dumps([[marca and marca.isoformat(), registro_id] for marca, registro_id in posiciones])
+        return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _decodificar_cursor(cursor, posiciones):
+        """Lista de `posiciones` pares (marca, id); vacía o inválida, el principio de la tabla"""
+        if not cursor:
+            return [(None, 0)] * posiciones
+        try:
+            pares = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            assert len(pares) == posiciones
+            return [(datetime.fromisoformat(marca) if marca else None, int(registro_id))
+                    for marca, registro_id in pares]
+        except (ValueError, TypeError, AssertionError):
+            raise UserError('Cursor no válido.')
+
+    @api.model
+    def _campos(self, campos):
+        """Nombres de campo pedidos (texto separado por comas o lista), validados; siempre con id y write_date"""
+        if isinstance(campos, str):
+            campos = [campo.strip() for campo in campos.split(',') if campo.strip()]
+        campos = campos or CAMPOS_API
+        Solicitud = self.env['solicitud.interna']
+        invalidos = [campo for campo in campos
+                     if campo not in Solicitud._fields or Solicitud._fields[campo].type in TIPOS_EXCLUIDOS_API]
+        if invalidos:
+            raise UserError(f'Campos no disponibles en la API: {", ".join(invalidos)}')
+        return ['id', 'write_date'] + [campo for campo in campos if campo not in ('id', 'write_date')]
+
+    @api.model
+    def _pagina(self, modelo, campo_marca, dominio, desde, hasta, limite, campos):
+        """Registros con (campo_marca, id) > desde y campo_marca < hasta, en orden de clave.
+
+        La clave se compara en SQL con las marcas completas (microsegundos incluidos); el dominio y las
+        reglas de acceso los aplica el ORM.
+        """
+        Modelo = self.env[modelo]
+        query = Modelo._search(dominio, order=f'{campo_marca}, id', limit=limite_api(limite))
+        columna_marca = SQL.identifier(Modelo._table, campo_marca)
+        columna_id = SQL.identifier(Modelo._table, 'id')
+        query.add_where(SQL("%s < %s", columna_marca, hasta))
+        if desde[0] is not None:
+            query.add_where(SQL("(%s, %s) > (%s, %s)", columna_marca, columna_id, desde[0], desde[1]))
+        claves = self.env.execute_query(query.select(columna_id, columna_marca))
+        filas = Modelo.browse([registro_id for registro_id, _marca in claves]).read(campos, load=None)
+        siguiente = (claves[-1][1], claves[-1][0]) if claves else desde
+        return filas, siguiente
+
+    @api.model
+    def listar(self, cursor=None, limite=None, campos=None, dominio=None):
+        """Página de tickets en orden (write_date, id) a partir del cursor"""
+        campos = self._campos(campos)
+        desde, = self._decodificar_cursor(cursor, 1)
+        filas, siguiente = self._pagina('solicitud.interna', 'write_date', list(dominio or []), desde,
+                                        self._horizonte(), limite, campos)
+        return {'tickets': filas, 'cursor': self._codificar_cursor([siguiente]) if filas else cursor,
+                'completo': len(filas) < limite_api(limite)}
+
+    @api.model
+    def cambios(self, cursor=None, limite=None, campos=None):
+        """Tickets modificados y bajas desde el cursor; `completo` indica que no queda nada pendiente.
+
+        El cursor guarda una posición por cada secuencia (tickets y bajas). Sin cursor se devuelve la
+        tabla completa y ninguna baja; con un cursor anterior a las bajas conservadas se lanza
+        CursorCaducado y el cliente debe volver a sincronizar desde cero.
+        """
+        campos = self._campos(campos)
+        hasta = self._horizonte()
+        pos_tickets, pos_bajas = self._decodificar_cursor(cursor, 2)
+        if not cursor:
+            # La primera sincronización recorre la tabla completa: las bajas cuentan desde ahora
+            pos_bajas = (hasta, 0)
+        elif pos_bajas[0] < self.env['baja.solicitud']._limite_retencion():
+            raise CursorCaducado('El cursor es anterior a las bajas conservadas: sincronice de nuevo sin cursor.')
+        tickets, pos_tickets = self._pagina('solicitud.interna', 'write_date', [], pos_tickets, hasta, limite, campos)
+        bajas, pos_bajas = self.sudo()._pagina('baja.solicitud', 'create_date', [], pos_bajas, hasta, limite,
+                                               ['solicitud_id', 'numero_ticket', 'motivo', 'fecha'])
+        return {
+            'tickets': tickets,
+            'bajas': bajas,
+            'cursor': self._codificar_cursor([pos_tickets, pos_bajas]),
+            'completo': len(tickets) < limite_api(limite) and len(bajas) < limite_api(limite),
+        }
+
+    @api.model
+    def historial(self, solicitud_ids=None, cursor=None, limite=None):
+        """Cambios de estado en orden de registro (create_date, id), opcionalmente de unos tickets.
+
+        No se pagina por fecha_cambio: la puede fijar quien escribe o venir de una importación, y una fila
+        confirmada con una fecha anterior al cursor ya entregado no se enviaría nunca.
+        """
+        desde, = self._decodificar_cursor(cursor, 1)
+        dominio = [('solicitud_id', 'in', solicitud_ids)] if solicitud_ids else []
+        filas, siguiente = self._pagina(
+            'historial.estado.solicitud', 'create_date', dominio, desde, self._horizonte(), limite,
+            ['solicitud_id', 'fecha_cambio', 'estado_anterior', 'estado_nuevo', 'usuario_id', 'tiempo_en_estado',
+             'comentario'])
+        return {'historial': filas, 'cursor': self._codificar_cursor([siguiente]) if filas else cursor,
+                'completo': len(filas) < limite_api(limite)}
+
+    @api.model
+    def lote(self, crear=None, transiciones=None, comentarios=None):
+        """Escrituras en bloque en una sola transacción: creación, transiciones y comentarios.
+
+        transiciones: [{'accion': ..., 'ids': [...]}]; cada acción se aplica a todos sus tickets a la vez y
+        devuelve sus éxitos y errores por ticket. Cualquier otro error deshace la llamada completa.
+        """
+        resultado = {}
+        if crear:
+            resultado['creados'] = self.env['solicitud.interna'].create(list(crear)).ids
+        if transiciones:
+            ids_por_accion = defaultdict(list)
+            for transicion in transiciones:
+                ids_por_accion[transicion['accion']] += transicion.get('ids') or []
+            resultado['transiciones'] = {
+                accion: self.env['solicitud.interna'].browse(ids).exists().transicion_en_lote(accion)
+                for accion, ids in ids_por_accion.items()
+            }
+        if comentarios:
+            resultado['comentarios'] = self.env['comentario.solicitud'].create(list(comentarios)).ids
+        return resultado
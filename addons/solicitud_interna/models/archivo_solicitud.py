@@ -0,0 +1,215 @@
+from odoo import models, fields, api, tools
+from dateutil.relativedelta import relativedelta
+from markupsafe import Markup, escape
+import threading
+
+from .busqueda_solicitud import dominio_texto_completo
+
+# Estados definitivos que pasan al archivo pasado el plazo de retención
+ESTADOS_ARCHIVABLES = ('cerrado', 'cancelado')
+
+# Columnas que se copian tal cual de solicitud_interna a solicitud_archivada
+COLUMNAS_ARCHIVO = (
+    'numero_ticket', 'name', 'category', 'subcategory', 'state',
+    'fecha_solicitud', 'fecha_asignacion', 'fecha_inicio', 'fecha_limite', 'fecha_resolucion', 'fecha_cierre',
+    'solicitante_id', 'gestor_id', 'supervisor_id', 'departamento_id', 'tipo_material_id', 'prioridad_id',
+    'proveedor_id', 'description', 'solucion', 'comentarios', 'costo_estimado', 'costo_real',
+    'tiempo_resolucion', 'puntuacion_satisfaccion', 'sla_incumplido', 'documento_busqueda',
+    'create_uid', 'create_date',
+)
+
+
+class SolicitudArchivada(models.Model):
+    _name = 'solicitud.archivada'
+    _description = 'Ticket archivado'
+    _order = 'fecha_solicitud desc'
+    _rec_name = 'numero_ticket'
+
+    solicitud_origen_id = fields.Integer(string='ID Original', readonly=True, index=True)
+    numero_ticket = fields.Char(string='Número de Ticket', readonly=True)
+    name = fields.Char(string='Título', readonly=True)
+    category = fields.Selection(selection=lambda self: self.env['solicitud.interna']._fields['category'].selection,
+                                string='Categoría', readonly=True)
+    subcategory = fields.Char(string='Subcategoría', readonly=True)
+    state = fields.Selection(selection=lambda self: self.env['solicitud.interna']._fields['state'].selection,
+                             string='Estado', readonly=True)
+
+    fecha_solicitud = fields.Datetime(string='Fecha de Solicitud', readonly=True)
+    fecha_asignacion = fields.Datetime(string='Fecha de Asignación', readonly=True)
+    fecha_inicio = fields.Datetime(string='Fecha de Inicio', readonly=True)
+    fecha_limite = fields.Datetime(string='Fecha Límite', readonly=True)
+    fecha_resolucion = fields.Datetime(string='Fecha de Resolución', readonly=True)
+    fecha_cierre = fields.Datetime(string='Fecha de Cierre', readonly=True)
+    fecha_archivo = fields.Datetime(string='Fecha de Archivo', readonly=True)
+
+    solicitante_id = fields.Many2one('res.users', string='Solicitante', readonly=True, index=True)
+    gestor_id = fields.Many2one('res.users', string='Gestor Asignado', readonly=True, index=True)
+    supervisor_id = fields.Many2one('res.users', string='Supervisor', readonly=True)
+    departamento_id = fields.Many2one('departamento.solicitud', string='Departamento', readonly=True, index=True)
+    tipo_material_id = fields.Many2one('tipo.material', string='Tipo de Material', readonly=True)
+    prioridad_id = fields.Many2one('prioridad.solicitud', string='Prioridad', readonly=True)
+    proveedor_id = fields.Many2one('proveedor.servicio', string='Proveedor de Servicio', readonly=True)
+
+    description = fields.Html(string='Descripción', readonly=True, prefetch='cuerpo_html')
+    solucion = fields.Html(string='Solución Aplicada', readonly=True, prefetch='cuerpo_html')
+    comentarios = fields.Text(string='Comentarios Internos', readonly=True)
+    costo_estimado = fields.Float(string='Costo Estimado', readonly=True)
+    costo_real = fields.Float(string='Costo Real', readonly=True)
+    tiempo_resolucion = fields.Float(string='Tiempo de Resolución (horas)', readonly=True)
+    puntuacion_satisfaccion = fields.Selection(
+        selection=lambda self: self.env['solicitud.interna']._fields['puntuacion_satisfaccion'].selection,
+        string='Puntuación de Satisfacción', readonly=True)
+    sla_incumplido = fields.Boolean(string='SLA Incumplido', readonly=True)
+
+    # Filas dependientes del ticket, congeladas en el momento de archivar
+    historial = fields.Json(string='Historial de Estados', readonly=True)
+    comentarios_detalle = fields.Json(string='Comentarios', readonly=True)
+    encuestas = fields.Json(string='Encuestas de Satisfacción', readonly=True)
+    mensajes = fields.Json(string='Mensajes', readonly=True)
+    registro_html = fields.Html(string='Registro', compute='_compute_registro_html', sanitize=False)
+    attachment_ids = fields.One2many('ir.attachment', 'res_id', domain=[('res_model', '=', 'solicitud.archivada')],
+                                     string='Adjuntos', readonly=True)
+
+    busqueda_texto = fields.Char(string='Texto Completo', compute='_compute_busqueda_texto',
+                                 search='_search_busqueda_texto')
+
+    _sql_constraints = [
+        ('solicitud_origen_unica', 'unique(solicitud_origen_id)', 'El ticket ya está archivado.'),
+    ]
+
+    def init(self):
+        cr = self.env.cr
+        # Copia del documento de búsqueda del ticket, para que el archivo admita la misma búsqueda de texto
+        cr.execute(f"ALTER TABLE {self._table} ADD COLUMN IF NOT EXISTS documento_busqueda tsvector")
+        tools.create_index(cr, 'solicitud_archivada_documento_busqueda_idx', self._table,
+                           ['documento_busqueda'], method='gin')
+        tools.create_index(cr, 'solicitud_archivada_fecha_solicitud_idx', self._table, ['fecha_solicitud DESC'])
+
+    def _compute_busqueda_texto(self):
+        self.busqueda_texto = False
+
+    def _search_busqueda_texto(self, operator, value):
+        return dominio_texto_completo(self, operator, value)
+
+    @api.depends('historial', 'comentarios_detalle', 'mensajes')
+    def _compute_registro_html(self):
+        usuarios = self.env['res.users'].sudo()
+        for record in self:
+            partes = []
+            if record.historial:
+                partes.append(Markup('<h4>Historial de Estados</h4><ul>'))
+                for cambio in record.historial:
+                    partes.append(Markup('<li>%s: %s → %s (%s)</li>') % (
+                        cambio['fecha'], cambio['anterior'] or '-', cambio['nuevo'],
+                        usuarios.browse(cambio['usuario_id']).name or '-'))
+                partes.append(Markup('</ul>'))
+            if record.comentarios_detalle:
+                partes.append(Markup('<h4>Comentarios</h4>'))
+                for comentario in record.comentarios_detalle:
+                    partes.append(Markup('<p><strong>%s - %s</strong></p>%s') % (
+                        usuarios.browse(comentario['usuario_id']).name or '-', comentario['fecha'],
+                        Markup(comentario['comentario'] or '')))
+            if record.mensajes:
+                partes.append(Markup('<h4>Mensajes</h4><ul>'))
+                for mensaje in record.mensajes:
+                    cambios = ', '.join(f"{cambio['campo']}: {cambio['anterior'] or '-'} → {cambio['nuevo'] or '-'}"
+                                        for cambio in mensaje.get('cambios') or [])
+                    # Mensajes del seguimiento compacto: diff {campo: [anterior, nuevo]} sin decodificar
+                    cambios += ', '.join(f"{campo}: {anterior or '-'} → {nuevo or '-'}"
+                                         for campo, (anterior, nuevo) in (mensaje.get('seguimiento') or {}).items())
+                    partes.append(Markup('<li>%s %s: %s %s</li>') % (
+                        mensaje['fecha'], mensaje['autor'] or '', Markup(mensaje['cuerpo'] or ''), escape(cambios)))
+                partes.append(Markup('</ul>'))
+            record.registro_html = Markup('').join(partes)
+
+    @api.model
+    def archivar_solicitudes(self, meses=None, tamano_lote=200):
+        """Mueve al archivo los tickets cerrados o cancelados hace más de `meses` meses.
+
+        Cada lote se copia, se desvincula de la tabla activa y se confirma por separado, de modo que si el
+        proceso se interrumpe la siguiente ejecución continúa con los tickets que aún no se movieron.
+        """
+        if meses is None:
+            meses = int(self.env['ir.config_parameter'].sudo().get_param('solicitud_interna.meses_archivo', 12))
+        if meses <= 0:
+            return 0
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        limite = fields.Datetime.now() - relativedelta(months=meses)
+        total = 0
+        while True:
+            self.env.flush_all()
+            self.env.cr.execute("""
+                SELECT id FROM solicitud_interna
+                 WHERE state IN %s
+                   AND COALESCE(fecha_cierre, write_date) < %s
+              ORDER BY id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, [ESTADOS_ARCHIVABLES, limite, tamano_lote])
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                break
+            total += len(self._archivar_lote(ids))
+            if auto_commit:
+                self.env.cr.commit()
+            if len(ids) < tamano_lote:
+                break
+        return total
+
+    @api.model
+    def _archivar_lote(self, ids):
+        """Copia los tickets y sus filas dependientes al archivo con un solo INSERT ... SELECT y los elimina"""
+        columnas = ', '.join(COLUMNAS_ARCHIVO)
+        origen = ', '.join(f's.{columna}' for columna in COLUMNAS_ARCHIVO)
+        self.env.cr.execute(f"""
+            INSERT INTO solicitud_archivada
+                   (solicitud_origen_id, {columnas}, historial, comentarios_detalle, encuestas, mensajes,
+                    fecha_archivo, write_uid, write_date)
+            SELECT s.id, {origen},
+                   (SELECT jsonb_agg(jsonb_build_object(
+                               'fecha', h.fecha_cambio, 'anterior', h.estado_anterior, 'nuevo', h.estado_nuevo,
+                               'usuario_id', h.usuario_id, 'comentario', h.comentario, 'horas', h.tiempo_en_estado)
+                           ORDER BY h.fecha_cambio, h.id)
+                      FROM historial_estado_solicitud h WHERE h.solicitud_id = s.id),
+                   (SELECT jsonb_agg(jsonb_build_object(
+                               'fecha', c.fecha, 'usuario_id', c.usuario_id, 'tipo', c.tipo, 'comentario', c.comentario)
+                           ORDER BY c.fecha, c.id)
+                      FROM comentario_solicitud c WHERE c.solicitud_id = s.id),
+                   (SELECT jsonb_agg(jsonb_build_object(
+                               'fecha', e.fecha, 'usuario_id', e.usuario_id, 'general', e.puntuacion_general,
+                               'tiempo', e.puntuacion_tiempo, 'calidad', e.puntuacion_calidad,
+                               'recomendaria', e.recomendaria, 'comentario', e.comentario)
+                           ORDER BY e.fecha, e.id)
+                      FROM encuesta_satisfaccion e WHERE e.solicitud_id = s.id),
+                   (SELECT jsonb_agg(jsonb_build_object(
+                               'fecha', m.date, 'autor', p.name, 'tipo', m.message_type, 'cuerpo', m.body,
+                               'cambios', (SELECT jsonb_agg(jsonb_build_object(
+                                                      'campo', COALESCE(f.field_description->>'es_ES',
+                                                                        f.field_description->>'en_US'),
+                                                      'anterior', t.old_value_char, 'nuevo', t.new_value_char))
+                                             FROM mail_tracking_value t
+                                             JOIN ir_model_fields f ON f.id = t.field_id
+                                            WHERE t.mail_message_id = m.id),
+                               'seguimiento', m.seguimiento_compacto)
+                           ORDER BY m.date, m.id)
+                      FROM mail_message m
+                 LEFT JOIN res_partner p ON p.id = m.author_id
+                     WHERE m.model = 'solicitud.interna' AND m.res_id = s.id),
+                   now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+              FROM solicitud_interna s
+             WHERE s.id = ANY(%s)
+         RETURNING solicitud_origen_id, id
+        """, [self.env.uid, ids])
+        correspondencia = dict(self.env.cr.fetchall())
+        # Los adjuntos del ticket pasan a colgar del registro archivado
+        self.env.cr.execute("""
+            UPDATE ir_attachment a
+               SET res_model = 'solicitud.archivada', res_id = v.nuevo
+              FROM unnest(%s::int[], %s::int[]) AS v(origen, nuevo)
+             WHERE a.res_model = 'solicitud.interna' AND a.res_id = v.origen
+        """, [list(correspondencia), list(correspondencia.values())])
+        self.env['ir.attachment'].invalidate_model(['res_model', 'res_id'])
+        # unlink elimina mensajes, seguidores, actividades y, en cascada, historial, comentarios y encuestas
+        self.env['solicitud.interna'].sudo().with_context(archivando_solicitudes=True) \
+            .browse(list(correspondencia)).unlink()
+        return correspondencia
@@ -0,0 +1,290 @@
+from odoo import models, fields, api, tools
+from odoo.exceptions import AccessError, UserError
+from collections import defaultdict
+import threading
+import time
+
+# Estados en los que un ticket cuenta en la carga de su gestor (peso: prioridad_nivel)
+ESTADOS_CARGA = ('pendiente', 'asignado', 'en_proceso', 'esperando_respuesta')
+
+# Segundos que un worker usa su índice de carga antes de releerlo de la base de datos
+SEGUNDOS_INDICE_CARGA = 60
+
+# Primer entero de los bloqueos consultivos de asignación; el segundo es el id del gestor
+ESPACIO_BLOQUEO_ASIGNACION = 7301
+
+# Clave de cr.postcommit.data con los deltas de carga {gestor_id: peso} de la transacción en curso
+CLAVE_CARGA_PENDIENTE = 'solicitud_interna.carga_pendiente'
+
+# Intentos de tomar_siguiente cuando el ticket reclamado no admite la asignación (p. ej. sin stock)
+INTENTOS_TOMAR_SIGUIENTE = 5
+
+# Índice de carga de este worker por base de datos: {db: (instante de lectura, {gestor_id: carga})}
+_indices_carga = {}
+_bloqueo_indices = threading.Lock()
+
+
+class ReglaAsignacion(models.Model):
+    _name = 'regla.asignacion'
+    _description = 'Regla de asignación automática de gestores'
+    _order = 'secuencia, id'
+
+    name = fields.Char(string='Nombre', required=True)
+    secuencia = fields.Integer(string='Secuencia', default=10)
+    # Vacíos = cualquiera; se aplica la regla más específica (departamento y categoría antes que uno solo)
+    departamento_id = fields.Many2one('departamento.solicitud', string='Departamento')
+    category = fields.Selection(selection=lambda self: self.env['solicitud.interna']._fields['category'].selection,
+                                string='Categoría')
+    gestor_ids = fields.Many2many('res.users', string='Gestores', required=True,
+                                  domain=lambda self: [('groups_id', 'in', self.env.ref('solicitud_interna.group_gestor').id)])
+    asignar_al_crear = fields.Boolean(string='Asignar al Crear', default=True,
+                                      help='Rellena el gestor de los tickets nuevos; si no, solo al pulsar Asignar')
+    activo = fields.Boolean(string='Activo', default=True)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        reglas = super(ReglaAsignacion, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return reglas
+
+    def write(self, vals):
+        res = super(ReglaAsignacion, self).write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super(ReglaAsignacion, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _mapa_reglas(self):
+        """{(departamento_id, categoría): (gestores, asignar_al_crear)} de las reglas activas, en caché por worker"""
+        mapa = {}
+        for regla in self.sudo().search([('activo', '=', True)]):
+            mapa.setdefault((regla.departamento_id.id or None, regla.category or None),
+                            (tuple(regla.gestor_ids.filtered('active').ids), regla.asignar_al_crear))
+        return mapa
+
+    @api.model
+    def _regla_para(self, departamento_id, category):
+        mapa = self._mapa_reglas()
+        for clave in ((departamento_id, category), (departamento_id, None), (None, category), (None, None)):
+            if clave in mapa:
+                return mapa[clave]
+        return None
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    def init(self):
+        super(SolicitudInterna, self).init()
+        # Lectura del índice de carga: solo recorre los tickets abiertos con gestor
+        tools.create_index(self.env.cr, 'solicitud_interna_carga_gestor_idx', self._table,
+                           ['gestor_id', 'prioridad_nivel'],
+                           where=f"gestor_id IS NOT NULL AND state IN {ESTADOS_CARGA}")
+        # Cola de tomar_siguiente: el orden del índice es el de la consulta, que lee una sola entrada
+        tools.create_index(self.env.cr, 'solicitud_interna_cola_idx', self._table,
+                           ['prioridad_nivel DESC', 'fecha_limite', 'fecha_solicitud'],
+                           where="state = 'pendiente' AND gestor_id IS NULL")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        if not self.env.context.get('sin_asignacion_automatica'):
+            niveles = {}
+            extra = defaultdict(float)
+            for vals in vals_list:
+                if vals.get('gestor_id') or vals.get('state', 'pendiente') != 'pendiente':
+                    continue
+                prioridad_id = vals.get('prioridad_id')
+                if prioridad_id not in niveles:
+                    niveles[prioridad_id] = self.env['prioridad.solicitud'].browse(prioridad_id).sudo().nivel or 1
+                gestor_id = self._elegir_gestor(vals.get('departamento_id'), vals.get('category'),
+                                                niveles[prioridad_id], extra, al_crear=True)
+                if gestor_id:
+                    vals['gestor_id'] = gestor_id
+        records = super(SolicitudInterna, self).create(vals_list)
+        records._registrar_carga(records._deltas_carga(1))
+        return records
+
+    def write(self, vals):
+        deltas = None
+        if any(campo in vals for campo in ('gestor_id', 'state', 'prioridad_id')):
+            deltas = self._deltas_carga(-1)
+        res = super(SolicitudInterna, self).write(vals)
+        if deltas is not None:
+            self._registrar_carga(self._deltas_carga(1, deltas))
+        return res
+
+    def unlink(self):
+        deltas = self._deltas_carga(-1)
+        res = super(SolicitudInterna, self).unlink()
+        self._registrar_carga(deltas)
+        return res
+
+    def _transicion_asignar(self):
+        self.filtered(lambda record: record.state == 'pendiente' and not record.gestor_id)._asignar_gestor_automatico()
+        return super(SolicitudInterna, self)._transicion_asignar()
+
+    @api.model
+    def tomar_siguiente(self):
+        """Reclama para el usuario actual el ticket pendiente sin gestor más prioritario y lo asigna.
+
+        Orden: prioridad_nivel, fecha_limite y fecha_solicitud. FOR UPDATE SKIP LOCKED salta los tickets que
+        otro gestor está reclamando en ese momento, así que los agentes simultáneos nunca esperan unos a otros
+        ni se llevan el mismo ticket. Devuelve el id del ticket o False si la cola está vacía.
+        """
+        if not (self.env.is_admin() or self.env.user.has_group('solicitud_interna.group_gestor')):
+            raise AccessError('Solo los gestores pueden tomar tickets de la cola.')
+        self.flush_model(['state', 'gestor_id', 'prioridad_nivel', 'fecha_limite', 'fecha_solicitud'])
+        descartados = []
+        for _intento in range(INTENTOS_TOMAR_SIGUIENTE):
+            self.env.cr.execute("""
+                SELECT id FROM solicitud_interna
+                 WHERE state = 'pendiente' AND gestor_id IS NULL AND NOT (id = ANY(%s))
+              ORDER BY prioridad_nivel DESC, fecha_limite, fecha_solicitud
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """, [descartados])
+            fila = self.env.cr.fetchone()
+            if not fila:
+                return False
+            ticket = self.browse(fila[0])
+            try:
+                with self.env.cr.savepoint():
+                    ticket.write({'gestor_id': self.env.uid})
+                    resumen = ticket._transicion_asignar()
+                    if not resumen['exito']:
+                        raise UserError(resumen['errores'][0]['error'])
+                return ticket.id
+            except UserError:
+                # No admite la asignación: se deshace y, bloqueado aún por esta transacción, se salta
+                self._registrar_carga({self.env.uid: -(ticket.prioridad_nivel or 1)})
+                descartados.append(ticket.id)
+        return False
+
+    def action_tomar_siguiente(self):
+        ticket_id = self.tomar_siguiente()
+        if not ticket_id:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {'title': 'Cola de tickets', 'message': 'No hay tickets pendientes sin gestor.',
+                           'type': 'info'},
+            }
+        return {
+            'type': 'ir.actions.act_window',
+            'name': 'Ticket',
+            'res_model': 'solicitud.interna',
+            'res_id': ticket_id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
+
+    def _asignar_gestor_automatico(self):
+        """Rellena gestor_id con el gestor menos cargado de la regla de cada ticket (sin regla, se queda vacío)"""
+        extra = defaultdict(float)
+        por_gestor = defaultdict(list)
+        for record in self:
+            gestor_id = self._elegir_gestor(record.departamento_id.id, record.category, record.prioridad_nivel or 1,
+                                            extra)
+            if gestor_id:
+                por_gestor[gestor_id].append(record.id)
+        for gestor_id, ids in por_gestor.items():
+            self.browse(ids).write({'gestor_id': gestor_id})
+
+    def _deltas_carga(self, signo, deltas=None):
+        """Acumula el peso de estos tickets abiertos en la carga de su gestor"""
+        if deltas is None:
+            deltas = defaultdict(float)
+        for record in self:
+            if record.gestor_id and record.state in ESTADOS_CARGA:
+                deltas[record.gestor_id.id] += signo * (record.prioridad_nivel or 1)
+        return deltas
+
+    def _registrar_carga(self, deltas):
+        """Suma los deltas a la transacción; pasan al índice del worker solo si la transacción se confirma"""
+        deltas = {gestor_id: delta for gestor_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        pendiente = self.env.cr.postcommit.data.get(CLAVE_CARGA_PENDIENTE)
+        if pendiente is None:
+            pendiente = self.env.cr.postcommit.data[CLAVE_CARGA_PENDIENTE] = defaultdict(float)
+            dbname = self.env.cr.dbname
+
+            @self.env.cr.postcommit.add
+            def aplicar_carga():
+                with _bloqueo_indices:
+                    indice = _indices_carga.get(dbname)
+                    if indice:
+                        for gestor_id, delta in pendiente.items():
+                            indice[1][gestor_id] = indice[1].get(gestor_id, 0) + delta
+        for gestor_id, delta in deltas.items():
+            pendiente[gestor_id] += delta
+
+    @api.model
+    def _carga_gestores(self):
+        """Función gestor_id -> carga abierta: índice del worker más los cambios aún sin confirmar de la transacción.
+
+        El índice se lee con un cursor propio (solo datos confirmados) y se renueva cada SEGUNDOS_INDICE_CARGA;
+        entre lecturas lo mantienen los deltas de las transacciones confirmadas en este worker.
+        """
+        dbname = self.env.cr.dbname
+        with _bloqueo_indices:
+            indice = _indices_carga.get(dbname)
+        if indice is None or time.monotonic() - indice[0] > SEGUNDOS_INDICE_CARGA:
+            with self.env.registry.cursor() as cr:
+                cr.execute("""
+                    SELECT gestor_id, sum(COALESCE(prioridad_nivel, 1))
+                      FROM solicitud_interna
+                     WHERE gestor_id IS NOT NULL AND state IN %s
+                  GROUP BY gestor_id
+                """, [ESTADOS_CARGA])
+                indice = (time.monotonic(), dict(cr.fetchall()))
+            with _bloqueo_indices:
+                _indices_carga[dbname] = indice
+        cargas = indice[1]
+        pendiente = self.env.cr.postcommit.data.get(CLAVE_CARGA_PENDIENTE) or {}
+        return lambda gestor_id: cargas.get(gestor_id, 0) + pendiente.get(gestor_id, 0)
+
+    @api.model
+    def _elegir_gestor(self, departamento_id, category, peso, extra, al_crear=False):
+        """Gestor de la regla con menos carga ponderada, o False.
+
+        extra acumula lo ya repartido en la misma llamada en lote. Cada candidato se reclama con un bloqueo
+        consultivo de transacción: si otra asignación concurrente ya tiene al menos cargado, se pasa al
+        siguiente, y así varios tickets creados a la vez no recaen todos en la misma persona. El coste
+        depende del número de gestores de la regla, no del tamaño de la tabla de tickets.
+        """
+        regla = self.env['regla.asignacion']._regla_para(departamento_id or None, category or None)
+        if not regla or not regla[0] or (al_crear and not regla[1]):
+            return False
+        carga = self._carga_gestores()
+        candidatos = sorted(regla[0], key=lambda gestor_id: (carga(gestor_id) + extra[gestor_id], gestor_id))
+        elegido = candidatos[0]
+        for gestor_id in candidatos:
+            self.env.cr.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", [ESPACIO_BLOQUEO_ASIGNACION, gestor_id])
+            if self.env.cr.fetchone()[0]:
+                elegido = gestor_id
+                break
+        extra[elegido] += peso
+        return elegido
+
+
+class PlantillaSolicitud(models.Model):
+    _inherit = 'plantilla.solicitud'
+
+    asignacion_automatica = fields.Boolean(
+        string='Asignación Automática',
+        help='Reparte los tickets de la plantilla con las reglas de asignación; el gestor por defecto queda '
+             'como respaldo si ninguna regla aplica')
+
+    def _valores_solicitud(self):
+        vals = super(PlantillaSolicitud, self)._valores_solicitud()
+        if self.asignacion_automatica:
+            gestor_id = self.env['solicitud.interna']._elegir_gestor(
+                self.departamento_id.id, self.category, self.prioridad_id.nivel or 1, defaultdict(float))
+            vals['gestor_id'] = gestor_id or vals['gestor_id']
+        return vals
@@ -0,0 +1,159 @@
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+
+# Configuración de búsqueda de texto de PostgreSQL (stemming en español)
+CONFIGURACION_TEXTO = 'spanish'
+
+# Campos de solicitud.interna que alimentan el documento de búsqueda
+CAMPOS_BUSQUEDA = ('numero_ticket', 'name', 'description', 'solucion')
+
+# Elimina etiquetas y entidades HTML antes de indexar
+SQL_TEXTO_PLANO = "regexp_replace(coalesce({}, ''), '<[^>]*>|&[a-z]+;', ' ', 'gi')"
+
+# Recalcula el documento de búsqueda de los tickets que cumplan {filtro}.
+# Pesos: A título y número, B descripción y solución, C comentarios.
+SQL_ACTUALIZAR_DOCUMENTO = f"""
+    UPDATE solicitud_interna s
+       SET documento_busqueda =
+           setweight(to_tsvector('{CONFIGURACION_TEXTO}', coalesce(s.numero_ticket, '') || ' ' || coalesce(s.name, '')), 'A') ||
+           setweight(to_tsvector('{CONFIGURACION_TEXTO}', {SQL_TEXTO_PLANO.format('s.description')}), 'B') ||
+           setweight(to_tsvector('{CONFIGURACION_TEXTO}', {SQL_TEXTO_PLANO.format('s.solucion')}), 'B') ||
+           setweight(to_tsvector('{CONFIGURACION_TEXTO}', c.texto), 'C')
+      FROM (SELECT t.id, coalesce(string_agg({SQL_TEXTO_PLANO.format('com.comentario')}, ' '), '') AS texto
+              FROM solicitud_interna t
+         LEFT JOIN comentario_solicitud com ON com.solicitud_id = t.id
+             WHERE {{filtro}}
+          GROUP BY t.id) c
+     WHERE s.id = c.id
+"""
+
+# Estados de los tickets que se proponen como referencia
+ESTADOS_SOLUCIONADOS = ('resuelto', 'cerrado')
+
+
+def dominio_texto_completo(modelo, operator, value):
+    """Dominio de búsqueda sobre la columna documento_busqueda del modelo (también la usa el archivo)"""
+    if operator not in ('ilike', '=', 'not ilike', '!=') or not isinstance(value, str):
+        raise UserError(f'Operación no admitida en la búsqueda de texto completo: {operator} {value!r}')
+    query = modelo._search([])
+    query.add_where(f"\"{modelo._table}\".documento_busqueda @@ websearch_to_tsquery('{CONFIGURACION_TEXTO}', %s)",
+                    [value])
+    return [('id', 'not in' if operator in ('not ilike', '!=') else 'in', query)]
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    # Campo de búsqueda sobre la columna tsvector documento_busqueda, creada y mantenida en SQL
+    busqueda_texto = fields.Char(string='Texto Completo', compute='_compute_busqueda_texto',
+                                 search='_search_busqueda_texto')
+    solicitudes_similares_ids = fields.Many2many('solicitud.interna', string='Tickets Similares Resueltos',
+                                                 compute='_compute_solicitudes_similares')
+
+    def init(self):
+        super(SolicitudInterna, self).init()
+        cr = self.env.cr
+        cr.execute(f"ALTER TABLE {self._table} ADD COLUMN IF NOT EXISTS documento_busqueda tsvector")
+        cr.execute(SQL_ACTUALIZAR_DOCUMENTO.format(filtro='t.documento_busqueda IS NULL'))
+        tools.create_index(cr, 'solicitud_interna_documento_busqueda_idx', self._table,
+                           ['documento_busqueda'], method='gin')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(SolicitudInterna, self).create(vals_list)
+        records._actualizar_documento_busqueda()
+        return records
+
+    def write(self, vals):
+        res = super(SolicitudInterna, self).write(vals)
+        if any(campo in vals for campo in CAMPOS_BUSQUEDA):
+            self._actualizar_documento_busqueda()
+        return res
+
+    def _actualizar_documento_busqueda(self):
+        """Recalcula el documento de búsqueda de estos tickets con una sola sentencia"""
+        if not self:
+            return
+        self.flush_recordset(list(CAMPOS_BUSQUEDA))
+        self.env['comentario.solicitud'].flush_model(['solicitud_id', 'comentario'])
+        self.env.cr.execute(SQL_ACTUALIZAR_DOCUMENTO.format(filtro='t.id = ANY(%s)'), [self.ids])
+
+    def _compute_busqueda_texto(self):
+        self.busqueda_texto = False
+
+    def _search_busqueda_texto(self, operator, value):
+        return dominio_texto_completo(self, operator, value)
+
+    @api.model
+    def buscar_texto_completo(self, consulta, limite=20):
+        """Devuelve los tickets que coinciden con la consulta ordenados por relevancia, con un fragmento resaltado"""
+        self.flush_model(list(CAMPOS_BUSQUEDA))
+        self.env.cr.execute(f"""
+            SELECT s.id, ts_rank_cd(s.documento_busqueda, q.consulta) AS rango,
+                   ts_headline('{CONFIGURACION_TEXTO}', {SQL_TEXTO_PLANO.format('s.description')}, q.consulta,
+                               'MaxFragments=2, MaxWords=20, MinWords=5') AS fragmento
+              FROM solicitud_interna s, websearch_to_tsquery('{CONFIGURACION_TEXTO}', %s) AS q(consulta)
+             WHERE s.documento_busqueda @@ q.consulta
+          ORDER BY rango DESC, s.id DESC
+             LIMIT %s
+        """, [consulta, limite])
+        filas = {fila[0]: fila[1:] for fila in self.env.cr.fetchall()}
+        # search aplica las reglas de acceso; el orden de relevancia se conserva desde la consulta
+        visibles = set(self.search([('id', 'in', list(filas))]).ids)
+        return [{
+            'id': record.id,
+            'numero_ticket': record.numero_ticket,
+            'name': record.name,
+            'state': record.state,
+            'rango': filas[record.id][0],
+            'fragmento': filas[record.id][1],
+        } for record in self.browse([ticket_id for ticket_id in filas if ticket_id in visibles])]
+
+    @api.depends('name', 'description')
+    def _compute_solicitudes_similares(self):
+        for record in self:
+            record.solicitudes_similares_ids = self.browse(record._buscar_similares()) if record.id else False
+
+    def _buscar_similares(self, limite=5, terminos=30):
+        """Tickets resueltos más parecidos, usando como consulta los términos del título y la descripción"""
+        self.ensure_one()
+        self.env.cr.execute(f"""
+            WITH consulta AS (
+                SELECT string_agg(quote_literal(lexema), ' | ')::tsquery AS q
+                  FROM (SELECT t.lexeme AS lexema
+                          FROM solicitud_interna s, unnest(s.documento_busqueda) AS t
+                         WHERE s.id = %s AND t.weights && ARRAY['A', 'B']
+                      ORDER BY array_length(t.positions, 1) DESC
+                         LIMIT %s) terminos
+            )
+            SELECT s.id
+              FROM solicitud_interna s, consulta
+             WHERE s.documento_busqueda @@ consulta.q
+               AND s.state IN %s AND s.id != %s
+          ORDER BY ts_rank_cd(s.documento_busqueda, consulta.q) DESC
+             LIMIT %s
+        """, [self.id, terminos, ESTADOS_SOLUCIONADOS, self.id, limite])
+        return [fila[0] for fila in self.env.cr.fetchall()]
+
+
+class ComentarioSolicitud(models.Model):
+    _inherit = 'comentario.solicitud'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(ComentarioSolicitud, self).create(vals_list)
+        records.solicitud_id._actualizar_documento_busqueda()
+        return records
+
+    def write(self, vals):
+        solicitudes = self.solicitud_id
+        res = super(ComentarioSolicitud, self).write(vals)
+        if 'comentario' in vals or 'solicitud_id' in vals:
+            (solicitudes | self.solicitud_id)._actualizar_documento_busqueda()
+        return res
+
+    def unlink(self):
+        solicitudes = self.solicitud_id
+        res = super(ComentarioSolicitud, self).unlink()
+        solicitudes.exists()._actualizar_documento_busqueda()
+        return res
@@ -0,0 +1,119 @@
+from odoo import models, api, tools
+from collections import Counter, OrderedDict, defaultdict
+import threading
+
+# Entradas por modelo en la caché de cada worker; al llenarse se descarta la usada hace más tiempo
+TAMANO_CACHE_REFERENCIAS = 1000
+
+# Aciertos y fallos por (base de datos, modelo) en este worker
+_estadisticas_cache = defaultdict(Counter)
+_bloqueo_cache = threading.Lock()
+
+
+class ReferenciaCacheadaMixin(models.AbstractModel):
+    _name = 'referencia.cacheada.mixin'
+    _description = 'Caché de lectura por worker para tablas de referencia'
+
+    # Columnas que sirve la caché; name alimenta display_name
+    _campos_cacheados = ('name',)
+
+    @api.model
+    @tools.ormcache('self._name')
+    def _cache_referencias(self):
+        """Diccionario LRU {id: {campo: valor}} del modelo.
+
+        Vive dentro del ormcache: registry.clear_cache() lo descarta en este worker y la señalización del
+        registro lo descarta en los demás al empezar su siguiente petición.
+        """
+        return OrderedDict()
+
+    def _valores_cacheados(self):
+        """{id: {campo: valor}} de estos registros; solo se leen de la base de datos los que faltan"""
+        ids = [registro_id for registro_id in self._ids if isinstance(registro_id, int)]
+        if not ids or self.env.context.get('sin_cache_referencias'):
+            return self._leer_referencias(ids)
+        cache = self._cache_referencias()
+        valores = {}
+        with _bloqueo_cache:
+            for registro_id in ids:
+                if registro_id in cache:
+                    cache.move_to_end(registro_id)
+                    valores[registro_id] = cache[registro_id]
+            faltan = [registro_id for registro_id in ids if registro_id not in valores]
+            estadisticas = _estadisticas_cache[(self.env.cr.dbname, self._name)]
+            estadisticas['aciertos'] += len(valores)
+            estadisticas['fallos'] += len(faltan)
+        if faltan:
+            leidos = self._leer_referencias(faltan)
+            with _bloqueo_cache:
+                cache.update(leidos)
+                while len(cache) > TAMANO_CACHE_REFERENCIAS:
+                    cache.popitem(last=False)
+            valores.update(leidos)
+        return valores
+
+    def _leer_referencias(self, ids):
+        if not ids:
+            return {}
+        self.flush_model(self._campos_cacheados)
+        columnas = ', '.join(f'"{campo}"' for campo in self._campos_cacheados)
+        self.env.cr.execute(f'SELECT id, {columnas} FROM "{self._table}" WHERE id = ANY(%s)', [list(ids)])
+        return {fila[0]: dict(zip(self._campos_cacheados, fila[1:])) for fila in self.env.cr.fetchall()}
+
+    @api.depends('name')
+    def _compute_display_name(self):
+        valores = self._valores_cacheados()
+        for record in self:
+            if record.id in valores:
+                record.display_name = valores[record.id]['name'] or ''
+        pendientes = self.filtered(lambda record: record.id not in valores)
+        if pendientes:
+            super(ReferenciaCacheadaMixin, pendientes)._compute_display_name()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(ReferenciaCacheadaMixin, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super(ReferenciaCacheadaMixin, self).write(vals)
+        # Las escrituras frecuentes de otras columnas (stock, contadores) no vacían la caché
+        if set(vals) & set(self._campos_cacheados):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super(ReferenciaCacheadaMixin, self).unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    def estadisticas_cache_referencias(self):
+        """{modelo: {'aciertos', 'fallos', 'entradas'}} de la caché del worker que atiende la llamada"""
+        with _bloqueo_cache:
+            estadisticas = {modelo: dict(contadores) for (dbname, modelo), contadores in _estadisticas_cache.items()
+                            if dbname == self.env.cr.dbname}
+        for modelo, contadores in estadisticas.items():
+            contadores['entradas'] = len(self.env[modelo]._cache_referencias())
+        return estadisticas
+
+
+class PrioridadSolicitud(models.Model):
+    _name = 'prioridad.solicitud'
+    _inherit = ['prioridad.solicitud', 'referencia.cacheada.mixin']
+
+
+class DepartamentoSolicitud(models.Model):
+    _name = 'departamento.solicitud'
+    _inherit = ['departamento.solicitud', 'referencia.cacheada.mixin']
+
+
+class TipoMaterial(models.Model):
+    _name = 'tipo.material'
+    _inherit = ['tipo.material', 'referencia.cacheada.mixin']
+
+
+class ProveedorServicio(models.Model):
+    _name = 'proveedor.servicio'
+    _inherit = ['proveedor.servicio', 'referencia.cacheada.mixin']
@@ -0,0 +1,215 @@
+from odoo import models, api
+from odoo.exceptions import UserError
+import csv
+import io
+import json
+import uuid
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATOS_EXPORTACION = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Filas leídas del cursor de servidor en cada vuelta: acota la memoria del proceso
+TAMANO_LOTE_EXPORTACION = 5000
+
+# Una fila por ticket con los nombres de sus referencias, su historial y el resumen de encuestas.
+# %(desde)s y %(hasta)s delimitan la exportación incremental por write_date: [desde, hasta).
+SQL_EXPORTACION = """
+    SELECT s.id, s.numero_ticket, s.name, s.category, s.subcategory, s.state,
+           s.fecha_solicitud, s.fecha_asignacion, s.fecha_inicio, s.fecha_limite,
+           s.fecha_resolucion, s.fecha_cierre,
+           ps.name AS solicitante, pg.name AS gestor, pv.name AS supervisor,
+           d.name AS departamento, d.codigo AS departamento_codigo,
+           p.name AS prioridad, s.prioridad_nivel, pr.name AS proveedor, tm.name AS tipo_material,
+           s.tiempo_resolucion, s.dias_pendiente, s.esta_vencido, s.sla_incumplido,
+           s.costo_estimado, s.costo_real, s.puntuacion_satisfaccion,
+           e.total AS encuestas, e.promedio_general AS encuesta_promedio_general,
+           e.recomendaria AS encuesta_recomendaria,
+           h.historial,
+           s.write_date
+      FROM solicitud_interna s
+ LEFT JOIN res_users us ON us.id = s.solicitante_id
+ LEFT JOIN res_partner ps ON ps.id = us.partner_id
+ LEFT JOIN res_users ug ON ug.id = s.gestor_id
+ LEFT JOIN res_partner pg ON pg.id = ug.partner_id
+ LEFT JOIN res_users uv ON uv.id = s.supervisor_id
+ LEFT JOIN res_partner pv ON pv.id = uv.partner_id
+ LEFT JOIN departamento_solicitud d ON d.id = s.departamento_id
+ LEFT JOIN prioridad_solicitud p ON p.id = s.prioridad_id
+ LEFT JOIN proveedor_servicio pr ON pr.id = s.proveedor_id
+ LEFT JOIN tipo_material tm ON tm.id = s.tipo_material_id
+ LEFT JOIN LATERAL (
+        SELECT count(*) AS total,
+               avg(NULLIF(es.valor_general, 0))::float8 AS promedio_general,
+               bool_or(es.recomendaria) AS recomendaria
+          FROM encuesta_satisfaccion es
+         WHERE es.solicitud_id = s.id
+      ) e ON TRUE
+ LEFT JOIN LATERAL (
+        SELECT jsonb_agg(jsonb_build_object(
+                   'fecha', hi.fecha_cambio, 'anterior', hi.estado_anterior, 'nuevo', hi.estado_nuevo,
+                   'horas', hi.tiempo_en_estado)
+               ORDER BY hi.fecha_cambio, hi.id)::text AS historial
+          FROM historial_estado_solicitud hi
+         WHERE hi.solicitud_id = s.id
+      ) h ON TRUE
+     WHERE s.write_date < %(hasta)s
+       AND (%(desde)s::timestamp IS NULL OR s.write_date >= %(desde)s
+            OR EXISTS (SELECT 1 FROM encuesta_satisfaccion es2
+                        WHERE es2.solicitud_id = s.id AND es2.write_date >= %(desde)s AND es2.write_date < %(hasta)s))
+  ORDER BY s.id
+"""
+
+
+class ExportacionSolicitud(models.AbstractModel):
+    _name = 'exportacion.solicitud'
+    _description = 'Exportación en streaming de tickets'
+
+    @api.model
+    def _comprobar_acceso(self):
+        if not (self.env.is_superuser() or self.env.is_admin()
+                or self.env.user.has_group('solicitud_interna.group_gestor')):
+            raise UserError('Solo los gestores pueden exportar tickets.')
+
+    @api.model
+    def marca_agua_actual(self):
+        """Límite superior de la exportación: la siguiente incremental parte de este valor.
+
+        Es el horizonte de la API (api.solicitud._horizonte), no max(write_date): una transacción abierta
+        puede confirmar después filas con un write_date anterior, que quedarían fuera para siempre.
+        """
+        return self.env['api.solicitud']._horizonte()
+
+    @api.model
+    def generar(self, formato='csv', desde=None, hasta=None, tamano_lote=TAMANO_LOTE_EXPORTACION):
+        """Generador de bloques de bytes con la exportación en el formato pedido.
+
+        Las filas se leen con un cursor con nombre (del lado del servidor) en lotes de tamano_lote y cada
+        lote se serializa y se entrega antes de leer el siguiente, por lo que la memoria no depende del
+        tamaño total. Solo se exportan los tickets modificados en [desde, hasta).
+        """
+        self._comprobar_acceso()
+        if formato not in FORMATOS_EXPORTACION:
+            raise UserError(f'Formato de exportación desconocido: {formato}')
+        if formato == 'parquet' and pyarrow is None:
+            raise UserError('La exportación a Parquet requiere pyarrow. Ejecuta: pip install pyarrow')
+        hasta = hasta or self.marca_agua_actual()
+        escritor = getattr(self, f'_escritor_{formato}')()
+        next(escritor)
+        # El cursor con nombre comparte la transacción (y la instantánea) de env.cr
+        cursor = self.env.cr._cnx.cursor(f'exportacion_solicitud_{uuid.uuid4().hex}')
+        try:
+            cursor.itersize = tamano_lote
+            cursor.execute(SQL_EXPORTACION, {'desde': desde, 'hasta': hasta})
+            columnas = None
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if columnas is None:
+                    columnas = [descripcion[0] for descripcion in cursor.description]
+                    bloque = escritor.send(('cabecera', columnas))
+                    if bloque:
+                        yield bloque
+                if not filas:
+                    break
+                bloque = escritor.send(('filas', filas))
+                if bloque:
+                    yield bloque
+        finally:
+            cursor.close()
+        bloque = escritor.send(('fin', None))
+        if bloque:
+            yield bloque
+
+    @api.model
+    def exportar_a_archivo(self, ruta, formato='csv', desde=None, tamano_lote=TAMANO_LOTE_EXPORTACION):
+        """Escribe la exportación en un archivo y devuelve la marca de agua para la siguiente incremental"""
+        hasta = self.marca_agua_actual()
+        with open(ruta, 'wb') as archivo:
+            for bloque in self.generar(formato, desde, hasta, tamano_lote):
+                archivo.write(bloque)
+        return hasta
+
+    # Escritores: corrutinas que reciben ('cabecera', columnas), ('filas', filas) y ('fin', None)
+    # y devuelven los bytes listos para enviar en cada paso
+
+    @staticmethod
+    def _valor_texto(valor):
+        if isinstance(valor, bool) or valor is None:
+            return valor
+        if hasattr(valor, 'isoformat'):
+            return valor.isoformat(sep=' ') if hasattr(valor, 'hour') else valor.isoformat()
+        return valor
+
+    def _escritor_csv(self):
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        bloque = None
+        while True:
+            tipo, datos = yield bloque
+            if tipo == 'cabecera':
+                escritor.writerow(datos)
+            elif tipo == 'filas':
+                escritor.writerows([[self._valor_texto(valor) for valor in fila] for fila in datos])
+            bloque = salida.getvalue().encode()
+            salida.seek(0)
+            salida.truncate()
+
+    def _escritor_jsonl(self):
+        columnas = None
+        bloque = None
+        while True:
+            tipo, datos = yield bloque
+            bloque = None
+            if tipo == 'cabecera':
+                columnas = datos
+            elif tipo == 'filas':
+                lineas = []
+                for fila in datos:
+                    registro = dict(zip(columnas, (self._valor_texto(valor) for valor in fila)))
+                    registro['historial'] = json.loads(registro['historial']) if registro['historial'] else []
+                    lineas.append(json.dumps(registro, ensure_ascii=False, default=str))
+                bloque = ('\n'.join(lineas) + '\n').encode()
+
+    @staticmethod
+    def _esquema_parquet(columnas):
+        """Tipos explícitos: un lote con una columna vacía no debe fijar un tipo nulo para todo el archivo"""
+        tipos = {
+            'id': pyarrow.int64(), 'prioridad_nivel': pyarrow.int64(), 'dias_pendiente': pyarrow.int64(),
+            'encuestas': pyarrow.int64(), 'tiempo_resolucion': pyarrow.float64(), 'costo_estimado': pyarrow.float64(),
+            'costo_real': pyarrow.float64(), 'encuesta_promedio_general': pyarrow.float64(),
+            'esta_vencido': pyarrow.bool_(), 'sla_incumplido': pyarrow.bool_(), 'encuesta_recomendaria': pyarrow.bool_(),
+        }
+        return pyarrow.schema([
+            (columna, tipos.get(columna, pyarrow.timestamp('us') if columna.startswith('fecha_') or columna == 'write_date'
+                                else pyarrow.string()))
+            for columna in columnas
+        ])
+
+    def _escritor_parquet(self):
+        # Cada lote se escribe como un row group; el búfer se vacía tras cada uno
+        salida = io.BytesIO()
+        columnas = esquema = None
+        escritor = None
+        bloque = None
+        while True:
+            tipo, datos = yield bloque
+            if tipo == 'cabecera':
+                columnas = datos
+                esquema = self._esquema_parquet(columnas)
+                escritor = pyarrow.parquet.ParquetWriter(salida, esquema)
+            elif tipo == 'filas':
+                escritor.write_table(pyarrow.Table.from_pylist([dict(zip(columnas, fila)) for fila in datos],
+                                                               schema=esquema))
+            else:
+                escritor.close()
+            bloque = salida.getvalue()
+            salida.seek(0)
+            salida.truncate()
@@ -0,0 +1,471 @@
+from odoo import models, fields, api, tools
+from odoo.exceptions import AccessError
+from contextlib import ExitStack
+import base64
+import csv
+import io
+import json
+
+from .solicitud_interna import ESTADOS_CERRADOS, extracto_html
+from .busqueda_solicitud import SQL_ACTUALIZAR_DOCUMENTO
+
+# Filas que se acumulan en memoria antes de enviarlas a la tabla temporal con COPY
+TAMANO_BLOQUE_COPY = 10000
+
+# Tablas temporales de carga: (nombre, columnas con su tipo). La columna motivo marca las filas rechazadas.
+TABLA_TICKETS = ('tmp_importacion_solicitud', [
+    ('linea', 'int'), ('numero_ticket', 'varchar'), ('name', 'varchar'), ('description', 'text'),
+    ('extracto', 'varchar'), ('category', 'varchar'), ('subcategory', 'varchar'), ('state', 'varchar'),
+    ('fecha_solicitud', 'timestamp'), ('fecha_asignacion', 'timestamp'), ('fecha_inicio', 'timestamp'),
+    ('fecha_limite', 'timestamp'), ('fecha_resolucion', 'timestamp'), ('fecha_cierre', 'timestamp'),
+    ('solicitante_id', 'int'), ('gestor_id', 'int'), ('supervisor_id', 'int'), ('departamento_id', 'int'),
+    ('prioridad_id', 'int'), ('prioridad_nivel', 'int'), ('solucion', 'text'),
+    ('costo_estimado', 'float8'), ('costo_real', 'float8'),
+])
+TABLA_HISTORIAL = ('tmp_importacion_historial', [
+    ('linea', 'int'), ('numero_ticket', 'varchar'), ('estado_anterior', 'varchar'), ('estado_nuevo', 'varchar'),
+    ('fecha_cambio', 'timestamp'), ('usuario_id', 'int'), ('comentario', 'text'),
+])
+TABLA_COMENTARIOS = ('tmp_importacion_comentario', [
+    ('linea', 'int'), ('numero_ticket', 'varchar'), ('usuario_id', 'int'), ('fecha', 'timestamp'),
+    ('tipo', 'varchar'), ('comentario', 'text'),
+])
+
+
+class ImportacionSolicitud(models.TransientModel):
+    _name = 'importacion.solicitud'
+    _description = 'Importación masiva de tickets'
+
+    archivo_tickets = fields.Binary(string='Tickets', required=True)
+    nombre_tickets = fields.Char(string='Nombre del Archivo de Tickets')
+    archivo_historial = fields.Binary(string='Historial de Estados')
+    nombre_historial = fields.Char(string='Nombre del Archivo de Historial')
+    archivo_comentarios = fields.Binary(string='Comentarios')
+    nombre_comentarios = fields.Char(string='Nombre del Archivo de Comentarios')
+
+    estado = fields.Selection([('borrador', 'Borrador'), ('hecho', 'Importado')], default='borrador')
+    total_importados = fields.Integer(string='Tickets Importados', readonly=True)
+    total_historial = fields.Integer(string='Cambios de Estado Importados', readonly=True)
+    total_comentarios = fields.Integer(string='Comentarios Importados', readonly=True)
+    total_rechazados = fields.Integer(string='Filas Rechazadas', readonly=True)
+    archivo_rechazos = fields.Binary(string='Filas Rechazadas (CSV)', readonly=True)
+    nombre_rechazos = fields.Char(default='rechazos_importacion.csv')
+
+    def action_importar(self):
+        """Importación desde el asistente: los archivos subidos se decodifican en memoria y se cargan en una
+        sola transacción. Para volúmenes grandes, importar_de_archivos (odoo-bin importar_tickets) lee los
+        archivos del servidor en streaming.
+        """
+        self.ensure_one()
+        resultado = self.importar(
+            self._abrir_archivo(self.archivo_tickets, self.nombre_tickets),
+            self._abrir_archivo(self.archivo_historial, self.nombre_historial),
+            self._abrir_archivo(self.archivo_comentarios, self.nombre_comentarios),
+        )
+        salida = io.StringIO()
+        escritor = csv.writer(salida)
+        escritor.writerow(['archivo', 'linea', 'motivo'])
+        escritor.writerows(resultado['rechazos'])
+        self.write({
+            'estado': 'hecho',
+            'total_importados': resultado['tickets'],
+            'total_historial': resultado['historial'],
+            'total_comentarios': resultado['comentarios'],
+            'total_rechazados': len(resultado['rechazos']),
+            'archivo_rechazos': base64.b64encode(salida.getvalue().encode()) if resultado['rechazos'] else False,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    @staticmethod
+    def _abrir_archivo(contenido, nombre):
+        if not contenido:
+            return None
+        texto = io.TextIOWrapper(io.BytesIO(base64.b64decode(contenido)), encoding='utf-8-sig')
+        return ImportacionSolicitud._leer_filas(texto, ImportacionSolicitud._formato(nombre))
+
+    @staticmethod
+    def _formato(nombre):
+        return 'jsonl' if (nombre or '').endswith(('.jsonl', '.json')) else 'csv'
+
+    @staticmethod
+    def _leer_filas(flujo, formato):
+        """Generador de filas de un flujo CSV (diccionarios, con cabecera) o JSONL, sin cargarlo entero.
+
+        Las líneas JSONL se entregan sin decodificar: _cargar_tabla las decodifica fila a fila y rechaza
+        las mal formadas sin abortar la carga.
+        """
+        if formato == 'csv':
+            yield from csv.DictReader(flujo)
+        else:
+            for linea in flujo:
+                if linea.strip():
+                    yield linea
+
+    @api.model
+    def importar_de_archivos(self, ruta_tickets, ruta_historial=None, ruta_comentarios=None):
+        """Importa desde archivos del servidor, leídos línea a línea sin cargarlos en memoria (ver importar)"""
+        with ExitStack() as pila:
+            flujos = [self._leer_filas(pila.enter_context(open(ruta, encoding='utf-8-sig', newline='')),
+                                       self._formato(ruta)) if ruta else None
+                      for ruta in (ruta_tickets, ruta_historial, ruta_comentarios)]
+            return self.importar(*flujos)
+
+    @api.model
+    def importar(self, filas_tickets, filas_historial=None, filas_comentarios=None):
+        """Importa tickets y, opcionalmente, su historial y comentarios.
+
+        Cada argumento es un iterable de diccionarios o líneas JSON (ver _leer_filas), de modo que los archivos se
+        procesan en streaming. Las filas se validan en Python contra mapas de referencias en memoria y en
+        SQL sobre tablas temporales cargadas con COPY; las rechazadas se devuelven sin abortar la carga.
+        Devuelve {'tickets': n, 'historial': n, 'comentarios': n, 'rechazos': [(archivo, línea, motivo)]}.
+        """
+        if not (self.env.is_admin() or self.env.user.has_group('solicitud_interna.group_gestor')):
+            raise AccessError('Solo los gestores pueden importar tickets.')
+        self.env.flush_all()
+        mapas = self._mapas_referencias()
+        rechazos = []
+
+        self._cargar_tabla(TABLA_TICKETS, filas_tickets, lambda fila: self._convertir_ticket(fila, mapas),
+                           'tickets', rechazos)
+        self._validar_tickets()
+        nuevos = self._insertar_tickets()
+
+        total_historial = total_comentarios = 0
+        comentados = self.env['solicitud.interna']
+        if filas_historial is not None:
+            self._cargar_tabla(TABLA_HISTORIAL, filas_historial, lambda fila: self._convertir_historial(fila, mapas),
+                               'historial', rechazos)
+            self._validar_ticket_existente(TABLA_HISTORIAL[0])
+            total_historial = self._insertar_historial()
+        if filas_comentarios is not None:
+            self._cargar_tabla(TABLA_COMENTARIOS, filas_comentarios,
+                               lambda fila: self._convertir_comentario(fila, mapas), 'comentarios', rechazos)
+            self._validar_ticket_existente(TABLA_COMENTARIOS[0])
+            total_comentarios, comentados = self._insertar_comentarios()
+
+        for archivo, (tabla, _columnas) in (('tickets', TABLA_TICKETS), ('historial', TABLA_HISTORIAL),
+                                            ('comentarios', TABLA_COMENTARIOS)):
+            self.env.cr.execute(f"SELECT to_regclass('{tabla}') IS NOT NULL")
+            if self.env.cr.fetchone()[0]:
+                self.env.cr.execute(f"SELECT linea, motivo FROM {tabla} WHERE motivo IS NOT NULL")
+                rechazos += [(archivo, linea, motivo) for linea, motivo in self.env.cr.fetchall()]
+                self.env.cr.execute(f"DROP TABLE {tabla}")
+
+        self._completar_importacion(nuevos, comentados)
+        return {
+            'tickets': len(nuevos),
+            'historial': total_historial,
+            'comentarios': total_comentarios,
+            'rechazos': sorted(rechazos),
+        }
+
+    @api.model
+    def _mapas_referencias(self):
+        """Mapas en memoria de códigos y nombres a ids, leídos una sola vez por importación"""
+        cr = self.env.cr
+        cr.execute("SELECT id, codigo, name FROM departamento_solicitud")
+        departamentos = {}
+        for dep_id, codigo, nombre in cr.fetchall():
+            departamentos[nombre.strip().lower()] = dep_id
+            departamentos[codigo.strip().lower()] = dep_id
+        cr.execute("SELECT id, name, nivel FROM prioridad_solicitud")
+        prioridades = {}
+        for prioridad_id, nombre, nivel in cr.fetchall():
+            prioridades[str(nivel)] = (prioridad_id, nivel)
+            prioridades[nombre.strip().lower()] = (prioridad_id, nivel)
+        cr.execute("SELECT id, login FROM res_users")
+        usuarios = {login.lower(): usuario_id for usuario_id, login in cr.fetchall()}
+        Solicitud = self.env['solicitud.interna']
+        return {
+            'departamentos': departamentos,
+            'prioridades': prioridades,
+            'usuarios': usuarios,
+            'categorias': self._mapa_seleccion(Solicitud._fields['category'].selection),
+            'estados': self._mapa_seleccion(Solicitud._fields['state'].selection),
+            'tipos_comentario': self._mapa_seleccion(self.env['comentario.solicitud']._fields['tipo'].selection),
+        }
+
+    @staticmethod
+    def _mapa_seleccion(seleccion):
+        """Acepta tanto la clave como la etiqueta de cada opción"""
+        mapa = {clave: clave for clave, _etiqueta in seleccion}
+        mapa.update({etiqueta.lower(): clave for clave, etiqueta in seleccion})
+        return mapa
+
+    def _cargar_tabla(self, tabla, filas, convertir, archivo, rechazos):
+        """Crea la tabla temporal y la llena con COPY por bloques; las filas que no convierten se rechazan"""
+        nombre, columnas = tabla
+        cr = self.env.cr
+        cr.execute(f"DROP TABLE IF EXISTS {nombre}")
+        cr.execute(f"CREATE TEMP TABLE {nombre} "
+                   f"({', '.join(f'{columna} {tipo}' for columna, tipo in columnas)}, motivo text)")
+        copia = f"COPY {nombre} ({', '.join(columna for columna, _tipo in columnas)}) FROM STDIN WITH (FORMAT csv)"
+        bloque = io.StringIO()
+        escritor = csv.writer(bloque)
+        pendientes = 0
+        for linea, fila in enumerate(filas, start=1):
+            try:
+                valores = convertir(json.loads(fila) if isinstance(fila, str) else fila)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                rechazos.append((archivo, linea, str(e) or 'Fila con formato inválido.'))
+                continue
+            escritor.writerow((linea,) + valores)
+            pendientes += 1
+            if pendientes >= TAMANO_BLOQUE_COPY:
+                self._copiar_bloque(copia, bloque)
+                bloque.seek(0)
+                bloque.truncate()
+                pendientes = 0
+        if pendientes:
+            self._copiar_bloque(copia, bloque)
+        cr.execute(f"CREATE INDEX ON {nombre} (numero_ticket)")
+        cr.execute(f"ANALYZE {nombre}")
+
+    def _copiar_bloque(self, copia, bloque):
+        bloque.seek(0)
+        self.env.cr.copy_expert(copia, bloque)
+
+    # Conversión fila a fila: solo búsquedas en los mapas y conversión de tipos, sin consultas
+
+    @staticmethod
+    def _texto(fila, campo, obligatorio=False):
+        valor = fila.get(campo)
+        valor = str(valor).strip() if valor not in (None, '') else ''
+        if obligatorio and not valor:
+            raise ValueError(f'El campo "{campo}" es obligatorio.')
+        return valor or None
+
+    @classmethod
+    def _referencia(cls, fila, campo, mapa, obligatorio=False):
+        valor = cls._texto(fila, campo, obligatorio)
+        if valor is None:
+            return None
+        if valor.lower() not in mapa:
+            raise ValueError(f'Valor desconocido en "{campo}": {valor}')
+        return mapa[valor.lower()]
+
+    @classmethod
+    def _fecha(cls, fila, campo, obligatorio=False):
+        valor = cls._texto(fila, campo, obligatorio)
+        if valor is None:
+            return None
+        try:
+            return fields.Datetime.to_datetime(valor)
+        except ValueError:
+            raise ValueError(f'Fecha inválida en "{campo}": {valor}')
+
+    @classmethod
+    def _numero(cls, fila, campo):
+        valor = cls._texto(fila, campo)
+        if valor is None:
+            return None
+        try:
+            return float(valor)
+        except ValueError:
+            raise ValueError(f'Número inválido en "{campo}": {valor}')
+
+    @classmethod
+    def _html(cls, fila, campo, obligatorio=False):
+        valor = cls._texto(fila, campo, obligatorio)
+        return tools.html_sanitize(valor) if valor else None
+
+    def _convertir_ticket(self, fila, mapas):
+        prioridad_id, nivel = self._referencia(fila, 'prioridad', mapas['prioridades'], obligatorio=True)
+        descripcion = self._html(fila, 'description')
+        return (
+            self._texto(fila, 'numero_ticket', obligatorio=True),
+            self._texto(fila, 'name', obligatorio=True),
+            descripcion,
+            extracto_html(descripcion) or None,
+            self._referencia(fila, 'category', mapas['categorias'], obligatorio=True),
+            self._texto(fila, 'subcategory'),
+            self._referencia(fila, 'state', mapas['estados']) or 'pendiente',
+            self._fecha(fila, 'fecha_solicitud') or fields.Datetime.now(),
+            self._fecha(fila, 'fecha_asignacion'),
+            self._fecha(fila, 'fecha_inicio'),
+            self._fecha(fila, 'fecha_limite'),
+            self._fecha(fila, 'fecha_resolucion'),
+            self._fecha(fila, 'fecha_cierre'),
+            self._referencia(fila, 'solicitante', mapas['usuarios'], obligatorio=True),
+            self._referencia(fila, 'gestor', mapas['usuarios']),
+            self._referencia(fila, 'supervisor', mapas['usuarios']),
+            self._referencia(fila, 'departamento', mapas['departamentos'], obligatorio=True),
+            prioridad_id,
+            nivel,
+            self._html(fila, 'solucion'),
+            self._numero(fila, 'costo_estimado'),
+            self._numero(fila, 'costo_real'),
+        )
+
+    def _convertir_historial(self, fila, mapas):
+        return (
+            self._texto(fila, 'numero_ticket', obligatorio=True),
+            self._referencia(fila, 'estado_anterior', mapas['estados']),
+            self._referencia(fila, 'estado_nuevo', mapas['estados'], obligatorio=True),
+            self._fecha(fila, 'fecha_cambio', obligatorio=True),
+            self._referencia(fila, 'usuario', mapas['usuarios']) or self.env.uid,
+            self._texto(fila, 'comentario'),
+        )
+
+    def _convertir_comentario(self, fila, mapas):
+        return (
+            self._texto(fila, 'numero_ticket', obligatorio=True),
+            self._referencia(fila, 'usuario', mapas['usuarios']) or self.env.uid,
+            self._fecha(fila, 'fecha') or fields.Datetime.now(),
+            self._referencia(fila, 'tipo', mapas['tipos_comentario']) or 'publico',
+            self._html(fila, 'comentario', obligatorio=True),
+        )
+
+    # Validaciones por conjuntos sobre las tablas temporales
+
+    def _validar_tickets(self):
+        cr = self.env.cr
+        # Equivalente a _check_fecha_limite
+        cr.execute("""
+            UPDATE tmp_importacion_solicitud
+               SET motivo = 'La fecha límite no puede ser anterior a la fecha de solicitud.'
+             WHERE motivo IS NULL AND fecha_limite < fecha_solicitud
+        """)
+        # Unicidad del número de ticket dentro del archivo (se conserva la primera aparición)...
+        cr.execute("""
+            UPDATE tmp_importacion_solicitud t
+               SET motivo = 'Número de ticket repetido en el archivo.'
+              FROM (SELECT linea, row_number() OVER (PARTITION BY numero_ticket ORDER BY linea) AS orden
+                      FROM tmp_importacion_solicitud
+                     WHERE motivo IS NULL) d
+             WHERE d.linea = t.linea AND d.orden > 1
+        """)
+        # ... y frente a los tickets activos y archivados
+        cr.execute("""
+            UPDATE tmp_importacion_solicitud t
+               SET motivo = 'El número de ticket ya existe.'
+             WHERE motivo IS NULL
+               AND (EXISTS (SELECT 1 FROM solicitud_interna s WHERE s.numero_ticket = t.numero_ticket)
+                    OR EXISTS (SELECT 1 FROM solicitud_archivada a WHERE a.numero_ticket = t.numero_ticket))
+        """)
+
+    def _validar_ticket_existente(self, tabla):
+        self.env.cr.execute(f"""
+            UPDATE {tabla} t
+               SET motivo = 'El ticket no existe.'
+             WHERE motivo IS NULL
+               AND NOT EXISTS (SELECT 1 FROM solicitud_interna s WHERE s.numero_ticket = t.numero_ticket)
+        """)
+
+    # Inserción en bloque desde las tablas temporales
+
+    def _insertar_tickets(self):
+        """Inserta las filas válidas calculando en SQL los campos almacenados que el ORM calcularía"""
+        self.env.cr.execute(f"""
+            INSERT INTO solicitud_interna
+                   (numero_ticket, name, description, extracto, category, subcategory, state,
+                    fecha_solicitud, fecha_asignacion, fecha_inicio, fecha_limite, fecha_resolucion, fecha_cierre,
+                    solicitante_id, gestor_id, supervisor_id, departamento_id, prioridad_id, prioridad_nivel,
+                    solucion, costo_estimado, costo_real,
+                    tiempo_resolucion, dias_pendiente, esta_vencido, color,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT numero_ticket, name, description, extracto, category, subcategory, state,
+                   fecha_solicitud, fecha_asignacion, fecha_inicio, fecha_limite, fecha_resolucion, fecha_cierre,
+                   solicitante_id, gestor_id, supervisor_id, departamento_id, prioridad_id, prioridad_nivel,
+                   solucion, costo_estimado, costo_real,
+                   COALESCE(EXTRACT(EPOCH FROM fecha_resolucion - fecha_solicitud) / 3600, 0),
+                   CASE WHEN state IN ('cerrado', 'cancelado') THEN 0
+                        ELSE date_part('day', ahora - fecha_solicitud)::int END,
+                   vencido,
+                   CASE WHEN vencido THEN 1 WHEN prioridad_nivel >= 4 THEN 3 WHEN state = 'resuelto' THEN 10 ELSE 0 END,
+                   %(uid)s, ahora, %(uid)s, ahora
+              FROM (SELECT t.*, n.ahora,
+                           COALESCE(t.state NOT IN {ESTADOS_CERRADOS} AND t.fecha_limite < n.ahora, FALSE) AS vencido
+                      FROM tmp_importacion_solicitud t, (SELECT now() AT TIME ZONE 'UTC' AS ahora) n
+                     WHERE t.motivo IS NULL
+                  ORDER BY t.linea) v
+         RETURNING id
+        """, {'uid': self.env.uid})
+        return self.env['solicitud.interna'].browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _insertar_historial(self):
+        self.env.cr.execute("""
+            INSERT INTO historial_estado_solicitud
+                   (solicitud_id, estado_anterior, estado_nuevo, fecha_cambio, usuario_id, comentario,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT s.id, t.estado_anterior, t.estado_nuevo, t.fecha_cambio, t.usuario_id, t.comentario,
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM tmp_importacion_historial t
+              JOIN solicitud_interna s ON s.numero_ticket = t.numero_ticket
+             WHERE t.motivo IS NULL
+        """, {'uid': self.env.uid})
+        return self.env.cr.rowcount
+
+    def _insertar_comentarios(self):
+        self.env.cr.execute("""
+            INSERT INTO comentario_solicitud
+                   (solicitud_id, usuario_id, fecha, tipo, comentario, create_uid, create_date, write_uid, write_date)
+            SELECT s.id, t.usuario_id, t.fecha, t.tipo, t.comentario,
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM tmp_importacion_comentario t
+              JOIN solicitud_interna s ON s.numero_ticket = t.numero_ticket
+             WHERE t.motivo IS NULL
+         RETURNING solicitud_id
+        """, {'uid': self.env.uid})
+        solicitudes = [row[0] for row in self.env.cr.fetchall()]
+        return len(solicitudes), self.env['solicitud.interna'].browse(set(solicitudes))
+
+    def _completar_importacion(self, nuevos, comentados):
+        """Derivados que el ORM mantendría: tiempos del historial, búsqueda, contadores, indicadores y SLA.
+
+        El extracto se calcula fila a fila al convertir y se inserta con el ticket.
+        """
+        self.env.invalidate_all()
+        self.env['historial.estado.solicitud']._rellenar_tiempo_en_estado()
+        if nuevos or comentados:
+            self.env.cr.execute(SQL_ACTUALIZAR_DOCUMENTO.format(filtro='t.id = ANY(%s)'), [(nuevos | comentados).ids])
+        if not nuevos:
+            return
+        self.env.cr.execute("SELECT DISTINCT departamento_id FROM solicitud_interna WHERE id = ANY(%s)", [nuevos.ids])
+        self.env['departamento.solicitud'].browse([row[0] for row in self.env.cr.fetchall()])._reconciliar_estadisticas()
+        self.env.cr.execute("SELECT min(fecha_solicitud)::date FROM solicitud_interna WHERE id = ANY(%s)", [nuevos.ids])
+        self.env['kpi.diario.solicitud']._reconciliar(desde=self.env.cr.fetchone()[0])
+        self._programar_sla(nuevos)
+
+    def _programar_sla(self, nuevos):
+        """Equivalente en SQL de _sla_programar para tickets recién insertados (sin eventos previos)"""
+        cr = self.env.cr
+        # Límites que faltan, desde ahora con las horas de la prioridad
+        cr.execute(f"""
+            UPDATE solicitud_interna s
+               SET fecha_limite_respuesta = COALESCE(s.fecha_limite_respuesta, CASE
+                       WHEN s.state = 'pendiente' AND p.tiempo_respuesta_horas > 0
+                       THEN n.ahora + p.tiempo_respuesta_horas * interval '1 hour' END),
+                   fecha_limite = COALESCE(s.fecha_limite, CASE
+                       WHEN p.tiempo_resolucion_horas > 0
+                       THEN n.ahora + p.tiempo_resolucion_horas * interval '1 hour' END)
+              FROM prioridad_solicitud p, (SELECT now() AT TIME ZONE 'UTC' AS ahora) n
+             WHERE p.id = s.prioridad_id AND s.id = ANY(%s)
+               AND s.state NOT IN {('borrador',) + ESTADOS_CERRADOS}
+               AND ((s.state = 'pendiente' AND s.fecha_limite_respuesta IS NULL AND p.tiempo_respuesta_horas > 0)
+                    OR (s.fecha_limite IS NULL AND p.tiempo_resolucion_horas > 0))
+        """, [nuevos.ids])
+        cr.execute(f"""
+            INSERT INTO evento_sla_solicitud
+                   (solicitud_id, tipo, estado, fecha_vencimiento, prioridad_id, departamento_id, gestor_id,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT s.id, e.tipo, 'pendiente', e.fecha_vencimiento, s.prioridad_id, s.departamento_id, s.gestor_id,
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM solicitud_interna s,
+                   LATERAL (VALUES ('respuesta', CASE WHEN s.state = 'pendiente' THEN s.fecha_limite_respuesta END),
+                                   ('resolucion', s.fecha_limite)) e(tipo, fecha_vencimiento)
+             WHERE s.id = ANY(%(ids)s) AND s.state NOT IN {('borrador',) + ESTADOS_CERRADOS}
+               AND e.fecha_vencimiento IS NOT NULL
+         RETURNING fecha_vencimiento
+        """, {'uid': self.env.uid, 'ids': nuevos.ids})
+        vencimientos = [row[0] for row in cr.fetchall()]
+        self.env.invalidate_all()
+        cron = self.env.ref('solicitud_interna.ir_cron_procesar_vencimientos_sla', raise_if_not_found=False)
+        if vencimientos and cron:
+            cron.sudo()._trigger(at=min(vencimientos))
@@ -0,0 +1,284 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+TIPOS_MOVIMIENTO = [
+    ('entrada', 'Entrada'),
+    ('reserva', 'Reserva'),
+    ('liberacion', 'Liberación'),
+    ('consumo', 'Consumo de Reserva'),
+    ('salida', 'Salida sin Reserva'),
+    ('ajuste', 'Ajuste'),
+]
+
+# Efecto por unidad de cada movimiento sobre (stock_actual, stock_reservado); el ajuste lleva signo
+EFECTOS_MOVIMIENTO = {
+    'entrada': (1, 0),
+    'reserva': (0, 1),
+    'liberacion': (0, -1),
+    'consumo': (-1, -1),
+    'salida': (-1, 0),
+    'ajuste': (1, 0),
+}
+
+# Pedidos que aún no han repuesto el stock: sus materiales no se vuelven a pedir
+ESTADOS_PEDIDO_ABIERTOS = ('borrador', 'enviado')
+
+
+class MovimientoStockMaterial(models.Model):
+    _name = 'movimiento.stock.material'
+    _description = 'Movimiento del libro de stock de material'
+    _order = 'fecha desc, id desc'
+    _rec_name = 'tipo_material_id'
+
+    # Solo se insertan desde tipo.material._mover_stock, en la misma sentencia que actualiza el stock
+    tipo_material_id = fields.Many2one('tipo.material', string='Tipo de Material', required=True, readonly=True,
+                                       ondelete='restrict', index=True)
+    solicitud_id = fields.Many2one('solicitud.interna', string='Ticket', readonly=True, ondelete='set null', index=True)
+    pedido_id = fields.Many2one('pedido.reposicion', string='Pedido de Reposición', readonly=True, ondelete='set null')
+    tipo = fields.Selection(TIPOS_MOVIMIENTO, string='Tipo', required=True, readonly=True)
+    cantidad = fields.Integer(string='Cantidad', required=True, readonly=True)
+    stock_resultante = fields.Integer(string='Stock Tras el Movimiento', readonly=True)
+    fecha = fields.Datetime(string='Fecha', default=fields.Datetime.now, required=True, readonly=True)
+    usuario_id = fields.Many2one('res.users', string='Usuario', default=lambda self: self.env.user, readonly=True)
+
+
+class TipoMaterial(models.Model):
+    _inherit = 'tipo.material'
+
+    movimiento_ids = fields.One2many('movimiento.stock.material', 'tipo_material_id', string='Movimientos de Stock')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # El stock inicial se anota como entrada en el libro, no se escribe directamente
+        vals_list = [dict(vals) for vals in vals_list]
+        iniciales = [vals.pop('stock_actual', 0) or 0 for vals in vals_list]
+        records = super(TipoMaterial, self).create(vals_list)
+        for record, cantidad in zip(records, iniciales):
+            if cantidad < 0:
+                raise UserError(f'El stock inicial de {record.name} no puede ser negativo.')
+            if cantidad:
+                record._mover_stock('entrada', cantidad)
+        return records
+
+    def write(self, vals):
+        # Un stock escrito a mano (RPC, importación) se convierte en un ajuste por la diferencia
+        if 'stock_actual' in vals:
+            vals = dict(vals)
+            nuevo = vals.pop('stock_actual') or 0
+            for record in self:
+                if nuevo != record.stock_actual:
+                    record.ajustar_stock(nuevo - record.stock_actual)
+        return super(TipoMaterial, self).write(vals)
+
+    def _mover_stock(self, tipo, cantidad, solicitud_id=None, pedido_id=None):
+        """Aplica un movimiento con un único UPDATE condicionado y lo anota en el libro en la misma sentencia.
+
+        La condición (0 <= reservado <= actual tras el movimiento) se evalúa sobre la fila bloqueada por el
+        UPDATE, de modo que dos gestores concurrentes no pueden reservar ni consumir la misma existencia.
+        Devuelve False, sin cambiar nada, si no hay stock suficiente.
+        """
+        self.ensure_one()
+        delta_actual, delta_reservado = (efecto * cantidad for efecto in EFECTOS_MOVIMIENTO[tipo])
+        self.flush_recordset(['stock_actual', 'stock_reservado', 'stock_minimo'])
+        self.env.cr.execute("""
+            WITH movido AS (
+                UPDATE tipo_material
+                   SET stock_actual = stock_actual + %(actual)s,
+                       stock_reservado = stock_reservado + %(reservado)s,
+                       necesita_reposicion = stock_actual + %(actual)s - stock_reservado - %(reservado)s
+                                             <= stock_minimo,
+                       write_uid = %(uid)s, write_date = now() AT TIME ZONE 'UTC'
+                 WHERE id = %(id)s
+                   AND stock_reservado + %(reservado)s >= 0
+                   AND stock_actual + %(actual)s >= stock_reservado + %(reservado)s
+             RETURNING id, stock_actual
+            )
+            INSERT INTO movimiento_stock_material
+                   (tipo_material_id, solicitud_id, pedido_id, tipo, cantidad, stock_resultante, fecha, usuario_id,
+                    create_uid, create_date, write_uid, write_date)
+            SELECT id, %(solicitud)s, %(pedido)s, %(tipo)s, %(cantidad)s, stock_actual,
+                   now() AT TIME ZONE 'UTC', %(uid)s, %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM movido
+         RETURNING id
+        """, {
+            'id': self.id, 'actual': delta_actual, 'reservado': delta_reservado, 'tipo': tipo, 'cantidad': cantidad,
+            'solicitud': solicitud_id, 'pedido': pedido_id, 'uid': self.env.uid,
+        })
+        movido = bool(self.env.cr.fetchone())
+        self.invalidate_recordset(['stock_actual', 'stock_reservado', 'necesita_reposicion', 'movimiento_ids',
+                                   'write_uid', 'write_date'])
+        return movido
+
+    def ajustar_stock(self, cantidad):
+        """Ajuste de inventario con signo; no puede dejar el stock por debajo de lo reservado"""
+        self.check_access('write')
+        for record in self:
+            if not record._mover_stock('ajuste', cantidad):
+                raise UserError(f'El ajuste dejaría el stock de {record.name} por debajo de lo reservado '
+                                f'({record.stock_reservado}).')
+
+
+class AjusteStockMaterial(models.TransientModel):
+    _name = 'ajuste.stock.material'
+    _description = 'Ajuste de inventario de un material'
+
+    tipo_material_id = fields.Many2one('tipo.material', string='Tipo de Material', required=True,
+                                       default=lambda self: self.env.context.get('active_id'))
+    stock_actual = fields.Integer(related='tipo_material_id.stock_actual')
+    stock_reservado = fields.Integer(related='tipo_material_id.stock_reservado')
+    stock_contado = fields.Integer(string='Stock Contado', required=True)
+
+    def action_aplicar(self):
+        """Anota en el libro un ajuste por la diferencia entre el recuento y el stock actual"""
+        self.ensure_one()
+        diferencia = self.stock_contado - self.tipo_material_id.stock_actual
+        if diferencia:
+            self.tipo_material_id.ajustar_stock(diferencia)
+        return {'type': 'ir.actions.act_window_close'}
+
+
+# Campos que determinan la reserva: no cambian mientras el ticket tenga material reservado
+CAMPOS_RESERVA = ('category', 'tipo_material_id', 'cantidad_material')
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    cantidad_material = fields.Integer(string='Cantidad', default=1)
+    cantidad_reservada = fields.Integer(string='Cantidad Reservada', readonly=True, copy=False)
+    cantidad_consumida = fields.Integer(string='Cantidad Consumida', readonly=True, copy=False)
+
+    def write(self, vals):
+        # La reserva se libera o se consume contra el material del que se tomó
+        cambios = [campo for campo in CAMPOS_RESERVA if campo in vals]
+        if cambios:
+            for record in self.filtered('cantidad_reservada'):
+                valores = record._convert_to_write({campo: record[campo] for campo in cambios})
+                if any(valores[campo] != vals[campo] for campo in cambios):
+                    raise UserError(f'El ticket {record.numero_ticket} tiene {record.cantidad_reservada} unidades '
+                                    f'reservadas de {record.tipo_material_id.name}: cancele el ticket para liberar '
+                                    'la reserva antes de cambiar el material, la categoría o la cantidad.')
+        return super(SolicitudInterna, self).write(vals)
+
+    def _preparar_transicion(self, estado_nuevo):
+        """Reserva el material al asignar, lo consume al resolver y libera la reserva al cancelar"""
+        super(SolicitudInterna, self)._preparar_transicion(estado_nuevo)
+        if self.category != 'material' or not self.tipo_material_id:
+            return
+        material = self.tipo_material_id.sudo()
+        pendiente = max(self.cantidad_material - self.cantidad_consumida, 0)
+        # Los movimientos de un ticket se aplican todos o ninguno
+        with self.env.cr.savepoint():
+            if estado_nuevo == 'asignado' and pendiente > self.cantidad_reservada:
+                faltante = pendiente - self.cantidad_reservada
+                if not material._mover_stock('reserva', faltante, solicitud_id=self.id):
+                    raise UserError(f'Stock insuficiente de {material.name} para el ticket {self.numero_ticket}: '
+                                    f'se necesitan {faltante} y hay {material.stock_disponible} disponibles.')
+                self.cantidad_reservada = pendiente
+            elif estado_nuevo == 'resuelto' and (pendiente or self.cantidad_reservada):
+                de_reserva = min(pendiente, self.cantidad_reservada)
+                sin_reserva = pendiente - de_reserva
+                if sin_reserva and not material._mover_stock('salida', sin_reserva, solicitud_id=self.id):
+                    raise UserError(f'Stock insuficiente de {material.name} para resolver el ticket '
+                                    f'{self.numero_ticket}: se necesitan {sin_reserva} y hay '
+                                    f'{material.stock_disponible} disponibles.')
+                if de_reserva and not material._mover_stock('consumo', de_reserva, solicitud_id=self.id):
+                    raise UserError(f'La reserva de {material.name} del ticket {self.numero_ticket} no es coherente '
+                                    'con el stock; revise los movimientos del material.')
+                if self.cantidad_reservada > de_reserva:
+                    material._mover_stock('liberacion', self.cantidad_reservada - de_reserva, solicitud_id=self.id)
+                self.write({'cantidad_reservada': 0, 'cantidad_consumida': self.cantidad_consumida + pendiente})
+            elif estado_nuevo == 'cancelado' and self.cantidad_reservada:
+                material._mover_stock('liberacion', self.cantidad_reservada, solicitud_id=self.id)
+                self.cantidad_reservada = 0
+
+    def unlink(self):
+        for record in self.filtered('cantidad_reservada'):
+            record.tipo_material_id.sudo()._mover_stock('liberacion', record.cantidad_reservada, solicitud_id=record.id)
+        return super(SolicitudInterna, self).unlink()
+
+
+class PedidoReposicion(models.Model):
+    _name = 'pedido.reposicion'
+    _description = 'Pedido de reposición de material'
+    _order = 'fecha desc, id desc'
+
+    name = fields.Char(string='Referencia', required=True, readonly=True)
+    proveedor_id = fields.Many2one('proveedor.servicio', string='Proveedor', readonly=True, index=True)
+    fecha = fields.Datetime(string='Fecha', default=fields.Datetime.now, required=True, readonly=True)
+    estado = fields.Selection([
+        ('borrador', 'Borrador'),
+        ('enviado', 'Enviado'),
+        ('recibido', 'Recibido'),
+        ('cancelado', 'Cancelado'),
+    ], string='Estado', default='borrador', required=True, readonly=True)
+    linea_ids = fields.One2many('linea.pedido.reposicion', 'pedido_id', string='Líneas')
+
+    @api.model
+    def barrer_reposicion(self):
+        """Agrupa por proveedor, con una sola consulta, los materiales bajo mínimo que no están ya pedidos.
+
+        Las líneas se añaden al pedido en borrador del proveedor o a uno nuevo. Se pide hasta el doble del
+        stock mínimo, contando lo reservado como no disponible.
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT t.proveedor_id,
+                   array_agg(t.id ORDER BY t.id),
+                   array_agg(GREATEST(2 * t.stock_minimo - (t.stock_actual - t.stock_reservado), 1) ORDER BY t.id)
+              FROM tipo_material t
+             WHERE t.necesita_reposicion AND t.activo
+               AND NOT EXISTS (SELECT 1
+                                 FROM linea_pedido_reposicion l
+                                 JOIN pedido_reposicion p ON p.id = l.pedido_id
+                                WHERE l.tipo_material_id = t.id AND p.estado IN %s)
+          GROUP BY t.proveedor_id
+        """, [ESTADOS_PEDIDO_ABIERTOS])
+        faltantes = {proveedor_id: list(zip(materiales, cantidades))
+                     for proveedor_id, materiales, cantidades in self.env.cr.fetchall()}
+        if not faltantes:
+            return 0
+        borradores = {}
+        for pedido in self.search([('estado', '=', 'borrador'),
+                                  ('proveedor_id', 'in', [proveedor_id or False for proveedor_id in faltantes])]):
+            borradores.setdefault(pedido.proveedor_id.id or None, pedido)
+        lineas = []
+        nuevos = []
+        proveedores = {proveedor.id: proveedor.name for proveedor in
+                       self.env['proveedor.servicio'].browse([p for p in faltantes if p]).sudo()}
+        hoy = fields.Date.context_today(self)
+        for proveedor_id, materiales in faltantes.items():
+            comandos = [{'tipo_material_id': material_id, 'cantidad': cantidad} for material_id, cantidad in materiales]
+            if proveedor_id in borradores:
+                lineas += [dict(vals, pedido_id=borradores[proveedor_id].id) for vals in comandos]
+            else:
+                nuevos.append({
+                    'name': f'REP/{hoy:%Y%m%d}/{proveedores.get(proveedor_id, "Sin proveedor")}',
+                    'proveedor_id': proveedor_id,
+                    'linea_ids': [(0, 0, vals) for vals in comandos],
+                })
+        self.env['linea.pedido.reposicion'].create(lineas)
+        self.create(nuevos)
+        return sum(len(materiales) for materiales in faltantes.values())
+
+    def action_enviar(self):
+        self.filtered(lambda pedido: pedido.estado == 'borrador').write({'estado': 'enviado'})
+
+    def action_recibir(self):
+        """Da entrada en el libro de stock a las cantidades de cada línea"""
+        for pedido in self.filtered(lambda pedido: pedido.estado in ESTADOS_PEDIDO_ABIERTOS):
+            for linea in pedido.linea_ids:
+                linea.tipo_material_id.sudo()._mover_stock('entrada', linea.cantidad, pedido_id=pedido.id)
+            pedido.estado = 'recibido'
+
+    def action_cancelar(self):
+        self.filtered(lambda pedido: pedido.estado in ESTADOS_PEDIDO_ABIERTOS).write({'estado': 'cancelado'})
+
+
+class LineaPedidoReposicion(models.Model):
+    _name = 'linea.pedido.reposicion'
+    _description = 'Línea de pedido de reposición'
+
+    pedido_id = fields.Many2one('pedido.reposicion', string='Pedido', required=True, ondelete='cascade', index=True)
+    tipo_material_id = fields.Many2one('tipo.material', string='Tipo de Material', required=True, index=True)
+    cantidad = fields.Integer(string='Cantidad', required=True)
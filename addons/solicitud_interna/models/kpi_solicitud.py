@@ -0,0 +1,183 @@
+from odoo import models, fields, api
+from odoo.tools import SQL
+from collections import defaultdict
+from datetime import timedelta
+
+# Campos de solicitud.interna que cambian la contribución de un ticket al resumen diario
+CAMPOS_KPI = ('fecha_solicitud', 'fecha_resolucion', 'fecha_cierre', 'departamento_id', 'category',
+              'prioridad_id', 'state', 'costo_estimado', 'costo_real')
+
+# Medidas acumuladas por fila, en el orden de los vectores de delta
+MEDIDAS_KPI = ('creados', 'resueltos', 'cerrados', 'horas_resolucion', 'costo_estimado', 'costo_real')
+
+# Columnas de las que sale el resumen, comunes a los tickets activos y archivados
+SQL_TICKETS_KPI = """
+    SELECT fecha_solicitud, fecha_resolucion, fecha_cierre, departamento_id, category, prioridad_id, state,
+           tiempo_resolucion, costo_estimado, costo_real
+      FROM solicitud_interna
+    UNION ALL
+    SELECT fecha_solicitud, fecha_resolucion, fecha_cierre, departamento_id, category, prioridad_id, state,
+           tiempo_resolucion, costo_estimado, costo_real
+      FROM solicitud_archivada
+"""
+
+
+class KpiDiarioSolicitud(models.Model):
+    _name = 'kpi.diario.solicitud'
+    _description = 'Indicadores diarios de tickets'
+    _order = 'fecha desc'
+    _rec_name = 'fecha'
+
+    # Cada ticket aporta a tres días: creado (fecha_solicitud), resuelto y cerrado, con sus valores actuales
+    # de departamento, categoría, prioridad y estado
+    fecha = fields.Date(string='Fecha', required=True, readonly=True, index=True)
+    departamento_id = fields.Many2one('departamento.solicitud', string='Departamento', readonly=True)
+    category = fields.Selection(selection=lambda self: self.env['solicitud.interna']._fields['category'].selection,
+                                string='Categoría', readonly=True)
+    prioridad_id = fields.Many2one('prioridad.solicitud', string='Prioridad', readonly=True)
+    state = fields.Selection(selection=lambda self: self.env['solicitud.interna']._fields['state'].selection,
+                             string='Estado', readonly=True)
+
+    creados = fields.Integer(string='Creados', readonly=True)
+    resueltos = fields.Integer(string='Resueltos', readonly=True)
+    cerrados = fields.Integer(string='Cerrados', readonly=True)
+    horas_resolucion = fields.Float(string='Horas de Resolución', readonly=True)
+    # Promedio ponderado (horas / resueltos): _read_group_select lo recalcula por grupo
+    tiempo_resolucion_promedio = fields.Float(string='Tiempo Medio de Resolución (horas)', readonly=True,
+                                              aggregator='avg')
+    costo_estimado = fields.Float(string='Costo Estimado', readonly=True)
+    costo_real = fields.Float(string='Costo Real', readonly=True)
+
+    _sql_constraints = [
+        ('dimensiones_unicas', 'unique(fecha, departamento_id, category, prioridad_id, state)',
+         'Ya existe una fila de indicadores para esta combinación.'),
+    ]
+
+    def init(self):
+        self.env.cr.execute(f"SELECT 1 FROM {self._table} LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._reconciliar()
+
+    def _read_group_select(self, aggregate_spec, query):
+        # Todas las lecturas agrupadas (read_group, web_read_group, pivot y gráfico) pasan por aquí
+        if aggregate_spec.split(':')[0] == 'tiempo_resolucion_promedio':
+            return SQL("COALESCE(SUM(%s) / NULLIF(SUM(%s), 0), 0)",
+                       self._field_to_sql(self._table, 'horas_resolucion', query),
+                       self._field_to_sql(self._table, 'resueltos', query))
+        return super()._read_group_select(aggregate_spec, query)
+
+    @api.model
+    def _aplicar_deltas(self, deltas):
+        """Suma los deltas {(fecha, departamento, categoría, prioridad, estado): [medidas]} con un único upsert"""
+        claves = sorted((clave for clave, delta in deltas.items() if any(delta)), key=str)
+        if not claves:
+            return
+        self.env.cr.execute(f"""
+            INSERT INTO kpi_diario_solicitud
+                   (fecha, departamento_id, category, prioridad_id, state, {', '.join(MEDIDAS_KPI)},
+                    tiempo_resolucion_promedio, create_uid, create_date, write_uid, write_date)
+            SELECT v.fecha, v.departamento_id, v.category, v.prioridad_id, v.state,
+                   v.creados, v.resueltos, v.cerrados, v.horas_resolucion, v.costo_estimado, v.costo_real,
+                   COALESCE(v.horas_resolucion / NULLIF(v.resueltos, 0), 0),
+                   %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+              FROM unnest(%s::date[], %s::int[], %s::varchar[], %s::int[], %s::varchar[],
+                          %s::int[], %s::int[], %s::int[], %s::float8[], %s::float8[], %s::float8[])
+                   AS v(fecha, departamento_id, category, prioridad_id, state,
+                        creados, resueltos, cerrados, horas_resolucion, costo_estimado, costo_real)
+            ON CONFLICT (fecha, departamento_id, category, prioridad_id, state) DO UPDATE
+               SET creados = kpi_diario_solicitud.creados + EXCLUDED.creados,
+                   resueltos = kpi_diario_solicitud.resueltos + EXCLUDED.resueltos,
+                   cerrados = kpi_diario_solicitud.cerrados + EXCLUDED.cerrados,
+                   horas_resolucion = kpi_diario_solicitud.horas_resolucion + EXCLUDED.horas_resolucion,
+                   costo_estimado = kpi_diario_solicitud.costo_estimado + EXCLUDED.costo_estimado,
+                   costo_real = kpi_diario_solicitud.costo_real + EXCLUDED.costo_real,
+                   tiempo_resolucion_promedio = COALESCE(
+                       (kpi_diario_solicitud.horas_resolucion + EXCLUDED.horas_resolucion)
+                       / NULLIF(kpi_diario_solicitud.resueltos + EXCLUDED.resueltos, 0), 0),
+                   write_date = EXCLUDED.write_date
+        """, [self.env.uid, self.env.uid]
+             + [[clave[posicion] for clave in claves] for posicion in range(5)]
+             + [[deltas[clave][posicion] for clave in claves] for posicion in range(len(MEDIDAS_KPI))])
+        self.invalidate_model()
+
+    @api.model
+    def _reconciliar(self, desde=None):
+        """Reconstruye con una sola pasada las filas a partir de `desde` (todas si no se indica)"""
+        self.env.flush_all()
+        self.env.cr.execute("DELETE FROM kpi_diario_solicitud WHERE %(desde)s::date IS NULL OR fecha >= %(desde)s",
+                            {'desde': desde})
+        self.env.cr.execute(f"""
+            INSERT INTO kpi_diario_solicitud
+                   (fecha, departamento_id, category, prioridad_id, state, {', '.join(MEDIDAS_KPI)},
+                    tiempo_resolucion_promedio, create_uid, create_date, write_uid, write_date)
+            SELECT e.fecha, t.departamento_id, t.category, t.prioridad_id, t.state,
+                   sum(e.creados), sum(e.resueltos), sum(e.cerrados),
+                   sum(e.horas), sum(e.costo_estimado), sum(e.costo_real),
+                   COALESCE(sum(e.horas) / NULLIF(sum(e.resueltos), 0), 0),
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM ({SQL_TICKETS_KPI}) t,
+                   LATERAL (VALUES
+                       (t.fecha_solicitud::date, 1, 0, 0, 0::float8,
+                        COALESCE(t.costo_estimado, 0)::float8, COALESCE(t.costo_real, 0)::float8),
+                       (t.fecha_resolucion::date, 0, 1, 0, COALESCE(t.tiempo_resolucion, 0)::float8, 0::float8, 0::float8),
+                       (t.fecha_cierre::date, 0, 0, 1, 0::float8, 0::float8, 0::float8)
+                   ) AS e(fecha, creados, resueltos, cerrados, horas, costo_estimado, costo_real)
+             WHERE e.fecha IS NOT NULL
+               AND (%(desde)s::date IS NULL OR e.fecha >= %(desde)s)
+          GROUP BY e.fecha, t.departamento_id, t.category, t.prioridad_id, t.state
+        """, {'uid': self.env.uid, 'desde': desde})
+        self.invalidate_model()
+
+    @api.model
+    def reconciliar_reciente(self):
+        """Reconciliación nocturna de la ventana reciente (parámetro solicitud_interna.dias_reconciliacion_kpi)"""
+        dias = int(self.env['ir.config_parameter'].sudo().get_param('solicitud_interna.dias_reconciliacion_kpi', 35))
+        self._reconciliar(desde=fields.Date.context_today(self) - timedelta(days=dias))
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(SolicitudInterna, self).create(vals_list)
+        self.env['kpi.diario.solicitud']._aplicar_deltas(records._deltas_kpi(1))
+        return records
+
+    def write(self, vals):
+        deltas = None
+        if any(campo in vals for campo in CAMPOS_KPI):
+            deltas = self._deltas_kpi(-1)
+        res = super(SolicitudInterna, self).write(vals)
+        if deltas is not None:
+            self._deltas_kpi(1, deltas)
+            self.env['kpi.diario.solicitud']._aplicar_deltas(deltas)
+        return res
+
+    def unlink(self):
+        # Los tickets archivados conservan su aportación al resumen
+        if self.env.context.get('archivando_solicitudes'):
+            return super(SolicitudInterna, self).unlink()
+        deltas = self._deltas_kpi(-1)
+        res = super(SolicitudInterna, self).unlink()
+        self.env['kpi.diario.solicitud']._aplicar_deltas(deltas)
+        return res
+
+    def _deltas_kpi(self, signo, deltas=None):
+        """Acumula la aportación de estos tickets a las filas del resumen diario"""
+        if deltas is None:
+            deltas = defaultdict(lambda: [0] * len(MEDIDAS_KPI))
+        for record in self:
+            dimensiones = (record.departamento_id.id, record.category, record.prioridad_id.id, record.state)
+            if record.fecha_solicitud:
+                delta = deltas[(record.fecha_solicitud.date(),) + dimensiones]
+                delta[0] += signo
+                delta[4] += signo * (record.costo_estimado or 0)
+                delta[5] += signo * (record.costo_real or 0)
+            if record.fecha_resolucion:
+                delta = deltas[(record.fecha_resolucion.date(),) + dimensiones]
+                delta[1] += signo
+                delta[3] += signo * (record.tiempo_resolucion or 0)
+            if record.fecha_cierre:
+                deltas[(record.fecha_cierre.date(),) + dimensiones][2] += signo
+        return deltas
@@ -0,0 +1,27 @@
+from odoo import models, fields
+
+# Tipos de recordatorio y horas de antelación respecto a la fecha límite
+TIPOS_RECORDATORIO = [
+    ('24h', '24 horas antes'),
+    ('4h', '4 horas antes'),
+    ('vencido', 'Vencido'),
+]
+ANTELACION_RECORDATORIO = {'24h': 24, '4h': 4, 'vencido': 0}
+
+
+class RecordatorioSolicitud(models.Model):
+    _name = 'recordatorio.solicitud'
+    _description = 'Recordatorio de vencimiento enviado para una solicitud'
+    _order = 'fecha_envio desc'
+
+    solicitud_id = fields.Many2one('solicitud.interna', string='Solicitud', required=True, ondelete='cascade')
+    fecha_limite = fields.Datetime(string='Fecha Límite', required=True)
+    tipo = fields.Selection(TIPOS_RECORDATORIO, string='Tipo', required=True)
+    activity_id = fields.Many2one('mail.activity', string='Actividad', ondelete='set null')
+    fecha_envio = fields.Datetime(string='Fecha de Envío', default=fields.Datetime.now, required=True)
+
+    # Garantiza una sola actividad por ventana de vencimiento, incluso con varios workers
+    _sql_constraints = [
+        ('recordatorio_unico', 'unique(solicitud_id, fecha_limite, tipo)',
+         'Ya existe un recordatorio de este tipo para la fecha límite de la solicitud.'),
+    ]
@@ -0,0 +1,191 @@
+from odoo import models, fields, api, tools
+from odoo.exceptions import ValidationError
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from dateutil.relativedelta import relativedelta
+import threading
+
+# Unidad de la recurrencia -> argumento de relativedelta
+UNIDADES_RECURRENCIA = {'dias': 'days', 'semanas': 'weeks', 'meses': 'months'}
+
+# Campos cuyo cambio recoloca la próxima ocurrencia
+CAMPOS_RECURRENCIA = {'recurrente', 'fecha_inicio_recurrencia', 'intervalo_recurrencia', 'unidad_recurrencia'}
+
+
+class PlantillaSolicitud(models.Model):
+    _inherit = 'plantilla.solicitud'
+
+    recurrente = fields.Boolean(string='Recurrente')
+    intervalo_recurrencia = fields.Integer(string='Cada', default=1)
+    unidad_recurrencia = fields.Selection([
+        ('dias', 'Días'),
+        ('semanas', 'Semanas'),
+        ('meses', 'Meses'),
+    ], string='Unidad', default='meses')
+    fecha_inicio_recurrencia = fields.Date(string='Primera Ocurrencia')
+    fecha_fin_recurrencia = fields.Date(string='Última Ocurrencia')
+    # Primera ocurrencia aún no generada; el planificador la adelanta al confirmar cada bloque
+    proxima_ocurrencia = fields.Date(string='Próxima Ocurrencia', readonly=True, copy=False, index=True)
+    departamento_recurrencia_ids = fields.Many2many(
+        'departamento.solicitud', string='Departamentos',
+        help='Un ticket por departamento en cada ocurrencia; vacío, uno solo con el departamento por defecto')
+    dias_plazo = fields.Integer(string='Días de Plazo', help='Fecha límite de los tickets tras cada ocurrencia')
+
+    @api.constrains('recurrente', 'intervalo_recurrencia', 'fecha_inicio_recurrencia', 'fecha_fin_recurrencia')
+    def _check_recurrencia(self):
+        for record in self.filtered('recurrente'):
+            if record.intervalo_recurrencia < 1 or not record.fecha_inicio_recurrencia:
+                raise ValidationError(f'La plantilla {record.name} necesita un intervalo positivo y una primera '
+                                      'ocurrencia.')
+            if record.fecha_fin_recurrencia and record.fecha_fin_recurrencia < record.fecha_inicio_recurrencia:
+                raise ValidationError(f'La última ocurrencia de {record.name} es anterior a la primera.')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            vals.setdefault('proxima_ocurrencia', vals.get('fecha_inicio_recurrencia'))
+        return super(PlantillaSolicitud, self).create(vals_list)
+
+    def write(self, vals):
+        res = super(PlantillaSolicitud, self).write(vals)
+        # Al cambiar la recurrencia se sigue desde hoy, sin rellenar las ocurrencias pasadas del nuevo ritmo
+        if CAMPOS_RECURRENCIA & set(vals) and 'proxima_ocurrencia' not in vals:
+            hoy = fields.Date.context_today(self)
+            for record in self:
+                inicio = record.fecha_inicio_recurrencia
+                record.proxima_ocurrencia = inicio and next(record._fechas_ocurrencia(max(inicio, hoy)), False)
+        return res
+
+    def _fechas_ocurrencia(self, desde, hasta=None):
+        """Fechas de la recurrencia entre `desde` y `hasta`, calculadas desde la primera para no derivar"""
+        self.ensure_one()
+        limite = min(filter(None, [hasta, self.fecha_fin_recurrencia]), default=None)
+        unidad = UNIDADES_RECURRENCIA[self.unidad_recurrencia or 'meses']
+        n = 0
+        while True:
+            fecha = self.fecha_inicio_recurrencia + relativedelta(**{unidad: self.intervalo_recurrencia * n})
+            if limite and fecha > limite:
+                return
+            if fecha >= desde:
+                yield fecha
+            n += 1
+
+    def _ocurrencias_vencidas(self, hasta):
+        """[(plantilla, fecha, [departamentos])] de las ocurrencias de estas plantillas aún no generadas"""
+        ocurrencias = []
+        for plantilla in self.filtered(lambda p: p.recurrente and p.proxima_ocurrencia):
+            departamentos = plantilla.departamento_recurrencia_ids.ids or [plantilla.departamento_id.id or None]
+            ocurrencias += [(plantilla, fecha, departamentos)
+                            for fecha in plantilla._fechas_ocurrencia(plantilla.proxima_ocurrencia, hasta)]
+        return ocurrencias
+
+    @api.model
+    def generar_recurrentes(self, hasta=None, simular=False, tamano_lote=500):
+        """Crea los tickets de todas las ocurrencias vencidas de las plantillas recurrentes.
+
+        Las ocurrencias se agrupan en bloques de unos `tamano_lote` tickets que se crean con un solo create
+        y se confirman por separado. Cada ticket lleva su plantilla, fecha de ocurrencia y departamento, con
+        un índice único sobre los tres: las ocurrencias que ya tienen ticket se saltan y volver a ejecutarlo
+        no las duplica. Con `simular` no crea nada y devuelve cuántos tickets crearía.
+        """
+        hasta = hasta or fields.Date.context_today(self)
+        ocurrencias = self.search([('recurrente', '=', True), ('activo', '=', True),
+                                   ('proxima_ocurrencia', '<=', hasta)], order='id')._ocurrencias_vencidas(hasta)
+        if simular:
+            return len(self._ocurrencias_pendientes(ocurrencias))
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        total = 0
+        bloque = []
+        for indice, ocurrencia in enumerate(ocurrencias):
+            bloque.append(ocurrencia)
+            if sum(len(departamentos) for _p, _f, departamentos in bloque) < tamano_lote \
+                    and indice < len(ocurrencias) - 1:
+                continue
+            total += self._generar_lote(bloque)
+            if auto_commit:
+                self.env.cr.commit()
+            bloque = []
+        return total
+
+    @api.model
+    def _ocurrencias_pendientes(self, ocurrencias):
+        """[(plantilla, fecha, departamento)] de las ocurrencias que aún no tienen ticket, con una consulta"""
+        claves = [(plantilla, fecha, departamento_id) for plantilla, fecha, departamentos in ocurrencias
+                  for departamento_id in departamentos]
+        if not claves:
+            return []
+        self.env['solicitud.interna'].flush_model(['plantilla_id', 'fecha_ocurrencia', 'departamento_id'])
+        self.env.cr.execute("""
+            SELECT v.plantilla_id, v.fecha, v.departamento_id
+              FROM unnest(%s::int[], %s::date[], %s::int[]) AS v(plantilla_id, fecha, departamento_id)
+              JOIN solicitud_interna s ON s.plantilla_id = v.plantilla_id AND s.fecha_ocurrencia = v.fecha
+                                      AND COALESCE(s.departamento_id, 0) = COALESCE(v.departamento_id, 0)
+        """, [[plantilla.id for plantilla, _f, _d in claves], [fecha for _p, fecha, _d in claves],
+              [departamento_id for _p, _f, departamento_id in claves]])
+        existentes = set(self.env.cr.fetchall())
+        return [(plantilla, fecha, departamento_id) for plantilla, fecha, departamento_id in claves
+                if (plantilla.id, fecha, departamento_id) not in existentes]
+
+    @api.model
+    def _generar_lote(self, ocurrencias):
+        """Crea en un solo create los tickets pendientes del bloque y adelanta la próxima ocurrencia"""
+        Solicitud = self.env['solicitud.interna']
+        ahora = fields.Datetime.now()
+        base = {}
+        extra = defaultdict(float)
+        vals_list = []
+        for plantilla, fecha, departamento_id in self._ocurrencias_pendientes(ocurrencias):
+            if plantilla not in base:
+                base[plantilla] = plantilla._valores_solicitud()
+            vals = dict(base[plantilla], departamento_id=departamento_id or False, plantilla_id=plantilla.id,
+                        fecha_ocurrencia=fecha, name=f'{plantilla.name} ({fecha})', fecha_solicitud=ahora)
+            if plantilla.dias_plazo:
+                vals['fecha_limite'] = max(datetime.combine(fecha, time.min) + timedelta(days=plantilla.dias_plazo),
+                                           ahora)
+            if plantilla.asignacion_automatica:
+                # Reparto según el departamento de la ocurrencia, contando lo ya repartido en el bloque
+                vals['gestor_id'] = Solicitud._elegir_gestor(departamento_id, plantilla.category,
+                                                             plantilla.prioridad_id.nivel or 1, extra) \
+                    or plantilla.gestor_id.id
+            vals_list.append(vals)
+        Solicitud.create(vals_list)
+        ultimas = {}
+        for plantilla, fecha, _departamentos in ocurrencias:
+            ultimas[plantilla] = max(fecha, ultimas.get(plantilla, fecha))
+        for plantilla, fecha in ultimas.items():
+            plantilla.proxima_ocurrencia = next(plantilla._fechas_ocurrencia(fecha + timedelta(days=1)), False)
+        return len(vals_list)
+
+    def action_previsualizar_recurrencia(self):
+        """Simulación: cuántos tickets crearía ahora el planificador para esta plantilla"""
+        self.ensure_one()
+        cantidad = len(self._ocurrencias_pendientes(self._ocurrencias_vencidas(fields.Date.context_today(self))))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {'title': 'Recurrencia', 'type': 'info',
+                       'message': f'Se crearían {cantidad} tickets con las ocurrencias vencidas hasta hoy.'},
+        }
+
+    def action_generar_recurrencia(self):
+        self.ensure_one()
+        cantidad = self._generar_lote(self._ocurrencias_vencidas(fields.Date.context_today(self)))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {'title': 'Recurrencia', 'type': 'success', 'message': f'Se crearon {cantidad} tickets.'},
+        }
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    plantilla_id = fields.Many2one('plantilla.solicitud', string='Plantilla', readonly=True, copy=False,
+                                   ondelete='set null')
+    fecha_ocurrencia = fields.Date(string='Ocurrencia', readonly=True, copy=False)
+
+    def init(self):
+        super(SolicitudInterna, self).init()
+        # Idempotencia de generar_recurrentes: un ticket por plantilla, ocurrencia y departamento
+        tools.create_unique_index(self.env.cr, 'solicitud_interna_ocurrencia_unica_idx', self._table,
+                                  ['plantilla_id', 'fecha_ocurrencia', '(COALESCE(departamento_id, 0))'])
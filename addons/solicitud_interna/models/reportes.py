@@ -0,0 +1,87 @@
+from odoo import models, fields, api
+
+
+class ReporteProveedorServicio(models.Model):
+    _name = 'reporte.proveedor.servicio'
+    _description = 'Indicadores de rendimiento por proveedor'
+    _auto = False
+    _order = 'total_servicios desc'
+    _rec_name = 'proveedor_id'
+
+    proveedor_id = fields.Many2one('proveedor.servicio', string='Proveedor', readonly=True)
+    total_servicios = fields.Integer(string='Total Servicios', readonly=True)
+    servicios_completados = fields.Integer(string='Servicios Completados', readonly=True)
+    tasa_completado = fields.Float(string='Tasa de Completado (%)', readonly=True, aggregator='avg')
+    tiempo_resolucion_promedio = fields.Float(string='Tiempo Medio de Resolución (horas)', readonly=True, aggregator='avg')
+    tiempo_resolucion_p90 = fields.Float(string='Tiempo de Resolución P90 (horas)', readonly=True, aggregator='max')
+    costo_estimado = fields.Float(string='Costo Estimado', readonly=True)
+    costo_real = fields.Float(string='Costo Real', readonly=True)
+    variacion_costo = fields.Float(string='Variación de Costo', readonly=True,
+                                   help='Costo real menos costo estimado de los servicios completados')
+    total_encuestas = fields.Integer(string='Encuestas', readonly=True)
+    puntuacion_encuesta_promedio = fields.Float(string='Puntuación Media de Encuestas', readonly=True, aggregator='avg')
+    fecha_actualizacion = fields.Datetime(string='Actualizado', readonly=True, aggregator='max')
+
+    def _query(self):
+        # Tickets activos y archivados: el archivo conserva proveedor, estado, costos y encuestas (en JSON)
+        return """
+            WITH servicios AS (
+                SELECT s.proveedor_id, s.state, s.fecha_resolucion, s.tiempo_resolucion, s.costo_estimado,
+                       s.costo_real, e.encuestas, e.suma_promedios
+                  FROM solicitud_interna s
+             LEFT JOIN (
+                    SELECT es.solicitud_id, count(*) AS encuestas, sum(es.puntuacion_promedio) AS suma_promedios
+                      FROM encuesta_satisfaccion es
+                  GROUP BY es.solicitud_id
+             ) e ON e.solicitud_id = s.id
+                 WHERE s.proveedor_id IS NOT NULL
+                UNION ALL
+                SELECT a.proveedor_id, a.state, a.fecha_resolucion, a.tiempo_resolucion, a.costo_estimado,
+                       a.costo_real, e.encuestas, e.suma_promedios
+                  FROM solicitud_archivada a
+             LEFT JOIN LATERAL (
+                    SELECT count(*) AS encuestas,
+                           sum(COALESCE((SELECT avg(v) FROM unnest(ARRAY[NULLIF(j->>'general', '')::int,
+                                                                         NULLIF(j->>'tiempo', '')::int,
+                                                                         NULLIF(j->>'calidad', '')::int]) AS v),
+                                        0)) AS suma_promedios
+                      FROM jsonb_array_elements(CASE WHEN jsonb_typeof(a.encuestas) = 'array'
+                                                     THEN a.encuestas ELSE '[]'::jsonb END) AS j
+             ) e ON TRUE
+                 WHERE a.proveedor_id IS NOT NULL
+            )
+            SELECT p.id AS id,
+                   p.id AS proveedor_id,
+                   count(s.proveedor_id) AS total_servicios,
+                   count(s.proveedor_id) FILTER (WHERE s.state IN ('resuelto', 'cerrado')) AS servicios_completados,
+                   COALESCE(100.0 * count(s.proveedor_id) FILTER (WHERE s.state IN ('resuelto', 'cerrado'))
+                            / NULLIF(count(s.proveedor_id), 0), 0)::float8 AS tasa_completado,
+                   avg(s.tiempo_resolucion) FILTER (WHERE s.fecha_resolucion IS NOT NULL)::float8
+                       AS tiempo_resolucion_promedio,
+                   percentile_cont(0.9) WITHIN GROUP (ORDER BY s.tiempo_resolucion)
+                       FILTER (WHERE s.fecha_resolucion IS NOT NULL) AS tiempo_resolucion_p90,
+                   COALESCE(sum(s.costo_estimado), 0)::float8 AS costo_estimado,
+                   COALESCE(sum(s.costo_real), 0)::float8 AS costo_real,
+                   COALESCE(sum(COALESCE(s.costo_real, 0) - COALESCE(s.costo_estimado, 0))
+                            FILTER (WHERE s.state IN ('resuelto', 'cerrado')), 0)::float8 AS variacion_costo,
+                   COALESCE(sum(s.encuestas), 0) AS total_encuestas,
+                   (sum(s.suma_promedios) / NULLIF(sum(s.encuestas), 0))::float8 AS puntuacion_encuesta_promedio,
+                   (now() AT TIME ZONE 'UTC') AS fecha_actualizacion
+              FROM proveedor_servicio p
+         LEFT JOIN servicios s ON s.proveedor_id = p.id
+          GROUP BY p.id
+        """
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute(f"DROP MATERIALIZED VIEW IF EXISTS {self._table} CASCADE")
+        cr.execute(f"CREATE MATERIALIZED VIEW {self._table} AS ({self._query()})")
+        # El índice único es obligatorio para REFRESH ... CONCURRENTLY
+        cr.execute(f"CREATE UNIQUE INDEX {self._table}_id_idx ON {self._table} (id)")
+
+    @api.model
+    def refrescar(self):
+        """Recalcula el reporte sin bloquear las lecturas (llamado por el cron)"""
+        self.env.cr.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {self._table}")
+        self.invalidate_model()
+        return True
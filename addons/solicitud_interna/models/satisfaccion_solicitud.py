@@ -0,0 +1,247 @@
+from odoo import models, fields, api, tools
+from odoo.tools import SQL
+from collections import defaultdict
+
+# Campos de encuesta.satisfaccion que cambian su aportación al resumen
+CAMPOS_ENCUESTA = ('solicitud_id', 'fecha', 'puntuacion_general', 'puntuacion_tiempo', 'puntuacion_calidad',
+                   'recomendaria')
+
+# Campos de solicitud.interna que trasladan sus encuestas a otra fila del resumen
+CAMPOS_DIMENSION = ('departamento_id', 'gestor_id', 'proveedor_id')
+
+# Medidas acumuladas por fila, en el orden de los vectores de delta
+MEDIDAS_SATISFACCION = ('encuestas', 'suma_general', 'suma_promedio', 'recomendarian',
+                        'general_1', 'general_2', 'general_3', 'general_4', 'general_5')
+
+# Medias que se recalculan por grupo: {campo: (numerador, denominador, factor)}
+MEDIAS_SATISFACCION = {
+    'puntuacion_general_media': ('suma_general', 'encuestas', 1),
+    'puntuacion_promedio_media': ('suma_promedio', 'encuestas', 1),
+    'tasa_recomendacion': ('recomendarian', 'encuestas', 100),
+}
+
+# Expresiones del índice único; el upsert infiere el conflicto sobre ellas (los NULL cuentan como 0)
+DIMENSIONES_RESUMEN = ['mes', '(COALESCE(departamento_id, 0))', '(COALESCE(gestor_id, 0))',
+                       '(COALESCE(proveedor_id, 0))']
+
+# Columnas que escriben el upsert y la reconciliación
+SQL_COLUMNAS_RESUMEN = f"""
+    mes, departamento_id, gestor_id, proveedor_id, {', '.join(MEDIDAS_SATISFACCION)},
+    puntuacion_general_media, puntuacion_promedio_media, tasa_recomendacion,
+    create_uid, create_date, write_uid, write_date
+"""
+
+# Encuestas de los tickets activos y de los archivados (guardadas en solicitud_archivada.encuestas)
+SQL_ENCUESTAS = """
+    SELECT e.fecha, s.departamento_id, s.gestor_id, s.proveedor_id,
+           e.valor_general AS general, e.puntuacion_promedio AS promedio,
+           COALESCE(e.recomendaria, false) AS recomendaria
+      FROM encuesta_satisfaccion e
+      JOIN solicitud_interna s ON s.id = e.solicitud_id
+    UNION ALL
+    SELECT (j->>'fecha')::timestamp, a.departamento_id, a.gestor_id, a.proveedor_id,
+           COALESCE(NULLIF(j->>'general', '')::int, 0),
+           COALESCE((SELECT avg(v) FROM unnest(ARRAY[NULLIF(j->>'general', '')::int, NULLIF(j->>'tiempo', '')::int,
+                                                    NULLIF(j->>'calidad', '')::int]) AS v), 0)::float8,
+           COALESCE((j->>'recomendaria')::boolean, false)
+      FROM solicitud_archivada a, jsonb_array_elements(a.encuestas) AS j
+     WHERE jsonb_typeof(a.encuestas) = 'array'
+"""
+
+
+class ResumenSatisfaccion(models.Model):
+    _name = 'resumen.satisfaccion'
+    _description = 'Resumen mensual de satisfacción'
+    _order = 'mes desc'
+    _rec_name = 'mes'
+
+    # Cada encuesta aporta al mes de su fecha con el departamento, gestor y proveedor actuales de su ticket
+    mes = fields.Date(string='Mes', required=True, readonly=True, index=True)
+    departamento_id = fields.Many2one('departamento.solicitud', string='Departamento', readonly=True)
+    gestor_id = fields.Many2one('res.users', string='Gestor', readonly=True, index=True)
+    proveedor_id = fields.Many2one('proveedor.servicio', string='Proveedor', readonly=True)
+
+    encuestas = fields.Integer(string='Encuestas', readonly=True)
+    suma_general = fields.Integer(string='Suma Satisfacción General', readonly=True)
+    suma_promedio = fields.Float(string='Suma Puntuación Promedio', readonly=True)
+    recomendarian = fields.Integer(string='Recomendarían', readonly=True)
+    general_1 = fields.Integer(string='Muy Insatisfecho', readonly=True)
+    general_2 = fields.Integer(string='Insatisfecho', readonly=True)
+    general_3 = fields.Integer(string='Neutral', readonly=True)
+    general_4 = fields.Integer(string='Satisfecho', readonly=True)
+    general_5 = fields.Integer(string='Muy Satisfecho', readonly=True)
+    # Medias ponderadas por número de encuestas: _read_group_select las recalcula por grupo
+    puntuacion_general_media = fields.Float(string='Satisfacción General Media', readonly=True, aggregator='avg')
+    puntuacion_promedio_media = fields.Float(string='Puntuación Promedio Media', readonly=True, aggregator='avg')
+    tasa_recomendacion = fields.Float(string='Recomendación (%)', readonly=True, aggregator='avg')
+
+    def init(self):
+        tools.create_unique_index(self.env.cr, 'resumen_satisfaccion_dimensiones_idx', self._table,
+                                  DIMENSIONES_RESUMEN)
+        self.env.cr.execute(f"SELECT 1 FROM {self._table} LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._reconciliar()
+
+    def _read_group_select(self, aggregate_spec, query):
+        # Todas las lecturas agrupadas (read_group, web_read_group, pivot y gráfico) pasan por aquí
+        campo = aggregate_spec.split(':')[0]
+        if campo in MEDIAS_SATISFACCION:
+            numerador, denominador, factor = MEDIAS_SATISFACCION[campo]
+            return SQL("COALESCE(%s * SUM(%s)::float8 / NULLIF(SUM(%s), 0), 0)", factor,
+                       self._field_to_sql(self._table, numerador, query),
+                       self._field_to_sql(self._table, denominador, query))
+        return super()._read_group_select(aggregate_spec, query)
+
+    @api.model
+    def _aplicar_deltas(self, deltas):
+        """Suma los deltas {(mes, departamento, gestor, proveedor): [medidas]} con un único upsert"""
+        claves = sorted((clave for clave, delta in deltas.items() if any(delta)), key=str)
+        if not claves:
+            return
+        self.env.cr.execute(f"""
+            INSERT INTO resumen_satisfaccion ({SQL_COLUMNAS_RESUMEN})
+            SELECT v.mes, v.departamento_id, v.gestor_id, v.proveedor_id,
+                   {', '.join(f'v.{medida}' for medida in MEDIDAS_SATISFACCION)},
+                   COALESCE(v.suma_general::float8 / NULLIF(v.encuestas, 0), 0),
+                   COALESCE(v.suma_promedio / NULLIF(v.encuestas, 0), 0),
+                   COALESCE(100.0 * v.recomendarian / NULLIF(v.encuestas, 0), 0),
+                   %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC'
+              FROM unnest(%s::date[], %s::int[], %s::int[], %s::int[],
+                          %s::int[], %s::int[], %s::float8[], %s::int[],
+                          %s::int[], %s::int[], %s::int[], %s::int[], %s::int[])
+                   AS v(mes, departamento_id, gestor_id, proveedor_id, {', '.join(MEDIDAS_SATISFACCION)})
+            ON CONFLICT ({', '.join(DIMENSIONES_RESUMEN)}) DO UPDATE
+               SET {', '.join(f'{medida} = resumen_satisfaccion.{medida} + EXCLUDED.{medida}'
+                              for medida in MEDIDAS_SATISFACCION)},
+                   puntuacion_general_media = COALESCE(
+                       (resumen_satisfaccion.suma_general + EXCLUDED.suma_general)::float8
+                       / NULLIF(resumen_satisfaccion.encuestas + EXCLUDED.encuestas, 0), 0),
+                   puntuacion_promedio_media = COALESCE(
+                       (resumen_satisfaccion.suma_promedio + EXCLUDED.suma_promedio)
+                       / NULLIF(resumen_satisfaccion.encuestas + EXCLUDED.encuestas, 0), 0),
+                   tasa_recomendacion = COALESCE(
+                       100.0 * (resumen_satisfaccion.recomendarian + EXCLUDED.recomendarian)
+                       / NULLIF(resumen_satisfaccion.encuestas + EXCLUDED.encuestas, 0), 0),
+                   write_date = EXCLUDED.write_date
+        """, [self.env.uid, self.env.uid]
+             + [[clave[posicion] for clave in claves] for posicion in range(4)]
+             + [[deltas[clave][posicion] for clave in claves] for posicion in range(len(MEDIDAS_SATISFACCION))])
+        self.invalidate_model()
+
+    @api.model
+    def _reconciliar(self):
+        """Reconstruye el resumen completo con una sola pasada sobre las encuestas activas y archivadas"""
+        self.env.flush_all()
+        self.env.cr.execute("DELETE FROM resumen_satisfaccion")
+        self.env.cr.execute(f"""
+            INSERT INTO resumen_satisfaccion ({SQL_COLUMNAS_RESUMEN})
+            SELECT date_trunc('month', e.fecha)::date, e.departamento_id, e.gestor_id, e.proveedor_id,
+                   count(*), sum(e.general), sum(e.promedio), count(*) FILTER (WHERE e.recomendaria),
+                   count(*) FILTER (WHERE e.general = 1), count(*) FILTER (WHERE e.general = 2),
+                   count(*) FILTER (WHERE e.general = 3), count(*) FILTER (WHERE e.general = 4),
+                   count(*) FILTER (WHERE e.general = 5),
+                   sum(e.general)::float8 / count(*), sum(e.promedio) / count(*),
+                   100.0 * count(*) FILTER (WHERE e.recomendaria) / count(*),
+                   %(uid)s, now() AT TIME ZONE 'UTC', %(uid)s, now() AT TIME ZONE 'UTC'
+              FROM ({SQL_ENCUESTAS}) e
+             WHERE e.fecha IS NOT NULL
+          GROUP BY 1, e.departamento_id, e.gestor_id, e.proveedor_id
+        """, {'uid': self.env.uid})
+        self.invalidate_model()
+
+    @api.model
+    def reconciliar(self):
+        """Reconciliación nocturna (llamada por el cron)"""
+        self._reconciliar()
+        return True
+
+
+class EncuestaSatisfaccion(models.Model):
+    _inherit = 'encuesta.satisfaccion'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(EncuestaSatisfaccion, self).create(vals_list)
+        self.env['resumen.satisfaccion']._aplicar_deltas(records._deltas_satisfaccion(1))
+        return records
+
+    def write(self, vals):
+        deltas = None
+        if any(campo in vals for campo in CAMPOS_ENCUESTA):
+            deltas = self._deltas_satisfaccion(-1)
+        res = super(EncuestaSatisfaccion, self).write(vals)
+        if deltas is not None:
+            self._deltas_satisfaccion(1, deltas)
+            self.env['resumen.satisfaccion']._aplicar_deltas(deltas)
+        return res
+
+    def unlink(self):
+        deltas = self._deltas_satisfaccion(-1)
+        res = super(EncuestaSatisfaccion, self).unlink()
+        self.env['resumen.satisfaccion']._aplicar_deltas(deltas)
+        return res
+
+    def _deltas_satisfaccion(self, signo, deltas=None):
+        """Acumula la aportación de estas encuestas a las filas del resumen mensual"""
+        if deltas is None:
+            deltas = defaultdict(lambda: [0] * len(MEDIDAS_SATISFACCION))
+        for record in self.sudo():
+            if not record.fecha:
+                continue
+            solicitud = record.solicitud_id
+            delta = deltas[(record.fecha.date().replace(day=1), solicitud.departamento_id.id or None,
+                            solicitud.gestor_id.id or None, solicitud.proveedor_id.id or None)]
+            general = int(record.puntuacion_general or 0)
+            delta[0] += signo
+            delta[1] += signo * general
+            delta[2] += signo * record.puntuacion_promedio
+            delta[3] += signo * bool(record.recomendaria)
+            if general:
+                delta[3 + general] += signo
+        return deltas
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    # Se sincroniza con la encuesta más reciente; sin encuestas conserva el valor introducido a mano
+    puntuacion_satisfaccion = fields.Selection(compute='_compute_puntuacion_satisfaccion', store=True, readonly=False)
+
+    @api.depends('encuesta_ids.puntuacion_general', 'encuesta_ids.fecha')
+    def _compute_puntuacion_satisfaccion(self):
+        for record in self:
+            if record.encuesta_ids:
+                ultima = max(record.encuesta_ids, key=lambda encuesta: (encuesta.fecha, encuesta.id))
+                record.puntuacion_satisfaccion = ultima.puntuacion_general
+
+    def init(self):
+        super(SolicitudInterna, self).init()
+        # Tickets con encuestas anteriores a la sincronización
+        self.env.cr.execute("""
+            UPDATE solicitud_interna s
+               SET puntuacion_satisfaccion = u.puntuacion_general
+              FROM (SELECT DISTINCT ON (solicitud_id) solicitud_id, puntuacion_general
+                      FROM encuesta_satisfaccion
+                  ORDER BY solicitud_id, fecha DESC, id DESC) u
+             WHERE u.solicitud_id = s.id
+               AND s.puntuacion_satisfaccion IS DISTINCT FROM u.puntuacion_general
+        """)
+
+    def write(self, vals):
+        deltas = None
+        if any(campo in vals for campo in CAMPOS_DIMENSION):
+            deltas = self.encuesta_ids._deltas_satisfaccion(-1)
+        res = super(SolicitudInterna, self).write(vals)
+        if deltas is not None:
+            self.encuesta_ids._deltas_satisfaccion(1, deltas)
+            self.env['resumen.satisfaccion']._aplicar_deltas(deltas)
+        return res
+
+    def unlink(self):
+        # Las encuestas de los tickets archivados conservan su aportación al resumen
+        if self.env.context.get('archivando_solicitudes'):
+            return super(SolicitudInterna, self).unlink()
+        deltas = self.encuesta_ids._deltas_satisfaccion(-1)
+        res = super(SolicitudInterna, self).unlink()
+        self.env['resumen.satisfaccion']._aplicar_deltas(deltas)
+        return res
@@ -0,0 +1,128 @@
+from odoo import models, fields, api, tools
+
+# Parámetro del sistema que activa el seguimiento compacto ('1' o 'True')
+PARAMETRO_SEGUIMIENTO_COMPACTO = 'solicitud_interna.seguimiento_compacto'
+
+# Clave de cr.precommit.data con los textos de chatter pendientes de fusionar {id: [textos]}
+CLAVE_NOTAS = 'solicitud_interna.notas'
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    @api.model
+    def _seguimiento_compacto_activo(self):
+        valor = self.env['ir.config_parameter'].sudo().get_param(PARAMETRO_SEGUIMIENTO_COMPACTO, '')
+        return valor.lower() in ('1', 'true')
+
+    def _registrar_mensajes(self, cuerpos):
+        if not self._seguimiento_compacto_activo():
+            return super(SolicitudInterna, self)._registrar_mensajes(cuerpos)
+        # Se acumulan y se publican junto con el diff de la transacción en _track_finalize
+        notas = self.env.cr.precommit.data.setdefault(CLAVE_NOTAS, {})
+        for solicitud_id, texto in cuerpos.items():
+            notas.setdefault(solicitud_id, []).append(texto)
+        self.env.cr.precommit.add(self._track_finalize)
+
+    def _track_finalize(self):
+        """En modo compacto, un único mensaje por ticket y transacción con todos los cambios en un diff JSON.
+
+        Sustituye a las filas de mail.tracking.value: el diff guarda ids y claves en lugar de nombres,
+        los campos HTML solo se marcan como modificados y el chatter lo decodifica al mostrarlo.
+        """
+        if not self._seguimiento_compacto_activo():
+            return super(SolicitudInterna, self)._track_finalize()
+        iniciales = self.env.cr.precommit.data.pop(f'mail.tracking.{self._name}', {})
+        notas = self.env.cr.precommit.data.pop(CLAVE_NOTAS, {})
+        ids = {solicitud_id for solicitud_id, valores in iniciales.items() if valores} | set(notas)
+        if not ids:
+            return
+        nota_id = self.env['ir.model.data']._xmlid_to_res_id('mail.mt_note')
+        autor_id = self.env.user.partner_id.id
+        mensajes = []
+        for record in self.browse(sorted(ids)).sudo().exists():
+            diff = record._diff_compacto(iniciales.get(record.id) or {})
+            if not diff and record.id not in notas:
+                continue
+            mensajes.append({
+                'model': self._name,
+                'res_id': record.id,
+                'message_type': 'notification',
+                'subtype_id': nota_id,
+                'author_id': autor_id,
+                'body': tools.plaintext2html(' '.join(notas.get(record.id, []))) if record.id in notas else '',
+                'seguimiento_compacto': diff or False,
+            })
+            record._message_track_post_template(set(diff))
+        self.env['mail.message'].sudo().create(mensajes)
+        self.env.flush_all()
+
+    def _diff_compacto(self, iniciales):
+        """{campo: [anterior, nuevo]} de los campos seguidos que cambiaron, con valores serializables"""
+        self.ensure_one()
+        diff = {}
+        for fname, anterior in iniciales.items():
+            campo = self._fields[fname]
+            nuevo = self[fname]
+            if campo.type == 'html':
+                if (anterior or '') != (nuevo or ''):
+                    diff[fname] = [None, None]
+                continue
+            anterior, nuevo = (self._valor_compacto(campo, valor) for valor in (anterior, nuevo))
+            if anterior != nuevo:
+                diff[fname] = [anterior, nuevo]
+        return diff
+
+    @staticmethod
+    def _valor_compacto(campo, valor):
+        if campo.type == 'many2one':
+            return valor.id or None
+        if campo.type in ('many2many', 'one2many'):
+            return sorted(valor.ids)
+        if campo.type in ('date', 'datetime'):
+            return campo.to_string(valor) if valor else None
+        return valor if valor is not False else None
+
+
+class MailMessage(models.Model):
+    _inherit = 'mail.message'
+
+    # Diff compacto de seguimiento {campo: [anterior, nuevo]} (ver solicitud.interna._track_finalize)
+    seguimiento_compacto = fields.Json(string='Seguimiento Compacto', readonly=True)
+
+    def _seguimiento_compacto_formato(self):
+        """Decodifica el diff al formato trackingValues del chatter; los nombres se leen al mostrarlo"""
+        self.ensure_one()
+        modelo = self.env[self.model]
+        valores = []
+        for indice, (fname, (anterior, nuevo)) in enumerate(sorted(self.seguimiento_compacto.items())):
+            campo = modelo._fields.get(fname)
+            if campo is None:
+                continue
+            tipo = 'char' if campo.type in ('html', 'many2one', 'selection', 'many2many', 'one2many') else campo.type
+            valores.append({
+                'id': -(self.id * 1000 + indice),
+                'fieldName': fname,
+                'changedField': campo.get_description(self.env)['string'],
+                'oldValue': {'currencyId': False, 'fieldType': tipo, 'value': self._decodificar_valor(campo, anterior)},
+                'newValue': {'currencyId': False, 'fieldType': tipo, 'value': self._decodificar_valor(campo, nuevo)},
+            })
+        return valores
+
+    def _decodificar_valor(self, campo, valor):
+        if campo.type == 'html':
+            return '(modificado)'
+        if valor is None:
+            return False
+        if campo.type == 'many2one':
+            return self.env[campo.comodel_name].sudo().browse(valor).exists().display_name or ''
+        if campo.type in ('many2many', 'one2many'):
+            return ', '.join(self.env[campo.comodel_name].sudo().browse(valor).exists().mapped('display_name'))
+        if campo.type == 'selection':
+            return dict(campo._description_selection(self.env)).get(valor, valor)
+        return valor
+
+    def _to_store(self, store, *args, **kwargs):
+        super(MailMessage, self)._to_store(store, *args, **kwargs)
+        for message in self.sudo().filtered('seguimiento_compacto'):
+            store.add(message, {'trackingValues': message._seguimiento_compacto_formato()})
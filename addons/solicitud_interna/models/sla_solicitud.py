@@ -0,0 +1,223 @@
+from odoo import models, fields, api, tools
+from collections import defaultdict
+from datetime import timedelta
+
+from .solicitud_interna import ESTADOS_CERRADOS
+
+TIPOS_SLA = [
+    ('respuesta', 'Respuesta'),
+    ('resolucion', 'Resolución'),
+]
+
+# Estados de un evento que todavía pueden vencer
+ESTADOS_SLA_ACTIVOS = ('pendiente', 'pausado')
+
+
+class EventoSlaSolicitud(models.Model):
+    _name = 'evento.sla.solicitud'
+    _description = 'Vencimiento de SLA de una solicitud'
+    _order = 'fecha_vencimiento desc'
+    _rec_name = 'solicitud_id'
+
+    solicitud_id = fields.Many2one('solicitud.interna', string='Solicitud', required=True, ondelete='cascade', index=True)
+    tipo = fields.Selection(TIPOS_SLA, string='Tipo', required=True)
+    estado = fields.Selection([
+        ('pendiente', 'Pendiente'),
+        ('pausado', 'Pausado'),
+        ('cumplido', 'Cumplido'),
+        ('incumplido', 'Incumplido'),
+        ('cancelado', 'Cancelado'),
+    ], string='Estado', default='pendiente', required=True)
+    fecha_vencimiento = fields.Datetime(string='Fecha de Vencimiento', required=True)
+    segundos_restantes = fields.Integer(string='Segundos Restantes', help='Tiempo que quedaba al pausar el SLA')
+    fecha_cumplimiento = fields.Datetime(string='Fecha de Cumplimiento')
+    fecha_incumplimiento = fields.Datetime(string='Fecha de Incumplimiento')
+
+    # Campos para reportes de incumplimientos
+    prioridad_id = fields.Many2one(related='solicitud_id.prioridad_id', store=True)
+    departamento_id = fields.Many2one(related='solicitud_id.departamento_id', store=True)
+    gestor_id = fields.Many2one(related='solicitud_id.gestor_id', store=True)
+
+    def init(self):
+        # Cola de prioridad de vencimientos: solo los eventos pendientes, ordenados por fecha
+        tools.create_index(self.env.cr, 'evento_sla_solicitud_cola_idx', self._table,
+                           ['fecha_vencimiento'], where="estado = 'pendiente'")
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        eventos = super(EventoSlaSolicitud, self).create(vals_list)
+        eventos._programar_procesamiento()
+        return eventos
+
+    def _programar_procesamiento(self):
+        """Despierta el cron en el vencimiento más próximo de estos eventos"""
+        fechas = [evento.fecha_vencimiento for evento in self if evento.estado == 'pendiente']
+        cron = self.env.ref('solicitud_interna.ir_cron_procesar_vencimientos_sla', raise_if_not_found=False)
+        if fechas and cron:
+            cron.sudo()._trigger(at=min(fechas))
+
+    @api.model
+    def procesar_vencimientos(self, tamano_lote=1000):
+        """Marca como incumplidos los eventos vencidos y programa la siguiente ejecución.
+
+        Los eventos se toman de la cola en orden de vencimiento mediante el índice parcial, por lo que el
+        coste depende de los eventos vencidos y no del número total de tickets.
+        """
+        ahora = fields.Datetime.now()
+        self.flush_model(['estado', 'fecha_vencimiento'])
+        while True:
+            self.env.cr.execute("""
+                SELECT id FROM evento_sla_solicitud
+                 WHERE estado = 'pendiente' AND fecha_vencimiento <= %s
+              ORDER BY fecha_vencimiento
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+            """, [ahora, tamano_lote])
+            eventos = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not eventos:
+                break
+            eventos.write({'estado': 'incumplido', 'fecha_incumplimiento': ahora})
+            eventos._notificar_incumplimiento()
+            if len(eventos) < tamano_lote:
+                break
+
+        self.env.cr.execute("SELECT min(fecha_vencimiento) FROM evento_sla_solicitud WHERE estado = 'pendiente'")
+        proximo = self.env.cr.fetchone()[0]
+        cron = self.env.ref('solicitud_interna.ir_cron_procesar_vencimientos_sla', raise_if_not_found=False)
+        if proximo and cron:
+            cron.sudo()._trigger(at=proximo)
+
+    def _notificar_incumplimiento(self):
+        tickets = self.solicitud_id
+        tickets.write({'sla_incumplido': True})
+        etiquetas = dict(TIPOS_SLA)
+        cuerpos = defaultdict(list)
+        for evento in self:
+            cuerpos[evento.solicitud_id.id].append(f'SLA de {etiquetas[evento.tipo].lower()} incumplido.')
+        tickets._message_log_batch(bodies={ticket_id: ' '.join(textos) for ticket_id, textos in cuerpos.items()})
+
+
+class SolicitudInterna(models.Model):
+    _inherit = 'solicitud.interna'
+
+    fecha_limite_respuesta = fields.Datetime(string='Límite de Respuesta', readonly=True, copy=False)
+    sla_incumplido = fields.Boolean(string='SLA Incumplido', readonly=True, copy=False)
+    evento_sla_ids = fields.One2many('evento.sla.solicitud', 'solicitud_id', string='Eventos SLA')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._sla_completar_fechas(vals_list)
+        records = super(SolicitudInterna, self).create(vals_list)
+        records._sla_programar()
+        return records
+
+    def write(self, vals):
+        estados_anteriores = {record.id: record.state for record in self} if 'state' in vals else None
+        res = super(SolicitudInterna, self).write(vals)
+        if self.env.context.get('sla_sincronizando'):
+            return res
+        if estados_anteriores is not None:
+            self._sla_cambio_estado(estados_anteriores)
+        elif 'fecha_limite' in vals:
+            self._sla_sincronizar_fecha_limite()
+        return res
+
+    @api.model
+    def _sla_completar_fechas(self, vals_list):
+        """Deriva los límites de respuesta y resolución de la prioridad cuando no se indican"""
+        prioridades = self.env['prioridad.solicitud'].browse({vals['prioridad_id'] for vals in vals_list
+                                                              if vals.get('prioridad_id')})
+        por_id = {prioridad.id: prioridad for prioridad in prioridades}
+        ahora = fields.Datetime.now()
+        for vals in vals_list:
+            prioridad = por_id.get(vals.get('prioridad_id'))
+            if not prioridad:
+                continue
+            base = fields.Datetime.to_datetime(vals.get('fecha_solicitud')) or ahora
+            if not vals.get('fecha_limite') and prioridad.tiempo_resolucion_horas:
+                vals['fecha_limite'] = base + timedelta(hours=prioridad.tiempo_resolucion_horas)
+            if not vals.get('fecha_limite_respuesta') and prioridad.tiempo_respuesta_horas:
+                vals['fecha_limite_respuesta'] = base + timedelta(hours=prioridad.tiempo_respuesta_horas)
+
+    def _sla_programar(self, reiniciar=False):
+        """Crea los eventos de SLA que faltan según el estado de cada ticket.
+
+        Con reiniciar (reapertura) los límites se recalculan desde ahora con las horas de la prioridad.
+        """
+        Evento = self.env['evento.sla.solicitud'].sudo()
+        activos = Evento.search([('solicitud_id', 'in', self.ids), ('estado', 'in', ESTADOS_SLA_ACTIVOS)])
+        tipos_activos = {(evento.solicitud_id.id, evento.tipo) for evento in activos}
+        ahora = fields.Datetime.now()
+        nuevos = []
+        for record in self:
+            prioridad = record.prioridad_id
+            fechas = {}
+            if record.state == 'pendiente' and (record.id, 'respuesta') not in tipos_activos:
+                limite = record.fecha_limite_respuesta
+                if (reiniciar or not limite) and prioridad.tiempo_respuesta_horas:
+                    limite = fechas['fecha_limite_respuesta'] = ahora + timedelta(hours=prioridad.tiempo_respuesta_horas)
+                if limite:
+                    nuevos.append({'solicitud_id': record.id, 'tipo': 'respuesta', 'fecha_vencimiento': limite})
+            if record.state not in ('borrador',) + ESTADOS_CERRADOS and (record.id, 'resolucion') not in tipos_activos:
+                limite = record.fecha_limite
+                if (reiniciar or not limite) and prioridad.tiempo_resolucion_horas:
+                    limite = fechas['fecha_limite'] = ahora + timedelta(hours=prioridad.tiempo_resolucion_horas)
+                if limite:
+                    nuevos.append({'solicitud_id': record.id, 'tipo': 'resolucion', 'fecha_vencimiento': limite})
+            if reiniciar:
+                fechas['sla_incumplido'] = False
+            if fechas:
+                record.with_context(sla_sincronizando=True).write(fechas)
+        Evento.create(nuevos)
+
+    def _sla_cambio_estado(self, estados_anteriores):
+        """Cumple, cancela, pausa o reanuda los eventos activos según la transición de cada ticket"""
+        cambiados = self.filtered(lambda record: estados_anteriores[record.id] != record.state)
+        if not cambiados:
+            return
+        ahora = fields.Datetime.now()
+        Evento = self.env['evento.sla.solicitud'].sudo()
+        cumplidos, cancelados, reanudados = [], [], []
+        for evento in Evento.search([('solicitud_id', 'in', cambiados.ids), ('estado', 'in', ESTADOS_SLA_ACTIVOS)]):
+            record = evento.solicitud_id
+            anterior, nuevo = estados_anteriores[record.id], record.state
+            if nuevo == 'cancelado':
+                cancelados.append(evento.id)
+            elif nuevo in ESTADOS_CERRADOS or (evento.tipo == 'respuesta' and nuevo not in ('borrador', 'pendiente')):
+                cumplidos.append(evento.id)
+            elif nuevo == 'esperando_respuesta' and evento.estado == 'pendiente' \
+                    and record.prioridad_id.pausar_sla_en_espera:
+                evento.write({
+                    'estado': 'pausado',
+                    'segundos_restantes': max(0, int((evento.fecha_vencimiento - ahora).total_seconds())),
+                })
+            elif anterior == 'esperando_respuesta' and evento.estado == 'pausado':
+                evento.write({
+                    'estado': 'pendiente',
+                    'fecha_vencimiento': ahora + timedelta(seconds=evento.segundos_restantes),
+                })
+                reanudados.append(evento.id)
+        Evento.browse(cumplidos).write({'estado': 'cumplido', 'fecha_cumplimiento': ahora})
+        Evento.browse(cancelados).write({'estado': 'cancelado'})
+        reanudados = Evento.browse(reanudados)
+        # El tiempo en pausa desplaza la fecha límite visible del ticket
+        for evento in reanudados.filtered(lambda evento: evento.tipo == 'resolucion'):
+            evento.solicitud_id.with_context(sla_sincronizando=True).write({'fecha_limite': evento.fecha_vencimiento})
+        reanudados._programar_procesamiento()
+
+        reabiertos = cambiados.filtered(
+            lambda record: estados_anteriores[record.id] in ESTADOS_CERRADOS and record.state not in ESTADOS_CERRADOS)
+        reabiertos._sla_programar(reiniciar=True)
+        (cambiados - reabiertos)._sla_programar()
+
+    def _sla_sincronizar_fecha_limite(self):
+        """Traslada un cambio manual de fecha límite al evento de resolución pendiente"""
+        eventos = self.env['evento.sla.solicitud'].sudo().search([
+            ('solicitud_id', 'in', self.ids), ('tipo', '=', 'resolucion'), ('estado', '=', 'pendiente'),
+        ])
+        for evento in eventos:
+            if evento.solicitud_id.fecha_limite:
+                evento.fecha_vencimiento = evento.solicitud_id.fecha_limite
+            else:
+                evento.estado = 'cancelado'
+        eventos._programar_procesamiento()
@@ -1,7 +1,57 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError, UserError
+from collections import defaultdict
 from datetime import datetime, timedelta
+import psycopg2
 import re
+import textwrap
+import threading
+
+from .tablas_extra import ESTADOS_PENDIENTES
+from .recordatorio_solicitud import ANTELACION_RECORDATORIO
+
+# Estados en los que un ticket ya no puede vencer
+ESTADOS_CERRADOS = ('cerrado', 'cancelado', 'resuelto')
+
+# Orden por defecto del modelo, reutilizado como sufijo de los índices compuestos
+ORDEN_INDICE = ['fecha_solicitud DESC', 'prioridad_nivel DESC']
+
+# Índices que siguen las rutas de acceso reales: (nombre, expresiones, condición del índice parcial)
+INDICES_SOLICITUD = [
+    # Lista y kanban por defecto, y cada columna del kanban agrupado por estado
+    ('solicitud_interna_orden_idx', ORDEN_INDICE, ''),
+    ('solicitud_interna_estado_orden_idx', ['state'] + ORDEN_INDICE, ''),
+    # "Mis Tickets" y "Tickets Asignados"
+    ('solicitud_interna_solicitante_orden_idx', ['solicitante_id'] + ORDEN_INDICE, ''),
+    ('solicitud_interna_gestor_orden_idx', ['gestor_id'] + ORDEN_INDICE, 'gestor_id IS NOT NULL'),
+    # Filtro "Pendientes", activo por defecto en "Todos los Tickets" y "Tickets Asignados"
+    ('solicitud_interna_pendientes_idx', ORDEN_INDICE, "state IN ('pendiente', 'asignado')"),
+    ('solicitud_interna_gestor_pendientes_idx', ['gestor_id'] + ORDEN_INDICE,
+     "state IN ('pendiente', 'asignado') AND gestor_id IS NOT NULL"),
+    # Filtro "Alta Prioridad"
+    ('solicitud_interna_alta_prioridad_idx', ORDEN_INDICE, 'prioridad_nivel >= 4'),
+    # Menú "Vencidos" y barrido de vencimientos sobre los tickets abiertos
+    ('solicitud_interna_vencidos_idx', ORDEN_INDICE, 'esta_vencido'),
+    ('solicitud_interna_por_vencer_idx', ['fecha_limite'],
+     f"esta_vencido IS NOT TRUE AND state NOT IN {ESTADOS_CERRADOS}"),
+    # Exportación incremental por marca de agua (exportacion.solicitud)
+    ('solicitud_interna_write_date_idx', ['write_date'], ''),
+]
+
+# A partir de este número de tickets, create usa el registro y la suscripción en bloque
+TAMANO_LOTE_CREACION = 50
+
+# Campos HTML grandes: fuera del prefetch por defecto y almacenados fuera de la fila (TOAST) comprimidos
+CAMPOS_HTML_GRANDES = ('description', 'solucion')
+
+# Caracteres del extracto en texto plano que muestra la tarjeta del kanban
+LONGITUD_EXTRACTO = 200
+
+
+def extracto_html(html):
+    """Extracto en texto plano de un cuerpo HTML (también lo usa la importación masiva al insertar)"""
+    texto = tools.html2plaintext(html) if html else ''
+    return textwrap.shorten(texto, LONGITUD_EXTRACTO, placeholder='…') or False
 
 class SolicitudInterna(models.Model):
     _name = 'solicitud.interna'
@@ -13,7 +63,9 @@ class SolicitudInterna(models.Model):
     # Campos básicos
     numero_ticket = fields.Char(string='Número de Ticket', required=True, copy=False, readonly=True, default='Nuevo')
     name = fields.Char(string='Título', required=True, tracking=True)
-    description = fields.Html(string='Descripción', tracking=True)
+    # prefetch='cuerpo_html': solo se leen cuando se piden explícitamente (formulario), ambos a la vez
+    description = fields.Html(string='Descripción', tracking=True, prefetch='cuerpo_html')
+    extracto = fields.Char(string='Extracto', compute='_compute_extracto', store=True)
     
     # Categorización
     category = fields.Selection([
@@ -63,12 +115,13 @@ class SolicitudInterna(models.Model):
     # Campos calculados
     prioridad_nivel = fields.Integer(related='prioridad_id.nivel', store=True)
     tiempo_resolucion = fields.Float(string='Tiempo de Resolución (horas)', compute='_compute_tiempo_resolucion', store=True)
-    dias_pendiente = fields.Integer(string='Días Pendiente', compute='_compute_dias_pendiente')
-    esta_vencido = fields.Boolean(string='Está Vencido', compute='_compute_esta_vencido', search='_search_esta_vencido')
+    # Almacenados: el barrido programado (_barrer_vencimientos) los actualiza cuando pasa el tiempo
+    dias_pendiente = fields.Integer(string='Días Pendiente', compute='_compute_dias_pendiente', store=True)
+    esta_vencido = fields.Boolean(string='Está Vencido', compute='_compute_esta_vencido', store=True)
     
     # Campos de seguimiento
     comentarios = fields.Text(string='Comentarios Internos')
-    solucion = fields.Html(string='Solución Aplicada')
+    solucion = fields.Html(string='Solución Aplicada', prefetch='cuerpo_html')
     costo_estimado = fields.Float(string='Costo Estimado')
     costo_real = fields.Float(string='Costo Real')
     
@@ -88,16 +141,115 @@ class SolicitudInterna(models.Model):
     ], string='Puntuación de Satisfacción')
     
     # Campos de color para kanban
-    color = fields.Integer(string='Color', compute='_compute_color')
+    color = fields.Integer(string='Color', compute='_compute_color', store=True)
+
+    _sql_constraints = [
+        ('fecha_limite_posterior', 'CHECK(fecha_limite IS NULL OR fecha_limite >= fecha_solicitud)',
+         'La fecha límite no puede ser anterior a la fecha de solicitud.'),
+    ]
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        nuevos = [vals for vals in vals_list if vals.get('numero_ticket', 'Nuevo') == 'Nuevo']
+        for vals, numero in zip(nuevos, self._siguientes_numeros_ticket(len(nuevos))):
+            vals['numero_ticket'] = numero
+        for vals in vals_list:
+            vals.setdefault('state', 'pendiente')
+        # En lotes grandes el mensaje inicial y la suscripción se crean en bloque en lugar de ticket a ticket
+        masivo = len(vals_list) >= TAMANO_LOTE_CREACION
+        modelo = self.with_context(mail_create_nolog=True, mail_create_nosubscribe=True) if masivo else self
+        records = super(SolicitudInterna, modelo).create(vals_list).with_env(self.env)
+        if masivo:
+            records._registrar_creacion_masiva()
+        self.env['departamento.solicitud']._aplicar_delta_estadisticas(
+            records._deltas_estadisticas_departamento(1))
+        return records
     
     @api.model
-    def create(self, vals):
-        if vals.get('numero_ticket', 'Nuevo') == 'Nuevo':
-            vals['numero_ticket'] = self.env['ir.sequence'].next_by_code('solicitud.interna') or 'Nuevo'
-        if 'state' not in vals:
-            vals['state'] = 'pendiente'
-        return super(SolicitudInterna, self).create(vals)
+    def _siguientes_numeros_ticket(self, cantidad):
+        """Reserva los siguientes números de ticket; con secuencias estándar usa un solo nextval en bloque"""
+        if not cantidad:
+            return []
+        secuencia = self.env['ir.sequence'].sudo().search([
+            ('code', '=', 'solicitud.interna'),
+            ('company_id', 'in', [self.env.company.id, False]),
+        ], order='company_id', limit=1)
+        if not secuencia:
+            return ['Nuevo'] * cantidad
+        if cantidad == 1 or secuencia.implementation != 'standard' or secuencia.use_date_range:
+            return [secuencia._next() for _i in range(cantidad)]
+        self.env.cr.execute("SELECT nextval(%s) FROM generate_series(1, %s)",
+                            [f'ir_sequence_{secuencia.id:03d}', cantidad])
+        return [secuencia.get_next_char(numero) for (numero,) in self.env.cr.fetchall()]
+    
+    def _registrar_creacion_masiva(self):
+        """Mensaje de creación y suscripción del creador para todo el lote en una sola operación"""
+        self._message_log_batch(bodies=dict.fromkeys(self.ids, 'Ticket creado.'))
+        self.message_subscribe(partner_ids=self.env.user.partner_id.ids)
     
+    def write(self, vals):
+        deltas = None
+        if 'state' in vals or 'departamento_id' in vals:
+            deltas = self._deltas_estadisticas_departamento(-1)
+        res = super(SolicitudInterna, self).write(vals)
+        if deltas is not None:
+            self._deltas_estadisticas_departamento(1, deltas)
+            self.env['departamento.solicitud']._aplicar_delta_estadisticas(deltas)
+        return res
+    
+    def unlink(self):
+        # Los tickets archivados siguen contando en el total de su departamento
+        if self.env.context.get('archivando_solicitudes'):
+            return super(SolicitudInterna, self).unlink()
+        deltas = self._deltas_estadisticas_departamento(-1)
+        res = super(SolicitudInterna, self).unlink()
+        self.env['departamento.solicitud']._aplicar_delta_estadisticas(deltas)
+        return res
+    
+    def init(self):
+        # Se ejecuta tras crear todas las tablas del módulo: rellena los contadores de departamentos
+        # y los tiempos en estado del historial que aún no estén calculados
+        self.env['departamento.solicitud']._reconciliar_estadisticas()
+        self.env['historial.estado.solicitud']._rellenar_tiempo_en_estado()
+        # Índices compuestos y parciales de las rutas de acceso (ver INDICES_SOLICITUD)
+        for nombre, expresiones, condicion in INDICES_SOLICITUD:
+            tools.create_index(self.env.cr, nombre, self._table, expresiones, where=condicion)
+        self._comprimir_campos_html()
+
+    def _comprimir_campos_html(self):
+        """Saca de la fila los cuerpos HTML a partir de ~256 bytes y los comprime con lz4 si el servidor lo admite.
+
+        Las filas del heap quedan estrechas para las lecturas de lista y kanban. La compresión solo se
+        aplica a los valores que se escriban a partir de ahora; VACUUM FULL reescribe los existentes.
+        """
+        cr = self.env.cr
+        cr.execute(f"ALTER TABLE {self._table} SET (toast_tuple_target = 256)")
+        cr.execute("SHOW server_version_num")
+        if int(cr.fetchone()[0]) < 140000:
+            return
+        try:
+            with cr.savepoint():
+                for campo in CAMPOS_HTML_GRANDES:
+                    cr.execute(f'ALTER TABLE {self._table} ALTER COLUMN "{campo}" SET COMPRESSION lz4')
+        except psycopg2.Error:
+            pass  # Servidor compilado sin lz4: se mantiene pglz
+    
+    def _deltas_estadisticas_departamento(self, signo, deltas=None):
+        """Acumula la contribución de estas solicitudes a los contadores de su departamento"""
+        if deltas is None:
+            deltas = defaultdict(lambda: [0, 0])
+        for record in self:
+            delta = deltas[record.departamento_id.id]
+            delta[0] += signo
+            if record.state in ESTADOS_PENDIENTES:
+                delta[1] += signo
+        return deltas
+    
+    @api.depends('description')
+    def _compute_extracto(self):
+        for record in self:
+            record.extracto = extracto_html(record.description)
+
     @api.depends('fecha_solicitud', 'fecha_resolucion')
     def _compute_tiempo_resolucion(self):
         for record in self:
@@ -107,7 +259,7 @@ class SolicitudInterna(models.Model):
             else:
                 record.tiempo_resolucion = 0
     
-    @api.depends('fecha_solicitud')
+    @api.depends('fecha_solicitud', 'state')
     def _compute_dias_pendiente(self):
         for record in self:
             if record.fecha_solicitud and record.state not in ['cerrado', 'cancelado']:
@@ -119,22 +271,12 @@ class SolicitudInterna(models.Model):
     @api.depends('fecha_limite', 'state')
     def _compute_esta_vencido(self):
         for record in self:
-            if record.fecha_limite and record.state not in ['cerrado', 'cancelado', 'resuelto']:
+            if record.fecha_limite and record.state not in ESTADOS_CERRADOS:
                 record.esta_vencido = fields.Datetime.now() > record.fecha_limite
             else:
                 record.esta_vencido = False
 
-    def _search_esta_vencido(self, operator, value):
-        if operator not in ('=', '!=') or not isinstance(value, bool):
-            raise UserError(_("Operation not supported"))
-        now = fields.Datetime.now()
-        closed_states = ['cerrado', 'cancelado', 'resuelto']
-        if (operator == '=' and value) or (operator == '!=' and not value):
-            return [('fecha_limite', '!=', False), ('fecha_limite', '<', now), ('state', 'not in', closed_states)]
-        else:
-            return ['|', '|', ('fecha_limite', '=', False), ('fecha_limite', '>=', now), ('state', 'in', closed_states)]
-    
-    @api.depends('prioridad_id', 'state', 'esta_vencido')
+    @api.depends('prioridad_id.nivel', 'state', 'esta_vencido')
     def _compute_color(self):
         for record in self:
             if record.esta_vencido:
@@ -148,91 +290,285 @@ class SolicitudInterna(models.Model):
     
     @api.constrains('fecha_limite')
     def _check_fecha_limite(self):
-        for record in self:
-            if record.fecha_limite and record.fecha_limite < record.fecha_solicitud:
-                raise ValidationError('La fecha límite no puede ser anterior a la fecha de solicitud.')
+        # Una sola pasada sobre el lote escrito, con todos los tickets que incumplen en el mismo error
+        errores = [f'- {record.numero_ticket}' for record in self
+                   if record.fecha_limite and record.fecha_solicitud and record.fecha_limite < record.fecha_solicitud]
+        if errores:
+            raise ValidationError('La fecha límite no puede ser anterior a la fecha de solicitud.\n' + '\n'.join(errores))
     
     def _crear_historial_estado(self, estado_anterior, estado_nuevo):
-        self.env['historial.estado.solicitud'].create({
-            'solicitud_id': self.id,
-            'estado_anterior': estado_anterior,
+        """Registra el cambio de estado de todo el recordset con un único create.
+
+        estado_anterior puede ser un estado o un dict {id: estado} cuando cada ticket venía de uno distinto.
+        """
+        if not isinstance(estado_anterior, dict):
+            estado_anterior = dict.fromkeys(self.ids, estado_anterior)
+        self.env['historial.estado.solicitud'].create([{
+            'solicitud_id': record.id,
+            'estado_anterior': estado_anterior.get(record.id),
             'estado_nuevo': estado_nuevo,
             'usuario_id': self.env.user.id,
-        })
+        } for record in self])
+    
+    def _transicion_lote(self, estado_nuevo, mensaje, estados_origen=None, validar=None, fechas=None):
+        """Aplica una transición a todos los tickets y devuelve {'exito': [ids], 'errores': [{'id', 'error'}]}.
+
+        Toda la selección se valida antes de escribir; los tickets válidos se actualizan con una escritura
+        por combinación de fechas, un único create de historial y un registro de mensajes en lote.
+        mensaje puede ser un texto o una función que recibe el ticket.
+        fechas: {campo: solo_si_vacio} con las fechas que se sellan con la hora actual.
+        """
+        etiquetas = dict(self._fields['state'].selection)
+        # Lista y no {id: motivo}: XML-RPC solo admite claves de texto
+        errores = []
+        validos = []
+        for record in self:
+            try:
+                if estados_origen is not None and record.state not in estados_origen:
+                    raise UserError(f'El ticket {record.numero_ticket} está en estado '
+                                    f'"{etiquetas.get(record.state)}" y no admite esta acción.')
+                if validar:
+                    validar(record)
+                record._preparar_transicion(estado_nuevo)
+            except UserError as e:
+                errores.append({'id': record.id, 'error': e.args[0]})
+            else:
+                validos.append(record.id)
+        
+        validos = self.browse(validos)
+        if validos:
+            ahora = fields.Datetime.now()
+            estados_anteriores = {record.id: record.state for record in validos}
+            grupos = defaultdict(list)
+            for record in validos:
+                campos = tuple(campo for campo, solo_si_vacio in (fechas or {}).items()
+                               if not (solo_si_vacio and record[campo]))
+                grupos[campos].append(record.id)
+            for campos, ids in grupos.items():
+                vals = dict.fromkeys(campos, ahora)
+                vals['state'] = estado_nuevo
+                self.browse(ids).write(vals)
+            validos._crear_historial_estado(estados_anteriores, estado_nuevo)
+            validos._registrar_mensajes({
+                record.id: mensaje(record) if callable(mensaje) else mensaje for record in validos
+            })
+        return {'exito': validos.ids, 'errores': errores}
+    
+    def _preparar_transicion(self, estado_nuevo):
+        """Extensión por ticket tras validarlo y antes de escribir; un UserError lo deja fuera del lote"""
+        self.ensure_one()
+
+    def _registrar_mensajes(self, cuerpos):
+        """Registra en el chatter un mensaje por ticket {id: texto} (el seguimiento compacto lo fusiona)"""
+        self._message_log_batch(bodies=cuerpos)
+    
+    def _resultado_transicion(self, resumen):
+        """Convierte el resumen de una transición en la respuesta del botón o de la acción de lista"""
+        errores = {error['id']: error['error'] for error in resumen['errores']}
+        if len(self) == 1:
+            if errores:
+                raise UserError(errores[self.id])
+            return True
+        detalle = '\n'.join(f'{record.numero_ticket}: {errores[record.id]}' for record in self.browse(list(errores)))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Transición en lote',
+                'message': f'{len(resumen["exito"])} tickets actualizados, {len(resumen["errores"])} con errores.'
+                           + (f'\n{detalle}' if detalle else ''),
+                'type': 'warning' if resumen['errores'] else 'success',
+                'sticky': bool(resumen['errores']),
+                'next': {'type': 'ir.actions.client', 'tag': 'soft_reload'},
+            },
+        }
+    
+    def transicion_en_lote(self, accion):
+        """Punto de entrada RPC: aplica la acción a todos los tickets y devuelve el resumen por registro"""
+        acciones = ('enviar', 'asignar', 'en_proceso', 'esperando_respuesta', 'resolver', 'cerrar', 'cancelar', 'reabrir')
+        if accion not in acciones:
+            raise UserError(f'Acción desconocida: {accion}')
+        return getattr(self, f'_transicion_{accion}')()
+    
+    def _transicion_enviar(self):
+        return self._transicion_lote('pendiente', 'Ticket enviado para revisión.', estados_origen=['borrador'])
+    
+    def _transicion_asignar(self):
+        def validar(record):
+            if not record.gestor_id:
+                raise UserError(f'Debe asignar un gestor al ticket {record.numero_ticket} antes de cambiar el estado.')
+        return self._transicion_lote(
+            'asignado', lambda record: f'Ticket asignado a {record.gestor_id.name}.',
+            estados_origen=['pendiente'], validar=validar, fechas={'fecha_asignacion': False})
+    
+    def _transicion_en_proceso(self):
+        return self._transicion_lote(
+            'en_proceso', 'Ticket en proceso de resolución.',
+            estados_origen=['pendiente', 'asignado', 'esperando_respuesta'], fechas={'fecha_inicio': True})
+    
+    def _transicion_esperando_respuesta(self):
+        return self._transicion_lote(
+            'esperando_respuesta', 'Ticket en espera de respuesta del solicitante.', estados_origen=['en_proceso'])
+    
+    def _transicion_resolver(self):
+        def validar(record):
+            if not record.solucion:
+                raise UserError(f'Debe proporcionar una solución antes de resolver el ticket {record.numero_ticket}.')
+        return self._transicion_lote(
+            'resuelto', 'Ticket resuelto.', estados_origen=['en_proceso', 'esperando_respuesta'],
+            validar=validar, fechas={'fecha_resolucion': False})
+    
+    def _transicion_cerrar(self):
+        return self._transicion_lote('cerrado', 'Ticket cerrado.', estados_origen=['resuelto'],
+                                     fechas={'fecha_cierre': False})
+    
+    def _transicion_cancelar(self):
+        estados_origen = [estado for estado, _etiqueta in self._fields['state'].selection
+                          if estado not in ('cerrado', 'cancelado')]
+        return self._transicion_lote('cancelado', 'Ticket cancelado.', estados_origen=estados_origen)
+    
+    def _transicion_reabrir(self):
+        return self._transicion_lote('pendiente', 'Ticket reabierto.', estados_origen=['cerrado', 'cancelado'])
     
     def action_enviar(self):
-        if self.state == 'borrador':
-            estado_anterior = self.state
-            self.state = 'pendiente'
-            self._crear_historial_estado(estado_anterior, self.state)
-            self.message_post(body='Ticket enviado para revisión.')
+        return self._resultado_transicion(self._transicion_enviar())
     
     def action_asignar(self):
-        if not self.gestor_id:
-            raise UserError('Debe asignar un gestor antes de cambiar el estado.')
-        estado_anterior = self.state
-        self.state = 'asignado'
-        self.fecha_asignacion = fields.Datetime.now()
-        self._crear_historial_estado(estado_anterior, self.state)
-        self.message_post(body=f'Ticket asignado a {self.gestor_id.name}.')
+        return self._resultado_transicion(self._transicion_asignar())
     
     def action_en_proceso(self):
-        estado_anterior = self.state
-        self.state = 'en_proceso'
-        if not self.fecha_inicio:
-            self.fecha_inicio = fields.Datetime.now()
-        self._crear_historial_estado(estado_anterior, self.state)
-        self.message_post(body='Ticket en proceso de resolución.')
+        return self._resultado_transicion(self._transicion_en_proceso())
     
     def action_esperando_respuesta(self):
-        estado_anterior = self.state
-        self.state = 'esperando_respuesta'
-        self._crear_historial_estado(estado_anterior, self.state)
-        self.message_post(body='Ticket en espera de respuesta del solicitante.')
+        return self._resultado_transicion(self._transicion_esperando_respuesta())
     
     def action_resolver(self):
-        if not self.solucion:
-            raise UserError('Debe proporcionar una solución antes de resolver el ticket.')
-        estado_anterior = self.state
-        self.state = 'resuelto'
-        self.fecha_resolucion = fields.Datetime.now()
-        self._crear_historial_estado(estado_anterior, self.state)
-        self.message_post(body='Ticket resuelto.')
+        return self._resultado_transicion(self._transicion_resolver())
     
     def action_cerrar(self):
-        estado_anterior = self.state
-        self.state = 'cerrado'
-        self.fecha_cierre = fields.Datetime.now()
-        self._crear_historial_estado(estado_anterior, self.state)
-        self.message_post(body='Ticket cerrado.')
+        return self._resultado_transicion(self._transicion_cerrar())
     
     def action_cancelar(self):
-        estado_anterior = self.state
-        self.state = 'cancelado'
-        self._crear_historial_estado(estado_anterior, self.state)
-        self.message_post(body='Ticket cancelado.')
+        return self._resultado_transicion(self._transicion_cancelar())
     
     def action_reabrir(self):
-        if self.state in ['cerrado', 'cancelado']:
-            estado_anterior = self.state
-            self.state = 'pendiente'
-            self._crear_historial_estado(estado_anterior, self.state)
-            self.message_post(body='Ticket reabierto.')
+        return self._resultado_transicion(self._transicion_reabrir())
     
     @api.model
-    def enviar_recordatorios_vencimiento(self):
-        """Método para enviar recordatorios de tickets próximos a vencer"""
-        fecha_limite = fields.Datetime.now() + timedelta(days=1)
-        tickets_proximos = self.search([
-            ('fecha_limite', '<=', fecha_limite),
-            ('state', 'not in', ['cerrado', 'cancelado', 'resuelto'])
-        ])
+    def _barrer_vencimientos(self):
+        """Actualiza los campos de SLA almacenados que dependen del paso del tiempo.
+
+        Solo toca los tickets cuya fecha límite ha pasado desde el último barrido, localizados mediante
+        el índice parcial sobre fecha_limite de los tickets abiertos aún no vencidos. Los días pendientes
+        se recalculan una vez al día.
+        """
+        ahora = fields.Datetime.now()
+        self.flush_model(['fecha_limite', 'state', 'esta_vencido', 'color'])
+        # write_date se actualiza solo aquí, donde cambian esta_vencido y color: la exportación incremental
+        # y la API de cambios se guían por ella
+        self.env.cr.execute(f"""
+            UPDATE solicitud_interna
+               SET esta_vencido = TRUE, color = 1, write_uid = %s, write_date = now() AT TIME ZONE 'UTC'
+             WHERE esta_vencido IS NOT TRUE
+               AND state NOT IN {ESTADOS_CERRADOS}
+               AND fecha_limite <= %s
+        """, [self.env.uid, ahora])
+        
+        parametros = self.env['ir.config_parameter'].sudo()
+        hoy = fields.Date.to_string(ahora.date())
+        if parametros.get_param('solicitud_interna.fecha_recalculo_dias_pendiente') != hoy:
+            # Sin write_date: el contador cambia a diario en todos los tickets abiertos y los clientes
+            # lo obtienen de fecha_solicitud; marcarlo reenviaría cada día todo el trabajo abierto
+            self.flush_model(['fecha_solicitud', 'dias_pendiente'])
+            self.env.cr.execute("""
+                UPDATE solicitud_interna
+                   SET dias_pendiente = date_part('day', %s - fecha_solicitud)::int
+                 WHERE state NOT IN ('cerrado', 'cancelado')
+                   AND fecha_solicitud IS NOT NULL
+                   AND dias_pendiente IS DISTINCT FROM date_part('day', %s - fecha_solicitud)::int
+            """, [ahora, ahora])
+            parametros.set_param('solicitud_interna.fecha_recalculo_dias_pendiente', hoy)
+        self.invalidate_model(['esta_vencido', 'color', 'dias_pendiente', 'write_uid', 'write_date'])
+    
+    @api.model
+    def enviar_recordatorios_vencimiento(self, tamano_lote=500):
+        """Método para enviar recordatorios de tickets próximos a vencer o vencidos.
+
+        Recorre los tickets por lotes paginados por id y confirma cada lote, de modo que si el proceso
+        se interrumpe la siguiente ejecución continúa donde quedó: los tickets que ya tienen recordatorio
+        para su fecha límite y tipo se excluyen en la propia consulta.
+        """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        ahora = fields.Datetime.now()
+        # Ventanas sin solapamiento: (ahora + horas del tipo siguiente, ahora + horas del tipo]
+        antelaciones = sorted(ANTELACION_RECORDATORIO.items(), key=lambda item: item[1])
+        for indice, (tipo, horas) in enumerate(antelaciones):
+            desde = ahora + timedelta(hours=antelaciones[indice - 1][1]) if indice else None
+            hasta = ahora + timedelta(hours=horas)
+            ultimo_id = 0
+            while True:
+                self.env.cr.execute("""
+                    SELECT s.id
+                      FROM solicitud_interna s
+                     WHERE s.id > %s
+                       AND s.fecha_limite <= %s
+                       AND (%s::timestamp IS NULL OR s.fecha_limite > %s)
+                       AND s.state NOT IN %s
+                       AND s.gestor_id IS NOT NULL
+                       AND NOT EXISTS (
+                            SELECT 1 FROM recordatorio_solicitud r
+                             WHERE r.solicitud_id = s.id
+                               AND r.fecha_limite = s.fecha_limite
+                               AND r.tipo = %s)
+                  ORDER BY s.id
+                     LIMIT %s
+                """, [ultimo_id, hasta, desde, desde, ESTADOS_CERRADOS, tipo, tamano_lote])
+                ids = [row[0] for row in self.env.cr.fetchall()]
+                if not ids:
+                    break
+                self.browse(ids)._programar_recordatorios(tipo)
+                ultimo_id = ids[-1]
+                if auto_commit:
+                    self.env.cr.commit()
+    
+    def _programar_recordatorios(self, tipo):
+        """Registra los recordatorios del lote y crea sus actividades con un único create"""
+        self.flush_model(['fecha_limite'])
+        # La restricción única decide qué tickets reciben actividad: un worker concurrente que ya
+        # insertó el mismo recordatorio hace que la fila se descarte aquí
+        self.env.cr.execute("""
+            INSERT INTO recordatorio_solicitud
+                   (solicitud_id, fecha_limite, tipo, fecha_envio, create_uid, create_date, write_uid, write_date)
+            SELECT id, fecha_limite, %s, now() AT TIME ZONE 'UTC', %s, now() AT TIME ZONE 'UTC',
+                   %s, now() AT TIME ZONE 'UTC'
+              FROM solicitud_interna
+             WHERE id IN %s
+               AND fecha_limite IS NOT NULL
+            ON CONFLICT (solicitud_id, fecha_limite, tipo) DO NOTHING
+         RETURNING id, solicitud_id
+        """, [tipo, self.env.uid, self.env.uid, tuple(self.ids)])
+        recordatorio_por_ticket = {solicitud_id: rec_id for rec_id, solicitud_id in self.env.cr.fetchall()}
+        tickets = self.browse(list(recordatorio_por_ticket))
+        if not tickets:
+            return
         
-        for ticket in tickets_proximos:
-            if ticket.gestor_id:
-                ticket.activity_schedule(
-                    'mail.mail_activity_data_todo',
-                    user_id=ticket.gestor_id.id,
-                    summary=f'Ticket {ticket.numero_ticket} próximo a vencer',
-                    note=f'El ticket "{ticket.name}" vence el {ticket.fecha_limite}'
-                )
+        resumenes = {
+            '24h': 'Ticket {} vence en menos de 24 horas',
+            '4h': 'Ticket {} vence en menos de 4 horas',
+            'vencido': 'Ticket {} vencido',
+        }
+        actividades = self.env['mail.activity'].create([{
+            'res_model_id': self.env['ir.model']._get_id(self._name),
+            'res_id': ticket.id,
+            'activity_type_id': self.env.ref('mail.mail_activity_data_todo').id,
+            'user_id': ticket.gestor_id.id,
+            'summary': resumenes[tipo].format(ticket.numero_ticket),
+            'note': f'El ticket "{ticket.name}" vence el {ticket.fecha_limite}',
+            'date_deadline': ticket.fecha_limite.date(),
+        } for ticket in tickets])
+        self.env.cr.execute("""
+            UPDATE recordatorio_solicitud r
+               SET activity_id = v.activity_id
+              FROM unnest(%s::int[], %s::int[]) AS v(id, activity_id)
+             WHERE r.id = v.id
+        """, [[recordatorio_por_ticket[ticket.id] for ticket in tickets], actividades.ids])
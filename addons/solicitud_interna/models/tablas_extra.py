@@ -1,10 +1,90 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
+from collections import Counter
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Estados que cuentan como solicitudes pendientes en las estadísticas
+ESTADOS_PENDIENTES = ('pendiente', 'asignado', 'en_proceso')
+
+
+def validar_codigos_unicos(modelo, entradas, mensaje):
+    """Comprueba un lote completo de códigos con una sola consulta y reporta todas las infracciones juntas.
+
+    entradas: [(id o None si aún no existe, nombre, código)]. Un código falla si se repite dentro del lote
+    o si ya lo tiene otro registro de la tabla. El índice único sobre codigo (CodigoUnicoMixin.init) cubre
+    las inserciones concurrentes que esta comprobación no puede ver.
+    """
+    entradas = [(registro_id, nombre, codigo) for registro_id, nombre, codigo in entradas if codigo]
+    if not entradas:
+        return
+    repetidos = {codigo for codigo, veces in Counter(codigo for _id, _nombre, codigo in entradas).items() if veces > 1}
+    modelo.env.cr.execute(f"""
+        SELECT DISTINCT codigo FROM {modelo._table}
+         WHERE codigo = ANY(%s) AND NOT (id = ANY(%s))
+    """, [list({codigo for _id, _nombre, codigo in entradas}),
+          [registro_id for registro_id, _nombre, _codigo in entradas if registro_id]])
+    existentes = {row[0] for row in modelo.env.cr.fetchall()}
+    errores = [f"- {nombre or '?'} ({codigo}): " + ('ya existe' if codigo in existentes else 'repetido en el lote')
+               for _id, nombre, codigo in entradas if codigo in existentes or codigo in repetidos]
+    if errores:
+        raise ValidationError(mensaje + '\n' + '\n'.join(errores))
+
+
+class CodigoUnicoMixin(models.AbstractModel):
+    """Código único en tablas de referencia: validación del lote antes de insertar y tras escribir"""
+    _name = 'codigo.unico.mixin'
+    _description = 'Código único validado por lotes'
+
+    codigo = fields.Char(string='Código')
+
+    # Mensaje de error de cada modelo
+    _mensaje_codigo_unico = 'El código debe ser único.'
+
+    def init(self):
+        super(CodigoUnicoMixin, self).init()
+        if self._abstract:
+            return
+        # El índice cubre las inserciones concurrentes que validar_codigos_unicos no puede ver. Los registros
+        # sin código no cuentan: el índice admite varios NULL. Si la tabla ya trae códigos repetidos se avisa
+        # y no se crea, como hace Odoo con una restricción de _sql_constraints que no se puede añadir.
+        self.env.cr.execute(f"""
+            SELECT codigo, array_agg(id ORDER BY id) FROM {self._table}
+             WHERE codigo IS NOT NULL
+          GROUP BY codigo HAVING count(*) > 1
+          ORDER BY codigo
+        """)
+        repetidos = self.env.cr.fetchall()
+        if repetidos:
+            _logger.warning('Tabla %s: no se crea el índice único sobre codigo; corrija los códigos repetidos y '
+                            'actualice el módulo: %s', self._table,
+                            '; '.join(f'{codigo} (ids {", ".join(map(str, ids))})' for codigo, ids in repetidos))
+            return
+        tools.create_unique_index(self.env.cr, f'{self._table}_codigo_unico_idx', self._table, ['codigo'])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Antes del INSERT, para reportar cada fila en lugar del primer error de la base de datos
+        validar_codigos_unicos(self, [(None, vals.get('name'), vals.get('codigo')) for vals in vals_list],
+                               self._mensaje_codigo_unico)
+        return super(CodigoUnicoMixin, self.with_context(codigo_unico_validado=True)).create(vals_list) \
+            .with_env(self.env)
+
+    @api.constrains('codigo')
+    def _check_codigo_unico(self):
+        if self.env.context.get('codigo_unico_validado'):
+            return
+        validar_codigos_unicos(self, [(record.id, record.name, record.codigo) for record in self],
+                               self._mensaje_codigo_unico)
+
 
 class DepartamentoSolicitud(models.Model):
     _name = 'departamento.solicitud'
+    _inherit = ['codigo.unico.mixin']
     _description = 'Departamento que puede hacer solicitudes'
     _order = 'name'
+    _mensaje_codigo_unico = 'El código del departamento debe ser único.'
 
     name = fields.Char(string='Nombre', required=True)
     codigo = fields.Char(string='Código', required=True)
@@ -15,27 +95,59 @@ class DepartamentoSolicitud(models.Model):
     ubicacion = fields.Char(string='Ubicación')
     presupuesto_anual = fields.Float(string='Presupuesto Anual')
     
-    # Estadísticas
-    total_solicitudes = fields.Integer(string='Total Solicitudes', compute='_compute_estadisticas')
-    solicitudes_pendientes = fields.Integer(string='Solicitudes Pendientes', compute='_compute_estadisticas')
+    # Estadísticas: contadores mantenidos por solicitud.interna al crear, cambiar de estado o eliminar
+    # (el total incluye los tickets archivados)
+    total_solicitudes = fields.Integer(string='Total Solicitudes', readonly=True, default=0)
+    solicitudes_pendientes = fields.Integer(string='Solicitudes Pendientes', readonly=True, default=0)
     
-    @api.depends('name')
-    def _compute_estadisticas(self):
-        for record in self:
-            solicitudes = self.env['solicitud.interna'].search([('departamento_id', '=', record.id)])
-            record.total_solicitudes = len(solicitudes)
-            record.solicitudes_pendientes = len(solicitudes.filtered(lambda s: s.state in ['pendiente', 'asignado', 'en_proceso']))
+    @api.model
+    def _aplicar_delta_estadisticas(self, deltas):
+        """Aplica incrementos {departamento_id: [total, pendientes]} en una sola consulta"""
+        deltas = {dep_id: delta for dep_id, delta in deltas.items() if dep_id and any(delta)}
+        if not deltas:
+            return
+        ids = sorted(deltas)
+        self.env.cr.execute("""
+            UPDATE departamento_solicitud d
+               SET total_solicitudes = d.total_solicitudes + v.total,
+                   solicitudes_pendientes = d.solicitudes_pendientes + v.pendientes
+              FROM unnest(%s::int[], %s::int[], %s::int[]) AS v(id, total, pendientes)
+             WHERE d.id = v.id
+        """, [ids, [deltas[i][0] for i in ids], [deltas[i][1] for i in ids]])
+        self.invalidate_model(['total_solicitudes', 'solicitudes_pendientes'])
+    
+    def _reconciliar_estadisticas(self):
+        """Recalcula los contadores con una única consulta agrupada (todos si el recordset está vacío)"""
+        where, params = '', [list(ESTADOS_PENDIENTES)]
+        if self:
+            where, params = 'AND d.id IN %s', params + [tuple(self.ids)]
+        self.env.cr.execute(f"""
+            UPDATE departamento_solicitud d
+               SET total_solicitudes = COALESCE(s.total, 0),
+                   solicitudes_pendientes = COALESCE(s.pendientes, 0)
+              FROM departamento_solicitud d2
+              LEFT JOIN (
+                    SELECT departamento_id,
+                           count(*) AS total,
+                           count(*) FILTER (WHERE state = ANY(%s)) AS pendientes
+                      FROM (SELECT departamento_id, state FROM solicitud_interna
+                            UNION ALL
+                            SELECT departamento_id, state FROM solicitud_archivada) t
+                  GROUP BY departamento_id
+              ) s ON s.departamento_id = d2.id
+             WHERE d.id = d2.id {where}
+               AND (d.total_solicitudes IS DISTINCT FROM COALESCE(s.total, 0)
+                    OR d.solicitudes_pendientes IS DISTINCT FROM COALESCE(s.pendientes, 0))
+        """, params)
+        self.invalidate_model(['total_solicitudes', 'solicitudes_pendientes'])
     
-    @api.constrains('codigo')
-    def _check_codigo_unico(self):
-        for record in self:
-            if self.search_count([('codigo', '=', record.codigo), ('id', '!=', record.id)]) > 0:
-                raise ValidationError('El código del departamento debe ser único.')
 
 class TipoMaterial(models.Model):
     _name = 'tipo.material'
+    _inherit = ['codigo.unico.mixin']
     _description = 'Tipo de material de oficina'
     _order = 'categoria, name'
+    _mensaje_codigo_unico = 'El código del tipo de material debe ser único.'
 
     name = fields.Char(string='Nombre', required=True)
     codigo = fields.Char(string='Código', required=True)
@@ -47,19 +159,33 @@ class TipoMaterial(models.Model):
         ('limpieza', 'Limpieza'),
         ('otros', 'Otros'),
     ], string='Categoría', required=True)
-    stock_actual = fields.Integer(string='Stock Actual', default=0)
+    # Existencias físicas y reservadas por tickets asignados: las mueve movimiento.stock.material
+    stock_actual = fields.Integer(string='Stock Actual', default=0, readonly=True)
+    stock_reservado = fields.Integer(string='Stock Reservado', default=0, readonly=True)
+    stock_disponible = fields.Integer(string='Stock Disponible', compute='_compute_stock_disponible')
     stock_minimo = fields.Integer(string='Stock Mínimo', default=5)
     precio_unitario = fields.Float(string='Precio Unitario')
     proveedor_id = fields.Many2one('proveedor.servicio', string='Proveedor Principal')
     activo = fields.Boolean(string='Activo', default=True)
     
-    # Campo calculado para alertas
-    necesita_reposicion = fields.Boolean(string='Necesita Reposición', compute='_compute_necesita_reposicion')
+    # Almacenado para el barrido de reposición; los UPDATE del libro de stock lo mantienen en SQL
+    necesita_reposicion = fields.Boolean(string='Necesita Reposición', compute='_compute_necesita_reposicion',
+                                         store=True, index=True)
+
+    _sql_constraints = [
+        ('stock_coherente', 'CHECK(stock_reservado >= 0 AND stock_actual >= stock_reservado)',
+         'El stock reservado no puede ser negativo ni superar el stock actual.'),
+    ]
     
-    @api.depends('stock_actual', 'stock_minimo')
+    @api.depends('stock_actual', 'stock_reservado')
+    def _compute_stock_disponible(self):
+        for record in self:
+            record.stock_disponible = record.stock_actual - record.stock_reservado
+
+    @api.depends('stock_actual', 'stock_reservado', 'stock_minimo')
     def _compute_necesita_reposicion(self):
         for record in self:
-            record.necesita_reposicion = record.stock_actual <= record.stock_minimo
+            record.necesita_reposicion = record.stock_actual - record.stock_reservado <= record.stock_minimo
 
 class HistorialEstadoSolicitud(models.Model):
     _name = 'historial.estado.solicitud'
@@ -72,27 +198,54 @@ class HistorialEstadoSolicitud(models.Model):
     fecha_cambio = fields.Datetime(string='Fecha de Cambio', default=fields.Datetime.now, required=True)
     usuario_id = fields.Many2one('res.users', string='Usuario', default=lambda self: self.env.user, required=True)
     comentario = fields.Text(string='Comentario del Cambio')
-    tiempo_en_estado = fields.Float(string='Tiempo en Estado Anterior (horas)', compute='_compute_tiempo_en_estado')
+    tiempo_en_estado = fields.Float(string='Tiempo en Estado Anterior (horas)', readonly=True,
+                                    help='Horas transcurridas desde el cambio de estado anterior, calculadas al registrar el cambio')
     
-    @api.depends('fecha_cambio', 'solicitud_id')
-    def _compute_tiempo_en_estado(self):
-        for record in self:
-            if record.estado_anterior:
-                # Buscar el cambio anterior
-                cambio_anterior = self.search([
-                    ('solicitud_id', '=', record.solicitud_id.id),
-                    ('fecha_cambio', '<', record.fecha_cambio)
-                ], order='fecha_cambio desc', limit=1)
-                
-                if cambio_anterior:
-                    delta = record.fecha_cambio - cambio_anterior.fecha_cambio
-                    record.tiempo_en_estado = delta.total_seconds() / 3600
-                else:
-                    # Si no hay cambio anterior, calcular desde la fecha de solicitud
-                    delta = record.fecha_cambio - record.solicitud_id.fecha_solicitud
-                    record.tiempo_en_estado = delta.total_seconds() / 3600
-            else:
-                record.tiempo_en_estado = 0
+    @api.model_create_multi
+    def create(self, vals_list):
+        # El tiempo en el estado anterior se calcula una sola vez, al insertar, con una consulta por lote
+        pendientes = [vals for vals in vals_list if vals.get('estado_anterior') and 'tiempo_en_estado' not in vals]
+        if pendientes:
+            self.flush_model(['solicitud_id', 'fecha_cambio'])
+            self.env['solicitud.interna'].flush_model(['fecha_solicitud'])
+            self.env.cr.execute("""
+                SELECT s.id, COALESCE(max(h.fecha_cambio), s.fecha_solicitud)
+                  FROM solicitud_interna s
+             LEFT JOIN historial_estado_solicitud h ON h.solicitud_id = s.id
+                 WHERE s.id IN %s
+              GROUP BY s.id
+            """, [tuple({vals['solicitud_id'] for vals in pendientes})])
+            ultimo_cambio = dict(self.env.cr.fetchall())
+            ahora = fields.Datetime.now()
+            for vals in pendientes:
+                fecha_cambio = fields.Datetime.to_datetime(vals.get('fecha_cambio')) or ahora
+                anterior = ultimo_cambio.get(vals['solicitud_id'])
+                vals['tiempo_en_estado'] = (fecha_cambio - anterior).total_seconds() / 3600 if anterior else 0
+                ultimo_cambio[vals['solicitud_id']] = fecha_cambio
+        for vals in vals_list:
+            vals.setdefault('tiempo_en_estado', 0)
+        return super(HistorialEstadoSolicitud, self).create(vals_list)
+    
+    @api.model
+    def _rellenar_tiempo_en_estado(self):
+        """Calcula en una pasada SQL (LAG por solicitud) los tiempos de las filas que aún no lo tienen"""
+        self.env.cr.execute("""
+            UPDATE historial_estado_solicitud h
+               SET tiempo_en_estado = CASE
+                       WHEN COALESCE(h.estado_anterior, '') = '' THEN 0
+                       ELSE EXTRACT(EPOCH FROM h.fecha_cambio - COALESCE(c.cambio_anterior, s.fecha_solicitud)) / 3600
+                   END
+              FROM (
+                    SELECT id, LAG(fecha_cambio) OVER (PARTITION BY solicitud_id ORDER BY fecha_cambio, id) AS cambio_anterior
+                      FROM historial_estado_solicitud
+                     WHERE solicitud_id IN (SELECT solicitud_id FROM historial_estado_solicitud
+                                             WHERE tiempo_en_estado IS NULL)
+                   ) c, solicitud_interna s
+             WHERE c.id = h.id
+               AND s.id = h.solicitud_id
+               AND h.tiempo_en_estado IS NULL
+        """)
+        self.invalidate_model(['tiempo_en_estado'])
 
 class PrioridadSolicitud(models.Model):
     _name = 'prioridad.solicitud'
@@ -104,6 +257,9 @@ class PrioridadSolicitud(models.Model):
     descripcion = fields.Text(string='Descripción')
     color = fields.Char(string='Color', default='#FFFFFF')
     tiempo_respuesta_horas = fields.Integer(string='Tiempo de Respuesta (horas)', default=24)
+    tiempo_resolucion_horas = fields.Integer(string='Tiempo de Resolución (horas)', default=72)
+    pausar_sla_en_espera = fields.Boolean(string='Pausar SLA en Espera de Respuesta', default=True,
+                                          help='Detiene el reloj del SLA mientras el ticket espera respuesta del solicitante')
     activo = fields.Boolean(string='Activo', default=True)
     
     @api.constrains('nivel')
@@ -114,8 +270,10 @@ class PrioridadSolicitud(models.Model):
 
 class ProveedorServicio(models.Model):
     _name = 'proveedor.servicio'
+    _inherit = ['codigo.unico.mixin']
     _description = 'Proveedor externo de servicios'
     _order = 'name'
+    _mensaje_codigo_unico = 'El código del proveedor debe ser único.'
 
     name = fields.Char(string='Nombre', required=True)
     codigo = fields.Char(string='Código')
@@ -146,16 +304,24 @@ class ProveedorServicio(models.Model):
     activo = fields.Boolean(string='Activo', default=True)
     notas = fields.Text(string='Notas')
     
-    # Estadísticas
+    # Estadísticas (leídas del reporte materializado reporte.proveedor.servicio)
     total_servicios = fields.Integer(string='Total Servicios', compute='_compute_estadisticas')
     servicios_completados = fields.Integer(string='Servicios Completados', compute='_compute_estadisticas')
-    
-    @api.depends('name')
+    tasa_completado = fields.Float(string='Tasa de Completado (%)', compute='_compute_estadisticas')
+    tiempo_resolucion_promedio = fields.Float(string='Tiempo Medio de Resolución (horas)', compute='_compute_estadisticas')
+    puntuacion_encuesta_promedio = fields.Float(string='Puntuación Media de Encuestas', compute='_compute_estadisticas')
+
     def _compute_estadisticas(self):
+        # Con sudo: los solicitantes ven los proveedores pero no tienen acceso al reporte
+        reportes = self.env['reporte.proveedor.servicio'].sudo().search([('proveedor_id', 'in', self.filtered('id').ids)])
+        por_proveedor = {reporte.proveedor_id.id: reporte for reporte in reportes}
         for record in self:
-            solicitudes = self.env['solicitud.interna'].search([('proveedor_id', '=', record.id)])
-            record.total_servicios = len(solicitudes)
-            record.servicios_completados = len(solicitudes.filtered(lambda s: s.state in ['resuelto', 'cerrado']))
+            reporte = por_proveedor.get(record.id)
+            record.total_servicios = reporte.total_servicios if reporte else 0
+            record.servicios_completados = reporte.servicios_completados if reporte else 0
+            record.tasa_completado = reporte.tasa_completado if reporte else 0
+            record.tiempo_resolucion_promedio = reporte.tiempo_resolucion_promedio if reporte else 0
+            record.puntuacion_encuesta_promedio = reporte.puntuacion_encuesta_promedio if reporte else 0
 
 class ComentarioSolicitud(models.Model):
     _name = 'comentario.solicitud'
@@ -187,7 +353,8 @@ class EncuestaSatisfaccion(models.Model):
     _description = 'Encuesta de satisfacción tras completar solicitud'
     _order = 'fecha desc'
 
-    solicitud_id = fields.Many2one('solicitud.interna', string='Solicitud', required=True, ondelete='cascade')
+    solicitud_id = fields.Many2one('solicitud.interna', string='Solicitud', required=True, ondelete='cascade',
+                                   index=True)
     usuario_id = fields.Many2one('res.users', string='Usuario', default=lambda self: self.env.user, required=True)
     
     # Puntuaciones específicas
@@ -219,24 +386,21 @@ class EncuestaSatisfaccion(models.Model):
     fecha = fields.Datetime(string='Fecha', default=fields.Datetime.now, required=True)
     recomendaria = fields.Boolean(string='¿Recomendaría el servicio?')
     
-    # Campo calculado para promedio
-    puntuacion_promedio = fields.Float(string='Puntuación Promedio', compute='_compute_puntuacion_promedio')
+    # Puntuaciones numéricas almacenadas, agregables en SQL
+    valor_general = fields.Integer(string='Valor General', compute='_compute_valores', store=True, aggregator='avg')
+    valor_tiempo = fields.Integer(string='Valor Tiempo', compute='_compute_valores', store=True, aggregator='avg')
+    valor_calidad = fields.Integer(string='Valor Calidad', compute='_compute_valores', store=True, aggregator='avg')
+    puntuacion_promedio = fields.Float(string='Puntuación Promedio', compute='_compute_valores', store=True,
+                                       aggregator='avg')
     
     @api.depends('puntuacion_general', 'puntuacion_tiempo', 'puntuacion_calidad')
-    def _compute_puntuacion_promedio(self):
+    def _compute_valores(self):
         for record in self:
-            puntuaciones = []
-            if record.puntuacion_general:
-                puntuaciones.append(int(record.puntuacion_general))
-            if record.puntuacion_tiempo:
-                puntuaciones.append(int(record.puntuacion_tiempo))
-            if record.puntuacion_calidad:
-                puntuaciones.append(int(record.puntuacion_calidad))
-            
-            if puntuaciones:
-                record.puntuacion_promedio = sum(puntuaciones) / len(puntuaciones)
-            else:
-                record.puntuacion_promedio = 0
+            record.valor_general = int(record.puntuacion_general or 0)
+            record.valor_tiempo = int(record.puntuacion_tiempo or 0)
+            record.valor_calidad = int(record.puntuacion_calidad or 0)
+            puntuaciones = [valor for valor in (record.valor_general, record.valor_tiempo, record.valor_calidad) if valor]
+            record.puntuacion_promedio = sum(puntuaciones) / len(puntuaciones) if puntuaciones else 0
 
 # Modelo para plantillas de tickets
 class PlantillaSolicitud(models.Model):
@@ -262,9 +426,10 @@ class PlantillaSolicitud(models.Model):
     gestor_id = fields.Many2one('res.users', string='Gestor por Defecto')
     activo = fields.Boolean(string='Activo', default=True)
     
-    def crear_solicitud_desde_plantilla(self):
-        """Método para crear una nueva solicitud basada en esta plantilla"""
-        vals = {
+    def _valores_solicitud(self):
+        """Valores del ticket que crea la plantilla"""
+        self.ensure_one()
+        return {
             'name': self.name,
             'description': self.descripcion,
             'category': self.category,
@@ -273,8 +438,10 @@ class PlantillaSolicitud(models.Model):
             'departamento_id': self.departamento_id.id if self.departamento_id else False,
             'gestor_id': self.gestor_id.id if self.gestor_id else False,
         }
-        
-        nueva_solicitud = self.env['solicitud.interna'].create(vals)
+
+    def crear_solicitud_desde_plantilla(self):
+        """Método para crear una nueva solicitud basada en esta plantilla"""
+        nueva_solicitud = self.env['solicitud.interna'].create(self._valores_solicitud())
         
         return {
             'type': 'ir.actions.act_window',
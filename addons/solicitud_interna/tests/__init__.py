@@ -0,0 +1,7 @@
+from . import test_adjunto_solicitud
+from . import test_api_solicitud
+from . import test_importacion_solicitud
+from . import test_transicion_solicitud
+from . import test_inventario_material
+from . import test_kpi_solicitud
+from . import test_codigo_unico
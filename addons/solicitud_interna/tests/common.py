@@ -0,0 +1,23 @@
+from odoo.tests import TransactionCase, new_test_user
+
+
+class SolicitudCommon(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.departamento = cls.env.ref('solicitud_interna.departamento_administracion')
+        cls.prioridad = cls.env.ref('solicitud_interna.prioridad_media')
+        cls.gestor = new_test_user(cls.env, login='gestor_prueba',
+                                   groups='base.group_user,solicitud_interna.group_gestor')
+        cls.solicitante = new_test_user(cls.env, login='solicitante_prueba',
+                                        groups='base.group_user,solicitud_interna.group_solicitante')
+
+    @classmethod
+    def valores_ticket(cls, indice=0, **valores):
+        return dict({
+            'name': f'Ticket de prueba {indice}',
+            'category': 'soporte',
+            'departamento_id': cls.departamento.id,
+            'prioridad_id': cls.prioridad.id,
+        }, **valores)
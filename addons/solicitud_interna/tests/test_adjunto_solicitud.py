@@ -0,0 +1,41 @@
+import io
+import os
+
+from odoo.exceptions import AccessError
+
+from .common import SolicitudCommon
+
+
+class TestSubidaAdjunto(SolicitudCommon):
+
+    def _subir(self, ticket, contenido, usuario=None):
+        Subida = self.env['subida.adjunto'].with_user(usuario or self.env.user)
+        token = Subida.iniciar('datos.bin', len(contenido), 'solicitud.interna', ticket.id)['token']
+        subida = Subida.search([('token', '=', token)])
+        mitad = len(contenido) // 2
+        self.assertEqual(subida.recibir_fragmento(0, io.BytesIO(contenido[:mitad])), mitad)
+        self.assertEqual(subida.recibir_fragmento(mitad, io.BytesIO(contenido[mitad:])), len(contenido))
+        self.assertEqual(subida.estado, 'completada')
+        return subida.attachment_id
+
+    def test_contenido_duplicado(self):
+        """Subir dos veces los mismos bytes completa ambas subidas sobre un solo archivo del almacén"""
+        ticket = self.env['solicitud.interna'].create(self.valores_ticket())
+        contenido = os.urandom(3000)
+        primero = self._subir(ticket, contenido)
+        segundo = self._subir(ticket, contenido)
+        self.assertNotEqual(primero, segundo)
+        self.assertEqual(primero.store_fname, segundo.store_fname)
+        self.assertEqual(segundo.raw, contenido)
+        self.assertEqual(segundo.file_size, len(contenido))
+
+    def test_subidas_ajenas(self):
+        """Un usuario no ve las subidas de otro ni puede redirigir las suyas a otro registro"""
+        ticket = self.env['solicitud.interna'].with_user(self.solicitante).create(self.valores_ticket())
+        ajeno = self.env['solicitud.interna'].create(self.valores_ticket(1))
+        Subida = self.env['subida.adjunto'].with_user(self.solicitante)
+        token = Subida.iniciar('datos.bin', 10, 'solicitud.interna', ticket.id)['token']
+        subida = Subida.search([('token', '=', token)])
+        with self.assertRaises(AccessError):
+            subida.write({'res_id': ajeno.id})
+        self.assertFalse(self.env['subida.adjunto'].with_user(self.gestor).search([('token', '=', token)]))
@@ -0,0 +1,57 @@
+from .common import SolicitudCommon
+
+
+class TestApiSolicitud(SolicitudCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.tickets = self.env['solicitud.interna'].create([self.valores_ticket(i) for i in range(7)])
+        # Una sola transacción: todas las filas comparten write_date, anterior al horizonte
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE solicitud_interna SET write_date = now() AT TIME ZONE 'UTC' - interval '1 hour'
+             WHERE id = ANY(%s)
+        """, [self.tickets.ids])
+        self.env.invalidate_all()
+
+    def _recorrer(self, metodo, **kwargs):
+        Api = self.env['api.solicitud']
+        vistos, cursor = [], None
+        for _pagina in range(10):
+            resultado = getattr(Api, metodo)(cursor=cursor, limite=3, **kwargs)
+            vistos += [fila['id'] for fila in resultado['tickets'] if fila['id'] in self.tickets.ids]
+            cursor = resultado['cursor']
+            if resultado['completo']:
+                return vistos
+        self.fail('La paginación no avanza sobre filas con la misma marca')
+
+    def test_listar_misma_marca(self):
+        """Más filas que el límite con el mismo write_date se sirven una sola vez y en orden de id"""
+        vistos = self._recorrer('listar', dominio=[('id', 'in', self.tickets.ids)])
+        self.assertEqual(vistos, sorted(self.tickets.ids))
+
+    def test_cursor_sin_perdida(self):
+        marca = self.tickets[0].write_date
+        self.assertTrue(marca.microsecond)
+        Api = self.env['api.solicitud']
+        self.assertEqual(Api._decodificar_cursor(Api._codificar_cursor([(marca, 5)]), 1), [(marca, 5)])
+
+    def _registrar_cambio(self, antelacion, **valores):
+        """Cambio de estado del primer ticket registrado por una transacción de hace `antelacion`"""
+        cambio = self.env['historial.estado.solicitud'].create(dict(
+            {'solicitud_id': self.tickets[0].id, 'estado_nuevo': 'pendiente'}, **valores))
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE historial_estado_solicitud SET create_date = now() AT TIME ZONE 'UTC' - %s::interval WHERE id = %s
+        """, [antelacion, cambio.id])
+        return cambio
+
+    def test_historial_con_fecha_anterior_al_cursor(self):
+        """Un cambio importado con fecha_cambio antigua se registra después del cursor y se sigue enviando"""
+        Api = self.env['api.solicitud']
+        primero = self._registrar_cambio('2 hours')
+        resultado = Api.historial(solicitud_ids=[self.tickets[0].id])
+        self.assertIn(primero.id, [fila['id'] for fila in resultado['historial']])
+        segundo = self._registrar_cambio('1 hour', fecha_cambio='2000-01-01 00:00:00')
+        resultado = Api.historial(solicitud_ids=[self.tickets[0].id], cursor=resultado['cursor'])
+        self.assertEqual([fila['id'] for fila in resultado['historial']], [segundo.id])
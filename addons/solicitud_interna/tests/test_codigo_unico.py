@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+from psycopg2 import IntegrityError
+
+from odoo.exceptions import ValidationError
+from odoo.tools import mute_logger
+
+from .common import SolicitudCommon
+
+
+class TestCodigoUnico(SolicitudCommon):
+
+    def _valores(self, codigo, nombre=None):
+        return {'name': nombre or f'Material {codigo}', 'codigo': codigo, 'categoria': 'papeleria'}
+
+    def test_informe_por_registro(self):
+        """Un lote con códigos repetidos, en el lote o contra la tabla, se rechaza indicando cada fila"""
+        TipoMaterial = self.env['tipo.material']
+        TipoMaterial.create(self._valores('COD-EXISTENTE'))
+        with self.assertRaises(ValidationError) as error:
+            TipoMaterial.create([self._valores('COD-EXISTENTE', 'Primero'), self._valores('COD-NUEVO', 'Segundo'),
+                                 self._valores('COD-NUEVO', 'Tercero'), self._valores('COD-LIBRE', 'Cuarto')])
+        mensaje = str(error.exception)
+        self.assertIn('Primero (COD-EXISTENTE): ya existe', mensaje)
+        self.assertIn('Segundo (COD-NUEVO): repetido en el lote', mensaje)
+        self.assertIn('Tercero (COD-NUEVO): repetido en el lote', mensaje)
+        self.assertNotIn('Cuarto', mensaje)
+        self.assertFalse(TipoMaterial.search_count([('codigo', 'in', ['COD-NUEVO', 'COD-LIBRE'])]))
+
+    def test_insercion_concurrente(self):
+        """Una fila que la validación no ve (otra transacción aún sin confirmar) la detiene el índice único"""
+        TipoMaterial = self.env['tipo.material']
+        TipoMaterial.create(self._valores('COD-CONCURRENTE'))
+        with patch('odoo.addons.solicitud_interna.models.tablas_extra.validar_codigos_unicos'), \
+                mute_logger('odoo.sql_db'), self.assertRaises(IntegrityError), self.env.cr.savepoint():
+            TipoMaterial.create(self._valores('COD-CONCURRENTE'))
+            self.env.flush_all()
+
+    def test_repetidos_previos_no_bloquean_la_actualizacion(self):
+        """Con códigos repetidos de antes del índice, init avisa y no lo crea en lugar de fallar"""
+        TipoMaterial = self.env['tipo.material']
+        self.env.cr.execute('DROP INDEX tipo_material_codigo_unico_idx')
+        primero, segundo = TipoMaterial.create([self._valores('COD-A'), self._valores('COD-B')])
+        self.env.cr.execute('UPDATE tipo_material SET codigo = %s WHERE id = %s', ['COD-A', segundo.id])
+        with self.assertLogs('odoo.addons.solicitud_interna.models.tablas_extra', 'WARNING') as avisos:
+            TipoMaterial.init()
+        self.assertIn(f'COD-A (ids {primero.id}, {segundo.id})', avisos.output[0])
+        self.env.cr.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'tipo_material_codigo_unico_idx'")
+        self.assertFalse(self.env.cr.fetchone())
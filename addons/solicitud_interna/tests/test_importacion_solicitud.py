@@ -0,0 +1,48 @@
+import io
+import json
+import os
+import tempfile
+
+from ..models.solicitud_interna import extracto_html
+from .common import SolicitudCommon
+
+
+class TestImportacionSolicitud(SolicitudCommon):
+
+    def _linea(self, numero, **valores):
+        return json.dumps(dict({'numero_ticket': numero, 'name': f'Importado {numero}', 'category': 'soporte',
+                                'prioridad': '3', 'solicitante': 'admin', 'departamento': 'ADM'}, **valores))
+
+    def test_linea_json_mal_formada(self):
+        """Una línea JSONL mal formada se rechaza sin abortar el resto de la importación"""
+        contenido = '\n'.join([self._linea('IMP-1'), '{"numero_ticket": "IMP-2", ', self._linea('IMP-3')])
+        Importacion = self.env['importacion.solicitud']
+        resultado = Importacion.importar(Importacion._leer_filas(io.StringIO(contenido), 'jsonl'))
+        self.assertEqual(resultado['tickets'], 2)
+        self.assertEqual([(archivo, linea) for archivo, linea, _motivo in resultado['rechazos']], [('tickets', 2)])
+        importados = self.env['solicitud.interna'].search([('numero_ticket', 'in', ['IMP-1', 'IMP-3'])])
+        self.assertEqual(len(importados), 2)
+
+    def test_sla_importados(self):
+        """Los tickets importados reciben sus eventos de SLA como si se hubieran creado con el ORM"""
+        contenido = '\n'.join([self._linea('IMP-P', state='pendiente'), self._linea('IMP-C', state='cerrado')])
+        Importacion = self.env['importacion.solicitud']
+        Importacion.importar(Importacion._leer_filas(io.StringIO(contenido), 'jsonl'))
+        pendiente, cerrado = (self.env['solicitud.interna'].search([('numero_ticket', '=', numero)])
+                              for numero in ('IMP-P', 'IMP-C'))
+        self.assertEqual(sorted(pendiente.evento_sla_ids.mapped('tipo')), ['resolucion', 'respuesta'])
+        self.assertTrue(pendiente.fecha_limite and pendiente.fecha_limite_respuesta)
+        self.assertEqual(pendiente.evento_sla_ids.departamento_id, self.departamento)
+        self.assertFalse(cerrado.evento_sla_ids)
+
+    def test_importar_de_archivo_con_extracto(self):
+        """La importación desde un archivo del servidor inserta el extracto igual que el cálculo del ORM"""
+        descripcion = '<p>Pantalla <b>rota</b></p>' + '<p>detalle </p>' * 100
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as archivo:
+            archivo.write(self._linea('IMP-A', description=descripcion) + '\n')
+        self.addCleanup(os.unlink, archivo.name)
+        resultado = self.env['importacion.solicitud'].importar_de_archivos(archivo.name)
+        self.assertEqual(resultado['tickets'], 1)
+        ticket = self.env['solicitud.interna'].search([('numero_ticket', '=', 'IMP-A')])
+        self.assertEqual(ticket.extracto, extracto_html(ticket.description))
+        self.assertTrue(ticket.extracto.startswith('Pantalla'))
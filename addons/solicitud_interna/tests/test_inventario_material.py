@@ -0,0 +1,79 @@
+from odoo.exceptions import UserError
+
+from ..models.inventario_material import EFECTOS_MOVIMIENTO
+from .common import SolicitudCommon
+
+
+class TestInventarioMaterial(SolicitudCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.material = self.env['tipo.material'].create({
+            'name': 'Tóner de prueba', 'codigo': 'TONER-PRUEBA', 'categoria': 'tecnologia',
+            'stock_actual': 3, 'stock_minimo': 0,
+        })
+
+    def _ticket(self, cantidad=1, accion='en_proceso'):
+        ticket = self.env['solicitud.interna'].create(self.valores_ticket(
+            category='material', tipo_material_id=self.material.id, cantidad_material=cantidad,
+            gestor_id=self.gestor.id, solucion='<p>Entregado</p>'))
+        ticket.transicion_en_lote(accion)
+        return ticket
+
+    def assertLibroCoherente(self):
+        """El stock y la reserva coinciden con la suma de todos los movimientos del libro"""
+        actual = reservado = 0
+        for movimiento in self.material.movimiento_ids:
+            efecto_actual, efecto_reservado = EFECTOS_MOVIMIENTO[movimiento.tipo]
+            actual += efecto_actual * movimiento.cantidad
+            reservado += efecto_reservado * movimiento.cantidad
+        self.assertEqual(self.material.stock_actual, actual)
+        self.assertEqual(self.material.stock_reservado, reservado)
+        self.assertGreaterEqual(self.material.stock_actual, self.material.stock_reservado)
+        self.assertGreaterEqual(self.material.stock_reservado, 0)
+
+    def test_stock_inicial_y_manual_en_el_libro(self):
+        self.assertEqual(self.material.movimiento_ids.mapped('tipo'), ['entrada'])
+        self.material.write({'stock_actual': 5})
+        self.assertEqual(self.material.stock_actual, 5)
+        self.assertEqual(sorted(self.material.movimiento_ids.mapped('tipo')), ['ajuste', 'entrada'])
+        self.assertLibroCoherente()
+
+    def test_ajuste_por_recuento(self):
+        ajuste = self.env['ajuste.stock.material'].with_context(active_id=self.material.id).create({
+            'stock_contado': 1})
+        ajuste.action_aplicar()
+        self.assertEqual(self.material.stock_actual, 1)
+        self.assertLibroCoherente()
+
+    def test_resolver_sin_stock(self):
+        """Resolver consume stock del libro y un ticket sin existencias se rechaza sin tocarlo"""
+        primero, segundo = self._ticket(2), self._ticket(2)
+        self.assertTrue(primero.transicion_en_lote('resolver')['exito'])
+        resumen = segundo.transicion_en_lote('resolver')
+        self.assertFalse(resumen['exito'])
+        self.assertEqual(resumen['errores'][0]['id'], segundo.id)
+        self.assertEqual(self.material.stock_actual, 1)
+        self.assertLibroCoherente()
+
+    def test_ajuste_bajo_reserva(self):
+        self._ticket(2, accion='asignar')
+        self.assertEqual(self.material.stock_reservado, 2)
+        with self.assertRaises(UserError):
+            self.material.ajustar_stock(-2)
+        self.assertLibroCoherente()
+
+    def test_reserva_fija_el_material(self):
+        """Con material reservado no se cambia el material, la categoría ni la cantidad; cancelar libera la reserva"""
+        otro = self.env['tipo.material'].create({
+            'name': 'Papel de prueba', 'codigo': 'PAPEL-PRUEBA', 'categoria': 'papeleria', 'stock_actual': 5})
+        ticket = self._ticket(2, accion='asignar')
+        for valores in ({'tipo_material_id': otro.id}, {'category': 'soporte'}, {'cantidad_material': 3}):
+            with self.assertRaises(UserError):
+                ticket.write(valores)
+        ticket.write({'tipo_material_id': self.material.id, 'cantidad_material': 2})
+        self.assertTrue(ticket.transicion_en_lote('cancelar')['exito'])
+        self.assertEqual(self.material.stock_reservado, 0)
+        self.assertEqual(otro.stock_reservado, 0)
+        self.assertLibroCoherente()
+        ticket.write({'category': 'soporte'})
@@ -0,0 +1,19 @@
+from .common import SolicitudCommon
+
+
+class TestKpiSolicitud(SolicitudCommon):
+
+    def test_promedio_ponderado_agrupado(self):
+        """Las lecturas agrupadas del cliente web devuelven horas / resueltos, no la media de las filas"""
+        Kpi = self.env['kpi.diario.solicitud']
+        Kpi.create([
+            {'fecha': '2000-01-01', 'departamento_id': self.departamento.id, 'resueltos': 1,
+             'horas_resolucion': 10.0, 'tiempo_resolucion_promedio': 10.0},
+            {'fecha': '2000-01-02', 'departamento_id': self.departamento.id, 'resueltos': 3,
+             'horas_resolucion': 6.0, 'tiempo_resolucion_promedio': 2.0},
+        ])
+        dominio = [('fecha', '>=', '2000-01-01'), ('fecha', '<', '2000-02-01')]
+        resultado = Kpi.web_read_group(dominio, ['tiempo_resolucion_promedio:avg'], ['fecha:month'])
+        self.assertAlmostEqual(resultado['groups'][0]['tiempo_resolucion_promedio'], 4.0)
+        [(promedio,)] = Kpi._read_group(dominio, aggregates=['tiempo_resolucion_promedio:avg'])
+        self.assertAlmostEqual(promedio, 4.0)
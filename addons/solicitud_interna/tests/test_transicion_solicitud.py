@@ -0,0 +1,32 @@
+import xmlrpc.client
+
+from odoo.exceptions import UserError
+
+from .common import SolicitudCommon
+
+
+class TestTransicionSolicitud(SolicitudCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.tickets = self.env['solicitud.interna'].create([self.valores_ticket(i, state='borrador')
+                                                             for i in range(3)])
+        self.tickets[0].transicion_en_lote('enviar')
+
+    def test_resumen_por_ticket(self):
+        """Los tickets válidos cambian de estado y cada rechazado aparece con su motivo"""
+        resumen = self.tickets.transicion_en_lote('enviar')
+        self.assertEqual(resumen['exito'], self.tickets[1:].ids)
+        self.assertEqual([error['id'] for error in resumen['errores']], self.tickets[0].ids)
+        self.assertIn(self.tickets[0].numero_ticket, resumen['errores'][0]['error'])
+        self.assertEqual(set(self.tickets.mapped('state')), {'pendiente'})
+
+    def test_resumen_serializable(self):
+        """El resumen con errores se puede devolver por XML-RPC"""
+        resumen = self.tickets.transicion_en_lote('enviar')
+        self.assertTrue(resumen['errores'])
+        xmlrpc.client.dumps((resumen,), methodresponse=True)
+
+    def test_un_ticket_rechazado(self):
+        with self.assertRaises(UserError):
+            self.tickets[0]._resultado_transicion(self.tickets[0]._transicion_enviar())
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BENCHMARKS DEL SISTEMA DE TICKETS
+Mide el rendimiento de las rutas masivas del módulo solicitud_interna
+contra una instancia Odoo en ejecución (por defecto la de docker-compose).
+
+Uso:
+    python benchmark_solicitudes.py creacion --cantidad 2000
+    python benchmark_solicitudes.py indices --tickets 1000000
+    python benchmark_solicitudes.py kanban --paginas 20
+    python benchmark_solicitudes.py stock --paralelos 50 --stock 30
+    python benchmark_solicitudes.py cola --concurrencias 1 10 100
+    python benchmark_solicitudes.py api --limite 500 --modificados 50
+    python benchmark_solicitudes.py referencias --limite 500 --renders 5
+
+Requisitos: Python 3.8+, psycopg2 para los benchmarks que consultan la base de datos
+"""
+
+import argparse
+import gzip
+import http.cookiejar
+import json
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+import xmlrpc.client
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+
+class Colors:
+    RED = '\033[91m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    CYAN = '\033[96m'
+    WHITE = '\033[97m'
+    BOLD = '\033[1m'
+    END = '\033[0m'
+
+
+# Consultas equivalentes a las que genera el ORM para cada menú, con el orden por defecto del modelo
+CONSULTAS_MENUS = [
+    ("Todos los Tickets (Pendientes)",
+     "state IN ('pendiente', 'asignado')"),
+    ("Todos los Tickets (sin filtro)",
+     "TRUE"),
+    ("Mis Tickets",
+     "solicitante_id = %(uid)s"),
+    ("Tickets Asignados (Pendientes)",
+     "gestor_id = %(uid)s AND state IN ('pendiente', 'asignado')"),
+    ("Tickets Vencidos",
+     "esta_vencido"),
+    ("Alta Prioridad",
+     "prioridad_nivel >= 4"),
+    ("Columna kanban 'en_proceso'",
+     "state = 'en_proceso'"),
+]
+
+# Campos que lee la tarjeta del kanban de tickets
+# Fallos de XML-RPC que son conflictos de concurrencia (Odoo ya agotó sus propios reintentos)
+CONFLICTOS_SERIALIZACION = ('could not serialize access', 'SerializationFailure', 'deadlock detected')
+
+# Reintentos seguidos de un agente ante conflictos de serialización antes de abandonar
+REINTENTOS_CONFLICTO = 5
+
+CAMPOS_KANBAN = ['numero_ticket', 'name', 'category', 'prioridad_id', 'state', 'solicitante_id', 'gestor_id',
+                 'fecha_solicitud', 'fecha_limite', 'esta_vencido', 'color']
+
+# Tablas de referencia servidas por la caché de cada worker
+TABLAS_REFERENCIA = ['prioridad_solicitud', 'departamento_solicitud', 'tipo_material', 'proveedor_servicio']
+
+
+class TransporteContador(xmlrpc.client.Transport):
+    """Transporte XML-RPC que acumula los bytes recibidos en las respuestas"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bytes_recibidos = 0
+
+    def parse_response(self, response):
+        datos = response.read()
+        self.bytes_recibidos += len(datos)
+        parser, unmarshaller = self.getparser()
+        parser.feed(datos)
+        parser.close()
+        return unmarshaller.close()
+
+
+class BenchmarkSolicitudes:
+    """Clase principal para ejecutar los benchmarks"""
+
+    def __init__(self, odoo_url: str = "http://localhost:8200", db: str = "odoo",
+                 usuario: str = "admin", password: str = "admin"):
+        self.odoo_url = odoo_url
+        self.db = db
+        self.usuario = usuario
+        self.password = password
+
+        common = xmlrpc.client.ServerProxy(f"{odoo_url}/xmlrpc/2/common")
+        self.uid = common.authenticate(db, usuario, password, {})
+        if not self.uid:
+            raise RuntimeError("No se pudo autenticar contra Odoo")
+        self.models = xmlrpc.client.ServerProxy(f"{odoo_url}/xmlrpc/2/object", allow_none=True)
+
+    def print_colored(self, text: str, color: str = Colors.WHITE, bold: bool = False):
+        """Imprime texto con colores"""
+        prefix = Colors.BOLD if bold else ""
+        print(f"{prefix}{color}{text}{Colors.END}")
+
+    def print_header(self, nombre: str):
+        """Imprime encabezado de benchmark"""
+        print()
+        self.print_colored("=" * 80, Colors.CYAN)
+        self.print_colored(f"BENCHMARK: {nombre}", Colors.CYAN, bold=True)
+        self.print_colored("=" * 80, Colors.CYAN)
+
+    def ejecutar(self, modelo: str, metodo: str, *args, **kwargs):
+        """Llama a un método del ORM por XML-RPC"""
+        return self.models.execute_kw(self.db, self.uid, self.password, modelo, metodo, list(args), kwargs)
+
+    def valores_ticket(self, indice: int) -> dict:
+        """Valores mínimos de un ticket sintético"""
+        if not hasattr(self, '_referencias'):
+            self._referencias = (
+                self.ejecutar('departamento.solicitud', 'search', [], limit=1)[0],
+                self.ejecutar('prioridad.solicitud', 'search', [], limit=1)[0],
+            )
+        departamento_id, prioridad_id = self._referencias
+        return {
+            'name': f'Ticket de benchmark {indice}',
+            'category': 'soporte',
+            'departamento_id': departamento_id,
+            'prioridad_id': prioridad_id,
+        }
+
+    def conectar_bd(self, host: str, puerto: int, usuario: str, password: str):
+        """Abre una conexión directa a PostgreSQL"""
+        if psycopg2 is None:
+            raise RuntimeError("psycopg2 no está instalado. Ejecuta: pip install psycopg2-binary")
+        return psycopg2.connect(host=host, port=puerto, user=usuario, password=password, dbname=self.db)
+
+    def benchmark_indices(self, conexion, tickets: int, limite: int):
+        """Planes EXPLAIN y tiempos de cada menú sin y con los índices del módulo.
+
+        Todo ocurre en una transacción que se revierte al final: los tickets sintéticos y el borrado
+        temporal de los índices no persisten. El borrado bloquea la tabla mientras dura la prueba,
+        por lo que debe ejecutarse contra una copia de la base de datos.
+        """
+        self.print_header(f"Índices de solicitud_interna ({tickets} tickets sintéticos)")
+        cr = conexion.cursor()
+        try:
+            if tickets:
+                self.print_colored("   Generando tickets sintéticos...", Colors.YELLOW)
+                cr.execute("""
+                    INSERT INTO solicitud_interna
+                           (numero_ticket, name, category, state, solicitante_id, gestor_id, departamento_id,
+                            prioridad_id, prioridad_nivel, fecha_solicitud, fecha_limite, esta_vencido)
+                    SELECT 'BENCH' || g, 'Ticket ' || g,
+                           (ARRAY['material', 'soporte', 'mantenimiento', 'it'])[1 + g % 4],
+                           (ARRAY['pendiente', 'asignado', 'en_proceso', 'resuelto', 'cerrado', 'cerrado',
+                                  'cerrado', 'cerrado', 'cancelado', 'esperando_respuesta'])[1 + g % 10],
+                           u.ids[1 + g % array_length(u.ids, 1)],
+                           CASE WHEN g % 3 = 0 THEN NULL ELSE u.ids[1 + (g / 7) % array_length(u.ids, 1)] END,
+                           d.ids[1 + g % array_length(d.ids, 1)],
+                           p.id, p.nivel,
+                           now() - (g % 1500) * interval '1 day' - (g % 1440) * interval '1 minute',
+                           now() - (g % 1500) * interval '1 day' + interval '3 days',
+                           g % 50 = 0
+                      FROM generate_series(1, %s) AS g,
+                           (SELECT array_agg(id) AS ids FROM res_users WHERE active) u,
+                           (SELECT array_agg(id) AS ids FROM departamento_solicitud) d,
+                           LATERAL (SELECT id, nivel FROM prioridad_solicitud ORDER BY id
+                                     OFFSET g % (SELECT count(*) FROM prioridad_solicitud) LIMIT 1) p
+                """, [tickets])
+            cr.execute("ANALYZE solicitud_interna")
+
+            cr.execute("""
+                SELECT indexname FROM pg_indexes
+                 WHERE tablename = 'solicitud_interna' AND indexname LIKE 'solicitud_interna\\_%%\\_idx'
+            """)
+            indices = [row[0] for row in cr.fetchall()]
+
+            despues = self._medir_menus(cr, limite)
+            for indice in indices:
+                cr.execute(f'DROP INDEX "{indice}"')
+            antes = self._medir_menus(cr, limite)
+        finally:
+            conexion.rollback()
+
+        for nombre, _condicion in CONSULTAS_MENUS:
+            self.print_colored(f"\n▶ {nombre}", Colors.CYAN, bold=True)
+            self.print_colored(f"   Antes:   {antes[nombre][0]:9.2f} ms  {antes[nombre][1]}", Colors.RED)
+            self.print_colored(f"   Después: {despues[nombre][0]:9.2f} ms  {despues[nombre][1]}", Colors.GREEN)
+
+    def _medir_menus(self, cr, limite: int) -> dict:
+        """Ejecuta EXPLAIN ANALYZE de cada menú y devuelve {menú: (ms, nodo principal del plan)}"""
+        resultados = {}
+        for nombre, condicion in CONSULTAS_MENUS:
+            cr.execute(
+                f"EXPLAIN (ANALYZE, FORMAT JSON) SELECT id FROM solicitud_interna WHERE {condicion} "
+                f"ORDER BY fecha_solicitud DESC, prioridad_nivel DESC LIMIT %(limite)s",
+                {'uid': self.uid, 'limite': limite},
+            )
+            plan = cr.fetchone()[0][0]
+            nodo = plan['Plan']
+            while nodo.get('Plans') and nodo['Node Type'] == 'Limit':
+                nodo = nodo['Plans'][0]
+            descripcion = nodo['Node Type'] + (f" using {nodo['Index Name']}" if 'Index Name' in nodo else '')
+            resultados[nombre] = (plan['Execution Time'], descripcion)
+        return resultados
+
+    def benchmark_kanban(self, paginas: int, limite: int):
+        """Bytes y latencia por página del kanban con los cuerpos HTML y con el extracto.
+
+        "Antes" lee además description y solucion, que el prefetch cargaba con cada página;
+        "Después" lee solo los campos de la tarjeta, con el extracto en texto plano.
+        """
+        self.print_header(f"Páginas del kanban ({paginas} páginas de {limite} tickets)")
+        transporte = TransporteContador()
+        proxy = xmlrpc.client.ServerProxy(f"{self.odoo_url}/xmlrpc/2/object", transport=transporte, allow_none=True)
+        variantes = [
+            ("Antes (con cuerpos HTML)", CAMPOS_KANBAN + ['description', 'solucion']),
+            ("Después (extracto)", CAMPOS_KANBAN + ['extracto']),
+        ]
+        for nombre, campos in variantes:
+            transporte.bytes_recibidos = 0
+            inicio = time.time()
+            for pagina in range(paginas):
+                proxy.execute_kw(self.db, self.uid, self.password, 'solicitud.interna', 'search_read', [[]],
+                                 {'fields': campos, 'limit': limite, 'offset': pagina * limite})
+            transcurrido = time.time() - inicio
+            self.print_colored(f"   {nombre:26} {transcurrido / paginas * 1000:9.2f} ms/página  "
+                               f"{transporte.bytes_recibidos / paginas / 1024:10.1f} KiB/página")
+
+    def benchmark_stock(self, paralelos: int, stock: int):
+        """Prueba de estrés del libro de stock: `paralelos` gestores resuelven a la vez tickets de material.
+
+        Cada ticket consume una unidad sin reserva previa de un material con `stock` unidades. Al terminar,
+        el stock no puede ser negativo, las resoluciones aceptadas deben coincidir con las salidas del libro
+        y el stock final con el inicial menos esas salidas y con el que se reconstruye sumando todo el libro
+        (el stock inicial entra como movimiento de entrada). Las resoluciones que agotan los reintentos por
+        conflicto de serialización de Odoo se cuentan aparte: no consumen stock.
+        """
+        self.print_header(f"Stock bajo {paralelos} resoluciones concurrentes (stock inicial {stock})")
+        material_id = self.ejecutar('tipo.material', 'create', {
+            'name': 'Material de benchmark', 'codigo': f'BENCH-{int(time.time() * 1000)}',
+            'categoria': 'otros', 'stock_actual': stock, 'stock_minimo': 0,
+        })
+        tickets = self.ejecutar('solicitud.interna', 'create', [
+            dict(self.valores_ticket(i), category='material', tipo_material_id=material_id, cantidad_material=1,
+                 solucion='<p>Entregado</p>')
+            for i in range(paralelos)
+        ])
+        try:
+            self.ejecutar('solicitud.interna', 'transicion_en_lote', tickets, 'en_proceso')
+
+            resultados = {'resueltos': 0, 'sin_stock': 0, 'conflictos': 0}
+            bloqueo = threading.Lock()
+            arranque = threading.Barrier(paralelos)
+
+            def resolver(ticket_id):
+                # Un proxy por hilo: ServerProxy no es seguro entre hilos
+                proxy = xmlrpc.client.ServerProxy(f"{self.odoo_url}/xmlrpc/2/object", allow_none=True)
+                arranque.wait()
+                try:
+                    resumen = proxy.execute_kw(self.db, self.uid, self.password, 'solicitud.interna',
+                                               'transicion_en_lote', [[ticket_id], 'resolver'])
+                    clave = 'resueltos' if resumen['exito'] else 'sin_stock'
+                except xmlrpc.client.Fault:
+                    clave = 'conflictos'
+                with bloqueo:
+                    resultados[clave] += 1
+
+            hilos = [threading.Thread(target=resolver, args=(ticket_id,)) for ticket_id in tickets]
+            inicio = time.time()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            transcurrido = time.time() - inicio
+
+            material = self.ejecutar('tipo.material', 'read', [material_id], ['stock_actual', 'stock_reservado'])[0]
+            movimientos = self.ejecutar('movimiento.stock.material', 'search_read',
+                                        [('tipo_material_id', '=', material_id)], ['tipo', 'cantidad'])
+            consumido = sum(movimiento['cantidad'] for movimiento in movimientos if movimiento['tipo'] == 'salida')
+            # El stock inicial se anota como entrada: el libro completo reconstruye el stock final
+            signos = {'entrada': 1, 'ajuste': 1, 'consumo': -1, 'salida': -1}
+            reconstruido = sum(signos.get(movimiento['tipo'], 0) * movimiento['cantidad'] for movimiento in movimientos)
+        finally:
+            self.ejecutar('solicitud.interna', 'unlink', tickets)
+            # El material queda inactivo: el libro conserva sus movimientos
+            self.ejecutar('tipo.material', 'write', [material_id], {'activo': False})
+
+        self.print_colored(f"   Resueltos:            {resultados['resueltos']:6d}")
+        self.print_colored(f"   Rechazados sin stock: {resultados['sin_stock']:6d}")
+        self.print_colored(f"   Conflictos agotados:  {resultados['conflictos']:6d}")
+        self.print_colored(f"   Tiempo total:         {transcurrido:9.2f} s")
+        self.print_colored(f"   Stock final:          {material['stock_actual']:6d}  "
+                           f"(reservado {material['stock_reservado']}, salidas en el libro {consumido}, "
+                           f"reconstruido del libro {reconstruido})")
+        coherente = (material['stock_actual'] >= 0
+                     and consumido == resultados['resueltos']
+                     and material['stock_actual'] == stock - consumido == reconstruido
+                     and resultados['resueltos'] <= stock)
+        if coherente:
+            self.print_colored("   ✅ Stock coherente con el libro de movimientos", Colors.GREEN, bold=True)
+        else:
+            self.print_colored("   ❌ Stock incoherente con el libro de movimientos", Colors.RED, bold=True)
+            sys.exit(1)
+
+    def benchmark_cola(self, concurrencias: list, reclamos: int):
+        """Reclamos por segundo de tomar_siguiente con 1, 10 y 100 agentes simultáneos.
+
+        Para cada nivel se crean `reclamos` tickets pendientes sin gestor y los agentes los toman hasta vaciar
+        la cola. Ningún ticket puede ser reclamado dos veces. Con 100 agentes, el servidor necesita workers
+        suficientes (--workers) para que las llamadas sean realmente concurrentes. Los agentes también toman
+        los tickets pendientes sin gestor que ya existan, por lo que debe ejecutarse contra una copia.
+        """
+        self.print_header(f"Cola de tickets ({reclamos} tickets por nivel)")
+        for concurrencia in concurrencias:
+            tickets = self.ejecutar('solicitud.interna', 'create',
+                                    [self.valores_ticket(i) for i in range(reclamos)],
+                                    context={'sin_asignacion_automatica': True})
+            reclamados = []
+            conflictos = [0]
+            fallos = []
+            bloqueo = threading.Lock()
+            arranque = threading.Barrier(concurrencia)
+
+            def agente():
+                proxy = xmlrpc.client.ServerProxy(f"{self.odoo_url}/xmlrpc/2/object", allow_none=True)
+                arranque.wait()
+                seguidos = 0
+                while True:
+                    try:
+                        ticket_id = proxy.execute_kw(self.db, self.uid, self.password, 'solicitud.interna',
+                                                     'tomar_siguiente', [])
+                    except xmlrpc.client.Fault as fallo:
+                        # Solo se reintentan los conflictos de serialización, y no indefinidamente
+                        conflicto = any(texto in fallo.faultString for texto in CONFLICTOS_SERIALIZACION)
+                        with bloqueo:
+                            if conflicto:
+                                conflictos[0] += 1
+                            if not conflicto or seguidos >= REINTENTOS_CONFLICTO:
+                                fallos.append(fallo)
+                                return
+                        seguidos += 1
+                        continue
+                    seguidos = 0
+                    if not ticket_id:
+                        return
+                    with bloqueo:
+                        reclamados.append(ticket_id)
+
+            hilos = [threading.Thread(target=agente) for _i in range(concurrencia)]
+            try:
+                inicio = time.time()
+                for hilo in hilos:
+                    hilo.start()
+                for hilo in hilos:
+                    hilo.join()
+                transcurrido = time.time() - inicio
+            finally:
+                self.ejecutar('solicitud.interna', 'unlink', tickets)
+
+            if fallos:
+                self.print_colored(f"   ❌ {len(fallos)} agentes abandonaron: {fallos[0].faultString.splitlines()[-1]}",
+                                   Colors.RED, bold=True)
+                sys.exit(1)
+            duplicados = len(reclamados) - len(set(reclamados))
+            color = Colors.GREEN if not duplicados else Colors.RED
+            self.print_colored(f"   {concurrencia:4d} agentes: {len(reclamados) / transcurrido:9.1f} reclamos/s  "
+                               f"({len(reclamados)} reclamados, {duplicados} duplicados, "
+                               f"{conflictos[0]} errores de concurrencia)", color)
+
+    def sesion_web(self):
+        """Abre una sesión web (cookie) para las rutas HTTP del módulo"""
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        peticion = urllib.request.Request(
+            f"{self.odoo_url}/web/session/authenticate",
+            data=json.dumps({'jsonrpc': '2.0', 'params': {
+                'db': self.db, 'login': self.usuario, 'password': self.password}}).encode(),
+            headers={'Content-Type': 'application/json'})
+        opener.open(peticion).read()
+        return opener
+
+    def benchmark_api(self, limite: int, modificados: int):
+        """Lectura completa y sincronización incremental: search_read con offset frente a la API por clave.
+
+        La lectura completa pagina todos los tickets con los campos del kanban. Después se modifican
+        `modificados` tickets y se repite la sincronización: por RPC hay que volver a descargarlo todo,
+        con la API basta pedir los cambios desde el cursor anterior.
+        """
+        self.print_header(f"API de tickets (páginas de {limite})")
+        transporte = TransporteContador()
+        proxy = xmlrpc.client.ServerProxy(f"{self.odoo_url}/xmlrpc/2/object", transport=transporte, allow_none=True)
+        opener = self.sesion_web()
+        campos = ','.join(CAMPOS_KANBAN)
+
+        def rpc_completo():
+            transporte.bytes_recibidos = 0
+            filas, offset = 0, 0
+            while True:
+                pagina = proxy.execute_kw(self.db, self.uid, self.password, 'solicitud.interna', 'search_read',
+                                          [[]], {'fields': CAMPOS_KANBAN, 'limit': limite, 'offset': offset,
+                                                 'order': 'id'})
+                filas += len(pagina)
+                offset += limite
+                if len(pagina) < limite:
+                    return filas, transporte.bytes_recibidos
+
+        def api(ruta, cursor=None):
+            """Recorre la ruta hasta `completo`; devuelve filas, bytes y el último cursor"""
+            filas, recibidos = 0, 0
+            while True:
+                parametros = urllib.parse.urlencode({k: v for k, v in (
+                    ('limite', limite), ('campos', campos), ('cursor', cursor)) if v})
+                peticion = urllib.request.Request(f"{self.odoo_url}/solicitud_interna/api/v1/{ruta}?{parametros}",
+                                                  headers={'Accept-Encoding': 'gzip'})
+                with opener.open(peticion) as respuesta:
+                    cuerpo = respuesta.read()
+                    recibidos += len(cuerpo)
+                    if respuesta.headers.get('Content-Encoding') == 'gzip':
+                        cuerpo = gzip.decompress(cuerpo)
+                datos = json.loads(cuerpo)
+                filas += len(datos['tickets']) + len(datos.get('bajas', []))
+                cursor = datos['cursor']
+                if datos['completo']:
+                    return filas, recibidos, cursor
+
+        resultados = {}
+        inicio = time.time()
+        filas, recibidos = rpc_completo()
+        resultados['RPC search_read (offset)'] = (filas, recibidos, time.time() - inicio)
+        inicio = time.time()
+        filas, recibidos, cursor = api('cambios')
+        resultados['API por clave + gzip'] = (filas, recibidos, time.time() - inicio)
+
+        ids = self.ejecutar('solicitud.interna', 'search', [], limit=modificados, order='id desc')
+        # Reescribir el mismo valor basta para actualizar write_date
+        for ticket in self.ejecutar('solicitud.interna', 'read', ids, ['comentarios']):
+            self.ejecutar('solicitud.interna', 'write', [ticket['id']], {'comentarios': ticket['comentarios']})
+        # Los cambios se sirven cuando ya no hay transacciones abiertas anteriores a ellos
+        time.sleep(1)
+        inicio = time.time()
+        filas, recibidos = rpc_completo()
+        resultados['Resincronización RPC'] = (filas, recibidos, time.time() - inicio)
+        inicio = time.time()
+        filas, recibidos, _cursor = api('cambios', cursor)
+        resultados['Cambios desde cursor'] = (filas, recibidos, time.time() - inicio)
+
+        for nombre, (filas, recibidos, transcurrido) in resultados.items():
+            self.print_colored(f"   {nombre:28} {filas:8d} filas  {filas / transcurrido:10.1f} filas/s  "
+                               f"{recibidos / 1024:10.1f} KiB  ({transcurrido:.2f} s)")
+
+    def benchmark_referencias(self, conexion, limite: int, renders: int):
+        """Lecturas de las tablas de referencia al pintar el kanban, sin y con la caché de referencias.
+
+        Cada render pide con web_search_read `limite` tarjetas con los nombres de prioridad, departamento y
+        proveedor y el color. Las lecturas se cuentan con pg_stat_user_tables (recorridos secuenciales y por
+        índice) de las cuatro tablas; la estadística llega con retraso, por eso se espera antes de cada medida.
+        """
+        self.print_header(f"Caché de referencias ({renders} renders de {limite} tarjetas)")
+        especificacion = {campo: {} for campo in CAMPOS_KANBAN}
+        for campo in ('prioridad_id', 'departamento_id', 'proveedor_id', 'gestor_id', 'solicitante_id'):
+            especificacion[campo] = {'fields': {'display_name': {}}}
+        conexion.autocommit = True
+        cr = conexion.cursor()
+
+        def lecturas():
+            time.sleep(1)
+            cr.execute("SELECT pg_stat_clear_snapshot()")
+            cr.execute("SELECT COALESCE(sum(seq_scan + COALESCE(idx_scan, 0)), 0) FROM pg_stat_user_tables "
+                       "WHERE relname = ANY(%s)", [TABLAS_REFERENCIA])
+            return cr.fetchone()[0]
+
+        # Un render previo llena la caché del worker para la variante "con caché"
+        self.ejecutar('solicitud.interna', 'web_search_read', [], especificacion, limit=limite)
+        variantes = [("Sin caché", {'sin_cache_referencias': True}), ("Con caché", {})]
+        for nombre, contexto in variantes:
+            antes = lecturas()
+            inicio = time.time()
+            for _i in range(renders):
+                self.ejecutar('solicitud.interna', 'web_search_read', [], especificacion, limit=limite,
+                              context=contexto)
+            transcurrido = time.time() - inicio
+            consultas = lecturas() - antes
+            self.print_colored(f"   {nombre:10} {consultas / renders:8.1f} lecturas de referencia/render  "
+                               f"{transcurrido / renders * 1000:9.2f} ms/render")
+
+        for modelo, contadores in self.ejecutar('prioridad.solicitud', 'estadisticas_cache_referencias').items():
+            self.print_colored(f"   {modelo:24} {contadores.get('aciertos', 0):8d} aciertos  "
+                               f"{contadores.get('fallos', 0):6d} fallos  {contadores['entradas']:5d} entradas",
+                               Colors.CYAN)
+
+    def benchmark_creacion(self, cantidad: int):
+        """Compara la creación ticket a ticket con la creación en lote"""
+        self.print_header(f"Creación de {cantidad} tickets")
+        creados = []
+        try:
+            inicio = time.time()
+            for i in range(cantidad):
+                creados.append(self.ejecutar('solicitud.interna', 'create', self.valores_ticket(i)))
+            tiempo_bucle = time.time() - inicio
+
+            inicio = time.time()
+            creados += self.ejecutar('solicitud.interna', 'create',
+                                     [self.valores_ticket(i) for i in range(cantidad)])
+            tiempo_lote = time.time() - inicio
+        finally:
+            if creados:
+                self.ejecutar('solicitud.interna', 'unlink', creados)
+
+        self.print_colored(f"   Bucle de create:  {cantidad / tiempo_bucle:10.1f} filas/s ({tiempo_bucle:.2f} s)")
+        self.print_colored(f"   Create en lote:   {cantidad / tiempo_lote:10.1f} filas/s ({tiempo_lote:.2f} s)")
+        self.print_colored(f"   Aceleración:      {tiempo_bucle / tiempo_lote:10.1f}x", Colors.GREEN, bold=True)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks del Sistema de Tickets",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--url", default="http://localhost:8200", help="URL de Odoo")
+    parser.add_argument("--db", default="odoo", help="Base de datos")
+    parser.add_argument("--usuario", default="admin", help="Usuario de Odoo")
+    parser.add_argument("--password", default="admin", help="Contraseña de Odoo")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    creacion = subparsers.add_parser("creacion", help="Filas por segundo de create en bucle frente a create en lote")
+    creacion.add_argument("--cantidad", type=int, default=1000, help="Tickets a crear por variante")
+
+    indices = subparsers.add_parser("indices", help="EXPLAIN y tiempos de cada menú sin y con índices")
+    indices.add_argument("--tickets", type=int, default=1000000, help="Tickets sintéticos a generar (se revierten)")
+    indices.add_argument("--limite", type=int, default=80, help="Tamaño de página de la lista")
+    indices.add_argument("--db-host", default="localhost", help="Servidor PostgreSQL")
+    indices.add_argument("--db-port", type=int, default=5432, help="Puerto PostgreSQL")
+    indices.add_argument("--db-user", default="odoo", help="Usuario PostgreSQL")
+    indices.add_argument("--db-password", default="odoo", help="Contraseña PostgreSQL")
+
+    kanban = subparsers.add_parser("kanban", help="Bytes y latencia por página del kanban con y sin cuerpos HTML")
+    kanban.add_argument("--paginas", type=int, default=20, help="Páginas a leer por variante")
+    kanban.add_argument("--limite", type=int, default=40, help="Tickets por página")
+
+    stock = subparsers.add_parser("stock", help="Estrés del libro de stock con resoluciones concurrentes")
+    stock.add_argument("--paralelos", type=int, default=50, help="Resoluciones simultáneas")
+    stock.add_argument("--stock", type=int, default=30, help="Stock inicial del material")
+
+    cola = subparsers.add_parser("cola", help="Reclamos por segundo de tomar_siguiente con agentes concurrentes")
+    cola.add_argument("--concurrencias", type=int, nargs="+", default=[1, 10, 100], help="Agentes simultáneos")
+    cola.add_argument("--reclamos", type=int, default=1000, help="Tickets en la cola por nivel")
+
+    api = subparsers.add_parser("api", help="Lectura y sincronización por RPC con offset frente a la API por clave")
+    api.add_argument("--limite", type=int, default=500, help="Tickets por página")
+    api.add_argument("--modificados", type=int, default=50, help="Tickets modificados antes de resincronizar")
+
+    referencias = subparsers.add_parser("referencias",
+                                        help="Lecturas de las tablas de referencia al pintar el kanban")
+    referencias.add_argument("--limite", type=int, default=500, help="Tarjetas por render")
+    referencias.add_argument("--renders", type=int, default=5, help="Renders por variante")
+    referencias.add_argument("--db-host", default="localhost", help="Servidor PostgreSQL")
+    referencias.add_argument("--db-port", type=int, default=5432, help="Puerto PostgreSQL")
+    referencias.add_argument("--db-user", default="odoo", help="Usuario PostgreSQL")
+    referencias.add_argument("--db-password", default="odoo", help="Contraseña PostgreSQL")
+
+    args = parser.parse_args()
+    try:
+        benchmark = BenchmarkSolicitudes(args.url, args.db, args.usuario, args.password)
+    except (OSError, RuntimeError, xmlrpc.client.Fault) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    if args.benchmark == "api":
+        benchmark.benchmark_api(args.limite, args.modificados)
+    elif args.benchmark == "creacion":
+        benchmark.benchmark_creacion(args.cantidad)
+    elif args.benchmark == "cola":
+        benchmark.benchmark_cola(args.concurrencias, args.reclamos)
+    elif args.benchmark == "stock":
+        benchmark.benchmark_stock(args.paralelos, args.stock)
+    elif args.benchmark == "kanban":
+        benchmark.benchmark_kanban(args.paginas, args.limite)
+    elif args.benchmark == "referencias":
+        conexion = benchmark.conectar_bd(args.db_host, args.db_port, args.db_user, args.db_password)
+        try:
+            benchmark.benchmark_referencias(conexion, args.limite, args.renders)
+        finally:
+            conexion.close()
+    elif args.benchmark == "indices":
+        conexion = benchmark.conectar_bd(args.db_host, args.db_port, args.db_user, args.db_password)
+        try:
+            benchmark.benchmark_indices(conexion, args.tickets, args.limite)
+        finally:
+            conexion.close()
+
+
+if __name__ == "__main__":
+    main()